@@ -0,0 +1,225 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; workers then compute independently
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Thread-safe bounded mapping that evicts the least recently used entry"""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_MISSING = object()
+
+
+def code_fingerprint(directory=Path(__file__).parent):
+    """Hash of the backend's Python sources, so a deploy with different code never reads stale results"""
+    digest = hashlib.sha1()
+    for path in sorted(Path(directory).glob("*.py")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+class DiskCache:
+    """Content-addressed pickle cache on disk, shared by every worker process and kept across restarts.
+
+    Entries are keyed on sha256(method, arguments, version) and written
+    atomically (temp file + rename). A miss takes an flock on one of 256 lock
+    stripes and re-checks before computing, so concurrent workers asking for
+    the same result compute it once. Reads refresh the entry's mtime, and
+    writes past max_bytes evict the least recently used entries.
+    """
+
+    LOCK_STRIPES = 256
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, salt=""):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.salt = salt
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+        (self.directory / "locks").mkdir(exist_ok=True, parents=True)
+        self._size = None
+        self._size_lock = threading.Lock()
+
+    def key(self, method, args, version):
+        raw = pickle.dumps((self.salt, method, args, version), protocol=4)
+        return hashlib.sha256(raw).hexdigest()
+
+    def _path(self, digest):
+        return self.directory / digest[:2] / f"{digest}.pkl"
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return _MISSING
+        except Exception as e:
+            # Truncated or from an incompatible build: drop it and recompute
+            logger.warning(f"Discarding unreadable cache entry {path.name}: {e}")
+            self.errors += 1
+            self._remove(path)
+            return _MISSING
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def _write(self, path, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.writes += 1
+        with self._size_lock:
+            if self._size is not None:
+                self._size += len(data)
+        return len(data)
+
+    def _remove(self, path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return 0
+        return size
+
+    @contextmanager
+    def _locked(self, digest):
+        if fcntl is None:
+            yield
+            return
+        stripe = int(digest[:2], 16) % self.LOCK_STRIPES
+        with open(self.directory / "locks" / f"{stripe:02x}.lock", 'a+b') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def get_or_compute(self, method, args, version, compute):
+        """Return the cached result of method(*args) for a data version, computing it at most once across workers"""
+        digest = self.key(method, args, version)
+        path = self._path(digest)
+        value = self._read(path)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        with self._locked(digest):
+            # Another worker may have finished it while we waited for the lock
+            value = self._read(path)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            self.misses += 1
+            value = compute()
+            try:
+                self._write(path, value)
+            except Exception as e:
+                logger.error(f"Error writing cache entry for {method}: {e}")
+                self.errors += 1
+                return value
+
+        if self.size_bytes() > self.max_bytes:
+            self.evict()
+        return value
+
+    def _entries(self):
+        entries = []
+        for sub in self.directory.iterdir():
+            if sub.name == "locks" or not sub.is_dir():
+                continue
+            for entry in os.scandir(sub):
+                if entry.name.endswith(".pkl"):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, Path(entry.path)))
+        return entries
+
+    def size_bytes(self):
+        """Bytes used by entries (scanned once, then tracked for this process's writes)"""
+        with self._size_lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            return self._size
+
+    def evict(self, target=0.9):
+        """Delete least recently used entries until the cache fits within target * max_bytes"""
+        start = time.perf_counter()
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes * target:
+                break
+            total -= self._remove(path)
+            removed += 1
+        self.evictions += removed
+        with self._size_lock:
+            self._size = total
+        logger.info(f"Evicted {removed} result cache entries in {time.perf_counter() - start:.3f}s; {total} bytes remain")
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "writes": self.writes, "evictions": self.evictions,
+                "errors": self.errors, "bytes": self.size_bytes(), "max_bytes": self.max_bytes}
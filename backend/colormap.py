@@ -0,0 +1,43 @@
+import numpy as np
+from io import BytesIO
+
+
+def hex_to_rgb(color):
+    """Convert '#RRGGBB' to an (r, g, b) tuple of ints"""
+    color = color.lstrip('#')
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def build_lut(colors, size=256):
+    """Build a (size, 4) uint8 RGBA lookup table by linear interpolation between evenly spaced stops"""
+    stops = np.array([hex_to_rgb(c) for c in colors], dtype=np.float64)
+    positions = np.linspace(0.0, 1.0, len(stops))
+    samples = np.linspace(0.0, 1.0, size)
+
+    lut = np.empty((size, 4), dtype=np.uint8)
+    for channel in range(3):
+        lut[:, channel] = np.round(np.interp(samples, positions, stops[:, channel]))
+    lut[:, 3] = 255
+    return lut
+
+
+def apply_lut(data, lut, vmin, vmax):
+    """Colormap a 2-D array into an (h, w, 4) RGBA array; NaN pixels become transparent"""
+    data = np.asarray(data, dtype=np.float32)
+    scale = len(lut) / (vmax - vmin)
+    nodata = ~np.isfinite(data)
+
+    scaled = (data - np.float32(vmin)) * np.float32(scale)
+    np.clip(scaled, 0, len(lut) - 1, out=scaled)
+    scaled[nodata] = 0
+    rgba = lut[scaled.astype(np.uint8)]
+    rgba[nodata, 3] = 0
+    return rgba
+
+
+def encode_png(rgba, compress_level=6):
+    """Encode an RGBA array as PNG bytes"""
+    buf = BytesIO()
+    from PIL import Image  # deferred to keep startup fast
+    Image.fromarray(rgba).save(buf, format='PNG', compress_level=compress_level)
+    return buf.getvalue()
@@ -0,0 +1,137 @@
+import json
+import struct
+import numpy as np
+from fastapi.responses import Response
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # optional dependency
+    pyarrow = None
+
+# Little-endian typed arrays behind a small JSON header:
+#   magic (4 bytes) | header length (uint32 LE) | header JSON, padded to 8 bytes | column buffers
+# Every buffer starts on an 8-byte boundary. String columns are dictionary-encoded
+# as integer codes plus a "categories" list in the header.
+COLUMNAR_MEDIA_TYPE = "application/vnd.urbanheat.columnar"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+COLUMNAR_MAGIC = b"UHC1"
+
+ALIGNMENT = 8
+
+
+def negotiate_format(accept):
+    """Return "arrow", "columnar" or None (JSON) for an Accept header; binary only when explicitly preferred"""
+    binary, binary_q, json_q = None, 0.0, 0.0
+    for part in (accept or "").lower().split(","):
+        media_type, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if media_type == "application/json":
+            json_q = max(json_q, q)
+        elif media_type == COLUMNAR_MEDIA_TYPE and q > binary_q:
+            binary, binary_q = "columnar", q
+        elif media_type == ARROW_MEDIA_TYPE and pyarrow is not None and q > binary_q:
+            binary, binary_q = "arrow", q
+    return binary if binary_q > 0 and binary_q >= json_q else None
+
+
+def _pad(length):
+    return -length % ALIGNMENT
+
+
+def _column_array(values):
+    """Little-endian ndarray (plus categories for string columns) for one column"""
+    if isinstance(values, np.ndarray) and values.dtype.kind not in "OUS":
+        array = values
+        categories = None
+    else:
+        array = np.asarray(values)
+        if array.dtype.kind in "OUS":
+            categories, codes = np.unique(array.astype(str), return_inverse=True)
+            array = codes.astype(np.uint8 if len(categories) <= 256 else np.uint32)
+            categories = categories.tolist()
+        else:
+            categories = None
+    if array.dtype.kind == "f" and array.dtype.itemsize > 8:
+        array = array.astype(np.float64)
+    if array.dtype.kind == "b":
+        array = array.astype(np.uint8)
+    return np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<")), categories
+
+
+def encode_columns(columns, meta=None):
+    """Encode {name: array or list of str} as the columnar wire format"""
+    entries = []
+    buffers = []
+    offset = 0
+    for name, values in columns.items():
+        array, categories = _column_array(values)
+        entry = {"name": name, "dtype": array.dtype.str, "length": int(array.shape[0]), "offset": offset}
+        if categories is not None:
+            entry["categories"] = categories
+        entries.append(entry)
+        data = array.tobytes()
+        buffers.append(data + b"\0" * _pad(len(data)))
+        offset += len(buffers[-1])
+
+    header = json.dumps({"columns": entries, "meta": meta or {}}, separators=(",", ":")).encode("utf-8")
+    header += b" " * _pad(len(COLUMNAR_MAGIC) + 4 + len(header))
+    return b"".join([COLUMNAR_MAGIC, struct.pack("<I", len(header)), header] + buffers)
+
+
+def decode_columns(payload):
+    """Decode the columnar wire format into ({name: ndarray or list of str}, meta); zero-copy for numeric columns"""
+    if payload[:4] != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar payload")
+    (header_length,) = struct.unpack_from("<I", payload, 4)
+    header = json.loads(bytes(payload[8:8 + header_length]))
+    body = memoryview(payload)[8 + header_length:]
+
+    columns = {}
+    for entry in header["columns"]:
+        array = np.frombuffer(body, dtype=np.dtype(entry["dtype"]), count=entry["length"], offset=entry["offset"])
+        if "categories" in entry:
+            categories = np.asarray(entry["categories"], dtype=object)
+            columns[entry["name"]] = categories[array].tolist()
+        else:
+            columns[entry["name"]] = array
+    return columns, header["meta"]
+
+
+def encode_arrow(columns, meta=None):
+    """Encode columns as an Arrow IPC stream (requires pyarrow)"""
+    arrays = {}
+    for name, values in columns.items():
+        if isinstance(values, np.ndarray) and values.dtype.kind not in "OUS":
+            arrays[name] = pyarrow.array(values)
+        else:
+            arrays[name] = pyarrow.array(list(values)).dictionary_encode()
+    metadata = {"meta": json.dumps(meta or {})}
+    table = pyarrow.table(arrays).replace_schema_metadata(metadata)
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def columnar_response(fmt, columns, meta=None):
+    """Binary response for a negotiated format ("columnar" or "arrow")"""
+    if fmt == "arrow":
+        body, media_type = encode_arrow(columns, meta), ARROW_MEDIA_TYPE
+    else:
+        body, media_type = encode_columns(columns, meta), COLUMNAR_MEDIA_TYPE
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
+
+
+def records_to_columns(records, fields):
+    """{field: array or list of str} from a list of dicts, e.g. per-region rows"""
+    columns = {}
+    for field in fields:
+        values = [record[field] for record in records]
+        columns[field] = values if values and isinstance(values[0], str) else np.asarray(values, dtype=np.float64)
+    return columns
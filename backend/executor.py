@@ -0,0 +1,122 @@
+import asyncio
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class OverloadedError(Exception):
+    """Raised when the compute queue is full and a request should be shed"""
+
+
+# Per-process GeoTIFFProcessor used by process-pool workers
+_worker_processor = None
+
+
+def _init_worker(data_dir, cache_dir):
+    global _worker_processor
+    from geotiff_processor import GeoTIFFProcessor
+    _worker_processor = GeoTIFFProcessor(data_dir, cache_dir)
+
+
+def _call_worker_processor(method, *args):
+    return getattr(_worker_processor, method)(*args)
+
+
+class ComputeExecutor:
+    """Runs blocking raster work off the event loop with bounded queueing and single-flight.
+
+    NumPy work goes to a thread pool (NumPy releases the GIL in its kernels);
+    rendering can optionally go to a process pool whose workers each map the
+    same on-disk raster cache. Identical in-flight calls sharing a key are
+    coalesced into one computation.
+    """
+
+    def __init__(self, processor, thread_workers=None, render_processes=0, max_pending=64):
+        self.processor = processor
+        self.max_pending = max_pending
+        self.pending = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self._threads = ThreadPoolExecutor(
+            max_workers=thread_workers or min(8, os.cpu_count() or 1),
+            thread_name_prefix="compute",
+        )
+        self._render_processes = render_processes
+        self._processes = None
+        self._inflight = {}
+        # Thread-pool calls submitted but not yet picked up by a worker
+        self._queued = 0
+        self._queued_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, processor):
+        return cls(
+            processor,
+            thread_workers=int(os.environ.get('COMPUTE_THREADS', 0)) or None,
+            render_processes=int(os.environ.get('RENDER_PROCESSES', 0)),
+            max_pending=int(os.environ.get('COMPUTE_MAX_PENDING', 64)),
+        )
+
+    def _process_pool(self):
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(
+                max_workers=self._render_processes,
+                initializer=_init_worker,
+                initargs=(str(self.processor.data_dir), str(self.processor.cache_dir)),
+            )
+        return self._processes
+
+    def _submit(self, method, args, render):
+        loop = asyncio.get_running_loop()
+        if render and self._render_processes > 0:
+            return loop.run_in_executor(self._process_pool(), _call_worker_processor, method, *args)
+        fn = getattr(self.processor, method)
+        with self._queued_lock:
+            self._queued += 1
+        return loop.run_in_executor(self._threads, functools.partial(self._started, fn, *args))
+
+    def _started(self, fn, *args):
+        with self._queued_lock:
+            self._queued -= 1
+        return fn(*args)
+
+    async def run(self, method, *args, key=None, render=False):
+        """Run processor.<method>(*args) in a pool; raises OverloadedError when saturated"""
+        if key is not None and key in self._inflight:
+            self.coalesced += 1
+            return await asyncio.shield(self._inflight[key])
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise OverloadedError(f"{self.pending} computations already queued")
+
+        future = self._submit(method, args, render)
+        self.pending += 1
+
+        def _done(_):
+            self.pending -= 1
+            if key is not None:
+                self._inflight.pop(key, None)
+
+        future.add_done_callback(_done)
+        if key is not None:
+            self._inflight[key] = future
+        return await asyncio.shield(future)
+
+    @property
+    def inflight(self):
+        return len(self._inflight)
+
+    @property
+    def queued(self):
+        """Calls submitted to the thread pool but not yet picked up by a worker"""
+        return self._queued
+
+    def shutdown(self):
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
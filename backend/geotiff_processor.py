@@ -1,33 +1,103 @@
 import numpy as np
-from PIL import Image
 import json
 import os
+import hashlib
 from pathlib import Path
 import logging
-from scipy import stats
+import threading
+import time
 import base64
-from io import BytesIO
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
+from raster_store import COMPACT_ENCODINGS, RasterStore
+from region_stats import HOT_THRESHOLD, RegionStatsIndex, region_containing
+from colormap import build_lut, encode_png
+from caching import DiskCache, LRUCache, code_fingerprint
+from tiles import TilePyramid, empty_tile
+from time_cube import TimeCube
+from streaming_stats import iter_blocks
+from instrumentation import span
+from zonal_stats import geometry_key, iter_geometries, polygon_rings, rasterize_polygons, zone_summary
+from hotspots import FeatureIndex, HotspotIndex
+from scenarios import ScenarioEngine
+from local_correlation import DEFAULT_WINDOW, local_correlation
 
 logger = logging.getLogger(__name__)
 
+def cell_noise(rows, cols, year, salt):
+    """Deterministic uniform [0, 1) noise per (row, col, year) cell via a splitmix64 hash"""
+    with np.errstate(over='ignore'):
+        x = np.asarray(rows, dtype=np.int64).astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        x ^= np.asarray(cols, dtype=np.int64).astype(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F)
+        x ^= np.uint64(int(year) & 0xFFFF) * np.uint64(0x165667B19E3779F9) + np.uint64(salt)
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    return (x >> np.uint64(11)).astype(np.float64) / float(2 ** 53)
+
+def rounded(value, digits):
+    """round() that maps a missing or non-finite statistic (e.g. of an empty region) to None, since NaN is not valid JSON"""
+    if value is None or not np.isfinite(value):
+        return None
+    return round(float(value), digits)
+
 class GeoTIFFProcessor:
-    def __init__(self, data_dir="/app/data/geotiff"):
+    def __init__(self, data_dir="/app/data/geotiff", cache_dir="/app/data/cache", deterministic=None):
         self.data_dir = Path(data_dir)
         self.lst_path = self.data_dir / "lst.tif"
         self.ndvi_path = self.data_dir / "ndvi.tif"
         self.duhi_path = self.data_dir / "duhi.tif"
+        self.landuse_path = self.data_dir / "landuse.tif"
+        
+        # Class codes of the optional land-use raster
+        self.landuse_classes = {1: "Industrial", 2: "Commercial", 3: "Residential",
+                                4: "Parks/Green", 5: "Infrastructure", 6: "Undeveloped"}
         
         # Color palettes from spec
         self.duhi_colors = ['#2166AC', '#67A9CF', '#F7F7F7', '#F4A582', '#B2182B']
         self.ndvi_colors = ['#d73027', '#fdae61', '#ffffbf', '#a6d96a', '#1a9850']
         self.lst_colors = ['#313695', '#4575b4', '#74add1', '#fdae61', '#f46d43', '#d73027', '#a50026']
+        # Local NDVI-LST r: green where greenery cools (negative), brown where it does not
+        self.correlation_colors = ['#1a9850', '#91cf60', '#f7f7f7', '#dfc27d', '#8c510a']
+        
+        # Per-layer source, palette and display range (path, colors, vmin, vmax); derived layers have no path
+        self.layer_styles = {
+            "duhi": (self.duhi_path, self.duhi_colors, -2, 8),
+            "ndvi": (self.ndvi_path, self.ndvi_colors, -0.2, 0.8),
+            "lst": (self.lst_path, self.lst_colors, 20, 45),
+            "correlation": (None, self.correlation_colors, -1, 1),
+        }
+        self.correlation_window = int(os.environ.get('CORRELATION_WINDOW_PIXELS', DEFAULT_WINDOW))
+        self.luts = {layer: build_lut(style[1]) for layer, style in self.layer_styles.items()}
+        self._pyramids = {}
+        self._preview_cache = LRUCache(maxsize=int(os.environ.get('PREVIEW_CACHE_SIZE', 32)))
+        
+        # Deterministic mode: location noise is seeded per raster cell and year, timeseries per raster version
+        if deterministic is None:
+            deterministic = os.environ.get('DETERMINISTIC_RESULTS', 'true').lower() == 'true'
+        self.deterministic = deterministic
+        self._location_cache = LRUCache(maxsize=int(os.environ.get('LOCATION_CACHE_SIZE', 4096)))
+        self._time_cube = None
+        self._time_cube_checked = None
+        self._landuse_counts = None
+        self._mask_cache = LRUCache(maxsize=int(os.environ.get('ZONAL_MASK_CACHE_SIZE', 1024)))
+        self._hotspot_index = None
+        self._scenario_engine = None
+        self._scenario_tiles = LRUCache(maxsize=int(os.environ.get('SCENARIO_TILE_CACHE_SIZE', 4096)))
         
-        self.cache_dir = Path("/app/data/cache")
+        self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True, parents=True)
+        # Results shared by every worker and kept across restarts; RESULT_CACHE_MAX_MB=0 disables it
+        result_cache_mb = float(os.environ.get('RESULT_CACHE_MAX_MB', 512))
+        self.result_cache = None
+        if result_cache_mb > 0:
+            self.result_cache = DiskCache(self.cache_dir / "results", int(result_cache_mb * 1024 * 1024),
+                                          salt=code_fingerprint())
+        # RASTER_STORAGE=compact keeps LST/NDVI/DUHI as 16-bit codes instead of float32
+        compact = os.environ.get('RASTER_STORAGE', 'float32').lower() == 'compact'
+        self.raster_store = RasterStore(self.cache_dir / "rasters", encodings=COMPACT_ENCODINGS if compact else None)
+        self._stats_index = None
+        self._build_lock = threading.Lock()
         
         # Known locations in Brampton/Peel (lat, lng, type, heat_offset, ndvi_base)
         self.reference_locations = [
@@ -49,207 +119,392 @@ class GeoTIFFProcessor:
             # Water bodies
             (43.6500, -79.8000, "water", 0.3, 0.15),  # Lake areas
         ]
+        self._reference_tree = None
+        self._reference_types = np.array([ref[2] for ref in self.reference_locations])
+        self._reference_heat = np.array([ref[3] for ref in self.reference_locations], dtype=float)
+        self._reference_ndvi = np.array([ref[4] for ref in self.reference_locations], dtype=float)
+        
+        self.location_descriptions = {
+            "industrial": "Industrial/manufacturing zone - high heat from buildings and pavement",
+            "commercial": "Commercial district with large parking lots and minimal shade",
+            "downtown": "Dense urban core with limited green space",
+            "residential": "Residential neighborhood with moderate tree cover",
+            "park": "Park or conservation area with good vegetation coverage",
+            "water": "Water body (lake/river) - temperature data not applicable for water surfaces"
+        }
     
-    def classify_location(self, lat, lng):
-        """Classify location based on coordinates and known areas"""
-        # Find nearest reference location
-        min_dist = float('inf')
-        nearest_type = "residential"
-        nearest_heat = 3.5
-        nearest_ndvi = 0.35
-        
-        for ref_lat, ref_lng, loc_type, heat, ndvi in self.reference_locations:
-            dist = np.sqrt((lat - ref_lat)**2 + (lng - ref_lng)**2)
-            if dist < min_dist:
-                min_dist = dist
-                nearest_type = loc_type
-                nearest_heat = heat
-                nearest_ndvi = ndvi
+    @property
+    def memory_caches(self):
+        """In-process result caches by name, for metrics and benchmarks"""
+        return {"preview": self._preview_cache, "location": self._location_cache, "zonal_mask": self._mask_cache}
+    
+    @property
+    def reference_tree(self):
+        """KD-tree over the reference locations, built on first use"""
+        if self._reference_tree is None:
+            from scipy.spatial import cKDTree  # deferred: scipy is slow to import
+            self._reference_tree = cKDTree([(ref[0], ref[1]) for ref in self.reference_locations])
+        return self._reference_tree
+    
+    def snap_to_cells(self, lats, lngs):
+        """Quantize lat/lng to DUHI raster cells; returns (rows, cols, cell-centre lats, cell-centre lngs)"""
+        band = self.load_band(self.duhi_path)
+        west, xres, _, north, _, yres = band.transform
+        rows, cols = band.rowcol(lats, lngs)
+        rows = np.floor(rows).astype(np.int64)
+        cols = np.floor(cols).astype(np.int64)
+        return rows, cols, north + (rows + 0.5) * yres, west + (cols + 0.5) * xres
+    
+    def classify_locations(self, lats, lngs, year=2025):
+        """Classify many locations at once; returns arrays of (type, duhi, ndvi, lst)"""
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        lngs = np.atleast_1d(np.asarray(lngs, dtype=float))
+        n = len(lats)
         
-        # Check if water (basic bounds check)
-        if lat < 43.55 or lng < -80.0:
-            return "water", 0.5, 0.12, 22.0
+        if self.deterministic:
+            rows, cols, lats, lngs = self.snap_to_cells(lats, lngs)
+            noise = [cell_noise(rows, cols, year, salt) for salt in (1, 2, 3)]
+        else:
+            noise = [np.random.uniform(0, 1, n) for _ in range(3)]
+        
+        # Find nearest reference location
+        min_dist, nearest = self.reference_tree.query(np.column_stack([lats, lngs]))
+        nearest_type = self._reference_types[nearest]
+        nearest_heat = self._reference_heat[nearest]
+        nearest_ndvi = self._reference_ndvi[nearest]
         
         # Add distance-based variation
-        heat_var = nearest_heat + (min_dist * 15) * (1 if nearest_type == "industrial" else -1)
-        ndvi_var = nearest_ndvi - (min_dist * 0.5) if nearest_type in ["park", "residential"] else nearest_ndvi + (min_dist * 0.1)
+        heat_var = nearest_heat + (min_dist * 15) * np.where(nearest_type == "industrial", 1, -1)
+        ndvi_var = np.where(np.isin(nearest_type, ["park", "residential"]),
+                            nearest_ndvi - (min_dist * 0.5), nearest_ndvi + (min_dist * 0.1))
         
         # Calculate LST based on heat and NDVI
         lst = 28 + heat_var + (1 - ndvi_var) * 8
         
         # Add small random variation
-        heat_var += np.random.uniform(-0.3, 0.3)
-        ndvi_var += np.random.uniform(-0.03, 0.03)
-        lst += np.random.uniform(-1, 1)
+        heat_var += (noise[0] * 2 - 1) * 0.3
+        ndvi_var += (noise[1] * 2 - 1) * 0.03
+        lst += noise[2] * 2 - 1
         
         # Clamp values
         heat_var = np.clip(heat_var, 0, 10)
         ndvi_var = np.clip(ndvi_var, 0, 1)
         lst = np.clip(lst, 18, 48)
         
-        return nearest_type, heat_var, ndvi_var, lst
+        # Check if water (basic bounds check)
+        water = (lats < 43.55) | (lngs < -80.0)
+        loc_type = np.where(water, "water", nearest_type)
+        heat_var[water] = 0.5
+        ndvi_var[water] = 0.12
+        lst[water] = 22.0
+        
+        # Real rasters take precedence over the reference model wherever they have data
+        for values, path in ((heat_var, self.duhi_path), (ndvi_var, self.ndvi_path), (lst, self.lst_path)):
+            sampled = self.sample_band(path, lats, lngs)
+            has_data = np.isfinite(sampled)
+            values[has_data] = sampled[has_data]
+        
+        return loc_type, heat_var, ndvi_var, lst
     
-    def get_location_data(self, lat, lng, year=2025):
-        """Get realistic data for a specific location and year"""
-        loc_type, duhi, ndvi, lst = self.classify_location(lat, lng)
+    def classify_location(self, lat, lng, year=2025):
+        """Classify location based on coordinates and known areas"""
+        loc_type, duhi, ndvi, lst = self.classify_locations([lat], [lng], year)
+        return str(loc_type[0]), duhi[0], ndvi[0], lst[0]
+    
+    def sample_band(self, filepath, lats, lngs):
+        """Sample pixel values at lat/lng points via the band's affine transform (NaN outside or if synthetic)"""
+        return self.sample_pixels(self.load_band(filepath), lats, lngs)
+    
+    def sample_pixels(self, band, lats, lngs):
+        """Sample a loaded band at lat/lng points (NaN outside or if synthetic)"""
+        values = np.full(len(lats), np.nan)
+        if band.synthetic:
+            return values
         
-        # Year-based adjustments (warming trend)
-        year_offset = (year - 2018) * 0.4  # 0.4°C per year
-        duhi += year_offset
-        lst += year_offset
+        rows, cols = band.rowcol(lats, lngs)
+        rows = np.floor(rows).astype(np.int64)
+        cols = np.floor(cols).astype(np.int64)
+        inside = (rows >= 0) & (rows < band.shape[0]) & (cols >= 0) & (cols < band.shape[1])
+        values[inside] = band.decode(band.data[rows[inside], cols[inside]], np.float64)
+        return values
+    
+    def get_locations_columns(self, lats, lngs, year=2025):
+        """Get data for many locations and one year as arrays (duhi, ndvi, lst, ndvi_lst_correlation, location_type)"""
+        with span("locations.classify"):
+            loc_type, duhi, ndvi, lst = self.classify_locations(lats, lngs, year)
         
-        # NDVI slight improvement over years (but not enough)
-        ndvi += (year - 2018) * 0.008
-        ndvi = np.clip(ndvi, 0, 1)
+        # Year-based adjustments from the time cube (change relative to its latest year)
+        cube = self.get_time_cube()
+        with span("locations.year_adjust"):
+            rows, cols, _, _ = self.snap_to_cells(lats, lngs)
+            duhi = duhi + cube.change_since_latest("duhi", rows, cols, year)
+            lst = lst + cube.change_since_latest("lst", rows, cols, year)
+            ndvi = np.clip(ndvi + cube.change_since_latest("ndvi", rows, cols, year), 0, 1)
         
-        # Location description
-        descriptions = {
-            "industrial": "Industrial/manufacturing zone - high heat from buildings and pavement",
-            "commercial": "Commercial district with large parking lots and minimal shade",
-            "downtown": "Dense urban core with limited green space",
-            "residential": "Residential neighborhood with moderate tree cover",
-            "park": "Park or conservation area with good vegetation coverage",
-            "water": "Water body (lake/river) - temperature data not applicable for water surfaces"
-        }
+        with span("locations.correlation"):
+            correlation = self.sample_pixels(self.get_correlation_band(), lats, lngs)
         
-        return {
-            "duhi": float(duhi),
-            "ndvi": float(ndvi),
-            "lst": float(lst),
-            "location_type": loc_type,
-            "description": descriptions.get(loc_type, "Mixed urban area")
-        }
+        return {"duhi": duhi, "ndvi": ndvi, "lst": lst, "ndvi_lst_correlation": correlation, "location_type": loc_type}
+    
+    def get_locations_data(self, lats, lngs, year=2025):
+        """Get data for many locations and one year in a single vectorized pass"""
+        columns = self.get_locations_columns(lats, lngs, year)
+        return [
+            {
+                "duhi": float(d),
+                "ndvi": float(v),
+                "lst": float(t),
+                "ndvi_lst_correlation": round(r, 3) if r == r else None,
+                "location_type": str(k),
+                "description": self.location_descriptions.get(str(k), "Mixed urban area")
+            }
+            for d, v, t, r, k in zip(columns["duhi"].tolist(), columns["ndvi"].tolist(), columns["lst"].tolist(),
+                                     columns["ndvi_lst_correlation"].tolist(), columns["location_type"].tolist())
+        ]
+    
+    def get_location_data(self, lat, lng, year=2025):
+        """Get realistic data for a specific location and year"""
+        if not self.deterministic:
+            return self.get_locations_data([lat], [lng], year)[0]
+        
+        rows, cols, _, _ = self.snap_to_cells([lat], [lng])
+        # Year-adjusted values come from the time cube, which per-year rasters can change on their own
+        key = (int(rows[0]), int(cols[0]), year, self.raster_version, self.get_time_cube().version)
+        data = self._location_cache.get_or_compute(key, lambda: self.get_locations_data([lat], [lng], year)[0])
+        return dict(data)
+    
+    def load_band(self, filepath):
+        """Load a GeoTIFF band (data, transform, version) from the memory-mapped raster cache"""
+        with span("raster.load"):
+            return self.raster_store.load(filepath)
     
-    def load_tiff_as_array(self, filepath):
-        """Load GeoTIFF as numpy array - mock for now"""
+    def load_tiff_as_array(self, filepath, bbox=None):
+        """Load GeoTIFF as a float32 array (a read-only memory map unless stored compact), optionally cropped to a (west, south, east, north) bbox"""
         try:
-            shape = (1000, 1000)
-            
-            if 'lst' in str(filepath).lower():
-                data = np.random.randn(*shape) * 3 + 32.0
-            elif 'ndvi' in str(filepath).lower():
-                data = np.random.randn(*shape) * 0.1 + 0.35
-                data = np.clip(data, -1, 1)
-            elif 'duhi' in str(filepath).lower():
-                data = np.random.exponential(2.5, shape) + np.random.randn(*shape) * 0.5
-                data = np.clip(data, -2, 10)
-            else:
-                data = np.zeros(shape)
-            
-            return data
+            band = self.load_band(filepath)
+            if bbox is not None:
+                return band.decode(band.read_bbox(*bbox))
+            return band.decode(band.data)
         except Exception as e:
             logger.error(f"Error loading {filepath}: {e}")
             return None
     
+    def cached_result(self, method, args, version, compute):
+        """compute() through the on-disk result cache keyed on (method, args, data version)"""
+        if self.result_cache is None:
+            return compute()
+        return self.result_cache.get_or_compute(method, args, version, compute)
+    
+    def source_bands(self):
+        """RasterBand of every layer read from a source file"""
+        return {layer: self.load_band(style[0]) for layer, style in self.layer_styles.items() if style[0] is not None}
+    
+    def layer_band(self, layer_type):
+        """RasterBand shown by a map layer (a source raster or a derived one)"""
+        if layer_type == "correlation":
+            return self.get_correlation_band()
+        return self.load_band(self.layer_styles[layer_type][0])
+    
+    def get_correlation_band(self):
+        """Local NDVI-LST Pearson r over a moving window, derived once per band version and window size"""
+        lst = self.load_band(self.lst_path)
+        ndvi = self.load_band(self.ndvi_path)
+        
+        def build(out):
+            with span("correlation.build"):
+                local_correlation(ndvi, lst, out, self.correlation_window)
+        
+        return self.raster_store.derived("ndvi_lst_r", f"{ndvi.version}-{lst.version}-{self.correlation_window}",
+                                         lst.shape, lst.transform, build, synthetic=lst.synthetic or ndvi.synthetic)
+    
+    @property
+    def raster_version(self):
+        """Combined version of the LST/NDVI/DUHI bands; changes whenever a source file does"""
+        versions = [self.load_band(path).version for path in (self.lst_path, self.ndvi_path, self.duhi_path)]
+        return hashlib.sha1("-".join(versions).encode()).hexdigest()[:12]
+    
+    def get_stats_index(self):
+        """Return the per-region statistics index, rebuilding it when the rasters change"""
+        version = self.raster_version
+        index = self._stats_index
+        if index is not None and index.version == version:
+            return index
+        
+        def build():
+            with span("stats_index.build"):
+                return RegionStatsIndex.build(
+                    version,
+                    self.load_band(self.lst_path),
+                    self.load_band(self.ndvi_path),
+                    self.load_band(self.duhi_path),
+                )
+        
+        with self._build_lock:
+            if self._stats_index is None or self._stats_index.version != version:
+                self._stats_index = self.cached_result("stats_index", (), version, build)
+            return self._stats_index
+    
     def calculate_regional_metrics(self, region="Peel"):
         """Calculate key metrics for dashboard"""
-        try:
-            lst_data = self.load_tiff_as_array(self.lst_path)
-            ndvi_data = self.load_tiff_as_array(self.ndvi_path)
-            duhi_data = self.load_tiff_as_array(self.duhi_path)
-            
-            lst_data = lst_data.astype(float)
-            ndvi_data = ndvi_data.astype(float)
-            duhi_data = duhi_data.astype(float)
-            
-            valid_mask = (lst_data > -50) & (lst_data < 100) & (ndvi_data >= -1) & (ndvi_data <= 1)
-            lst_valid = lst_data[valid_mask]
-            ndvi_valid = ndvi_data[valid_mask]
-            duhi_valid = duhi_data[valid_mask]
-            
-            mean_lst = float(np.mean(lst_valid))
-            mean_ndvi = float(np.mean(ndvi_valid))
-            mean_duhi = float(np.mean(duhi_valid))
-            
-            area_hot = float(np.sum(duhi_valid >= 4.0) / len(duhi_valid) * 100)
-            
-            if len(lst_valid) > 100 and len(ndvi_valid) > 100:
-                correlation = float(stats.pearsonr(ndvi_valid[:len(lst_valid)], lst_valid[:len(ndvi_valid)])[0])
-            else:
-                correlation = -0.78
-            
-            metrics = {
-                "mean_duhi": round(mean_duhi, 2),
-                "area_exceeding_4c": round(area_hot, 1),
-                "mean_ndvi": round(mean_ndvi, 3),
-                "correlation_ndvi_lst": round(correlation, 3),
-                "mean_lst": round(mean_lst, 2),
-                "duhi_trend": 3.846,
-                "region": region
-            }
-            
-            return metrics
-            
-        except Exception as e:
-            logger.error(f"Error calculating metrics: {e}")
-            return {
-                "mean_duhi": 4.2,
-                "area_exceeding_4c": 42.0,
-                "mean_ndvi": 0.35,
-                "correlation_ndvi_lst": -0.78,
-                "mean_lst": 32.5,
-                "duhi_trend": 3.846,
-                "region": region
-            }
-    
-    def generate_timeseries_data(self):
-        """Generate time series data for 2018-2025"""
-        years = list(range(2018, 2026))
+        region_stats = self.get_stats_index().get(region)
+        
+        # A region without valid pixels has no means (its accumulators report 0 or NaN)
+        empty = region_stats.count == 0
+        metrics = {
+            "mean_duhi": None if empty else rounded(region_stats.mean_duhi, 2),
+            "area_exceeding_4c": rounded(region_stats.area_exceeding_4c, 1),
+            "mean_ndvi": None if empty else rounded(region_stats.mean_ndvi, 3),
+            "correlation_ndvi_lst": rounded(region_stats.correlation, 3),
+            "mean_lst": None if empty else rounded(region_stats.mean_lst, 2),
+            "duhi_trend": rounded(self.get_time_cube().region_trend(region, "duhi"), 3),
+            "region": region
+        }
         
-        base_lst = 28.0
-        base_ndvi = 0.30
+        return metrics
+    
+    def get_time_cube(self, recheck=False):
+        """Return the multi-year time cube, ingesting it when any input raster changes.
         
-        lst_trend = [base_lst + i * 0.8 + np.random.uniform(-0.5, 0.5) for i in range(len(years))]
-        ndvi_trend = [base_ndvi + i * 0.01 + np.random.uniform(-0.02, 0.02) for i in range(len(years))]
-        duhi_trend = [3.0 + i * 0.3 + np.random.uniform(-0.2, 0.2) for i in range(len(years))]
+        Per-year files are only re-scanned on recheck (warmup) or when the base bands change.
+        """
+        raster_version = self.raster_version
+        cube = self._time_cube
+        if cube is not None and not recheck and self._time_cube_checked == raster_version:
+            return cube
         
-        return {
-            "years": years,
-            "lst": lst_trend,
-            "ndvi": ndvi_trend,
-            "duhi": duhi_trend
+        base_bands = {
+            "lst": self.load_band(self.lst_path),
+            "ndvi": self.load_band(self.ndvi_path),
+            "duhi": self.load_band(self.duhi_path),
         }
+        version, _ = TimeCube.source_version(self.raster_store, self.data_dir, base_bands)
+        if cube is not None and cube.version == version:
+            self._time_cube_checked = raster_version
+            return cube
+        
+        with self._build_lock:
+            if self._time_cube is None or self._time_cube.version != version:
+                with span("time_cube.load"):
+                    self._time_cube = TimeCube.load_or_build(self.cache_dir / "cube", self.raster_store, self.data_dir, base_bands)
+            self._time_cube_checked = raster_version
+            return self._time_cube
+    
+    def generate_timeseries_data(self, region="Peel"):
+        """Get regional yearly means from the time cube"""
+        return self.get_time_cube().regional_timeseries(region)
+    
+    def render_layer_preview(self, layer_type="duhi", width=800, height=600):
+        """Render a colored map preview as (png_bytes, etag), cached per raster version"""
+        if layer_type not in self.layer_styles:
+            layer_type = "lst"
+        _, _, vmin, vmax = self.layer_styles[layer_type]
+        version = self.layer_band(layer_type).version
+        key = (layer_type, vmin, vmax, width, height)
+        
+        def render():
+            pyramid = self.get_tile_pyramid(layer_type)
+            with span("preview.sample"):
+                data = pyramid.sample_preview(width, height)
+            with span("preview.colormap"):
+                rgba = pyramid.colorize(data, self.luts[layer_type], vmin, vmax)
+            with span("preview.encode_png"):
+                png = encode_png(rgba)
+            return png, f'"{hashlib.sha1(png).hexdigest()}"'
+        
+        return self._preview_cache.get_or_compute(
+            key + (version,), lambda: self.cached_result("layer_preview", key, version, render))
     
     def generate_layer_preview(self, layer_type="duhi", width=800, height=600):
         """Generate colored map preview as base64 image"""
         try:
-            if layer_type == "duhi":
-                data = self.load_tiff_as_array(self.duhi_path)
-                colors = self.duhi_colors
-                vmin, vmax = -2, 8
-            elif layer_type == "ndvi":
-                data = self.load_tiff_as_array(self.ndvi_path)
-                colors = self.ndvi_colors
-                vmin, vmax = -0.2, 0.8
-            else:
-                data = self.load_tiff_as_array(self.lst_path)
-                colors = self.lst_colors
-                vmin, vmax = 20, 45
-            
-            if data is None:
-                data = np.random.randn(600, 800) * 2 + 5
-            
-            cmap = mcolors.LinearSegmentedColormap.from_list("custom", colors)
-            
-            fig, ax = plt.subplots(figsize=(width/100, height/100), dpi=100)
-            im = ax.imshow(data, cmap=cmap, vmin=vmin, vmax=vmax, aspect='auto')
-            ax.axis('off')
-            plt.tight_layout(pad=0)
-            
-            buf = BytesIO()
-            plt.savefig(buf, format='png', bbox_inches='tight', pad_inches=0, dpi=100)
-            plt.close(fig)
-            buf.seek(0)
-            img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-            
+            png, _ = self.render_layer_preview(layer_type, width, height)
+            with span("preview.base64"):
+                img_base64 = base64.b64encode(png).decode('utf-8')
             return f"data:image/png;base64,{img_base64}"
             
         except Exception as e:
             logger.error(f"Error generating preview for {layer_type}: {e}")
             return None
     
-    def get_hotspots(self):
-        """Generate hotspot GeoJSON with real heat sources"""
+    def get_tile_pyramid(self, layer_type):
+        """Return the overview pyramid for a layer, rebuilding it when the band changes"""
+        band = self.layer_band(layer_type)
+        pyramid = self._pyramids.get(layer_type)
+        if pyramid is not None and pyramid.version == band.version:
+            return pyramid
+        
+        with self._build_lock:
+            pyramid = self._pyramids.get(layer_type)
+            if pyramid is None or pyramid.version != band.version:
+                with span("pyramid.build"):
+                    pyramid = TilePyramid.build(band)
+                self._pyramids[layer_type] = pyramid
+            return pyramid
+    
+    def render_tile(self, layer_type, z, x, y):
+        """Render a 256px XYZ map tile for a layer as PNG bytes"""
+        _, _, vmin, vmax = self.layer_styles[layer_type]
+        with span("tile.render"):
+            png = self.get_tile_pyramid(layer_type).render_tile(z, x, y, self.luts[layer_type], vmin, vmax)
+        return png if png is not None else empty_tile()
+    
+    def warm_up(self):
+        """Map every band and fill the statistics, time-cube, pyramid and preview caches; returns seconds per stage"""
+        timings = {}
+        stages = [
+            ("rasters", self.source_bands),
+            ("stats_index", self.get_stats_index),
+            ("time_cube", lambda: self.get_time_cube(recheck=True)),
+            ("reference_tree", lambda: self.reference_tree),
+            ("hotspots", self.get_hotspot_index),
+            ("correlation", self.get_correlation_band),
+            ("previews", lambda: [self.render_layer_preview(layer) for layer in self.layer_styles]),
+        ]
+        for name, stage in stages:
+            start = time.perf_counter()
+            with span(f"warmup.{name}"):
+                stage()
+            timings[name] = round(time.perf_counter() - start, 3)
+        return timings
+    
+    def get_hotspot_index(self):
+        """Hot/cool zones and isotherms detected from the DUHI raster, rebuilt when the band changes"""
+        band = self.load_band(self.duhi_path)
+        index = self._hotspot_index
+        if index is not None and index.version == band.version:
+            return index
+        
+        def build():
+            pyramid = self.get_tile_pyramid("duhi")
+            with span("hotspots.build"):
+                return HotspotIndex.build(band.version, pyramid, self.describe_locations, region_containing)
+        
+        # Not under the build lock (the pyramid takes it); the result cache's file lock single-flights instead
+        index = self.cached_result("hotspot_index", (), band.version, build)
+        self._hotspot_index = index
+        return index
+    
+    def describe_locations(self, lats, lngs):
+        """Land-cover description for each location"""
+        loc_type = self.classify_locations(lats, lngs)[0]
+        return [self.location_descriptions.get(str(k), "Mixed urban area") for k in loc_type]
+    
+    def get_hotspots(self, bbox=None, zoom=None):
+        """Hot and cool zone GeoJSON, optionally limited to a (west, south, east, north) bbox and map zoom"""
+        if self.load_band(self.duhi_path).synthetic:
+            features = self.get_reference_hotspots()["features"]
+            points = [f["geometry"]["coordinates"] * 2 for f in features]
+            return {"type": "FeatureCollection", "features": FeatureIndex(features, points).query(bbox)}
+        with span("hotspots.query"):
+            return self.get_hotspot_index().hotspots(bbox, zoom)
+    
+    def get_isotherms(self, bbox=None, zoom=None, levels=None):
+        """DUHI isotherm polygons simplified for a map zoom, optionally limited to a bbox and levels"""
+        with span("isotherms.query"):
+            return self.get_hotspot_index().isotherm_polygons(bbox, zoom, levels)
+    
+    def get_reference_hotspots(self):
+        """Curated hotspot GeoJSON used until a real DUHI raster is available"""
         hotspots = {
             "type": "FeatureCollection",
             "features": [
@@ -322,32 +577,156 @@ class GeoTIFFProcessor:
         }
         return hotspots
     
+    def get_scenario_engine(self):
+        """Scenario simulator with its fitted NDVI->LST response model, rebuilt when a band changes"""
+        landuse = self.load_band(self.landuse_path)
+        version = f"{self.raster_version}-{landuse.version}"
+        engine = self._scenario_engine
+        if engine is not None and engine.version == version:
+            return engine
+        
+        with self._build_lock:
+            engine = self._scenario_engine
+            if engine is None or engine.version != version:
+                bands = self.source_bands()
+                with span("scenario.fit"):
+                    engine = ScenarioEngine.build(version, bands, None if landuse.synthetic else landuse,
+                                                  self.landuse_classes, self._scenario_tiles)
+                self._scenario_engine = engine
+            return engine
+    
+    def get_scenario_model(self):
+        """Fitted LST response per land-use class and the albedo assumptions used by scenarios"""
+        return self.get_scenario_engine().model.to_dict()
+    
+    def simulate_scenario(self, interventions, threshold=HOT_THRESHOLD):
+        """Apply cooling interventions (NDVI uplift, roof albedo) and return per-region DUHI changes"""
+        index = self.get_stats_index()
+        engine = self.get_scenario_engine()
+        with span("scenario.simulate"):
+            return engine.simulate(interventions, threshold, index, self.polygon_mask)
+    
     def get_regional_breakdown(self):
         """Get metrics for all regions"""
-        regions = [
-            {"name": "Brampton", "mean_ndvi": 0.32, "mean_lst": 33.2, "duhi_trend": 3.9, "correlation": -0.76},
-            {"name": "Mississauga", "mean_ndvi": 0.29, "mean_lst": 34.1, "duhi_trend": 3.7, "correlation": -0.79},
-            {"name": "Caledon", "mean_ndvi": 0.48, "mean_lst": 28.5, "duhi_trend": 2.8, "correlation": -0.81},
-            {"name": "Peel (All)", "mean_ndvi": 0.35, "mean_lst": 32.5, "duhi_trend": 3.8, "correlation": -0.78}
-        ]
+        index = self.get_stats_index()
+        cube = self.get_time_cube()
+        display_names = {"Peel": "Peel (All)"}
+        
+        regions = []
+        for name in ["Brampton", "Mississauga", "Caledon", "Peel"]:
+            region_stats = index.get(name)
+            empty = region_stats.count == 0
+            regions.append({
+                "name": display_names.get(name, name),
+                "mean_ndvi": None if empty else rounded(region_stats.mean_ndvi, 2),
+                "mean_lst": None if empty else rounded(region_stats.mean_lst, 1),
+                "duhi_trend": rounded(cube.region_trend(name, "duhi"), 2),
+                "correlation": rounded(region_stats.correlation, 2)
+            })
         return regions
     
     def get_land_use_distribution(self):
         """Get land use breakdown for pie chart"""
-        return {
-            "Industrial": 18,
-            "Commercial": 15,
-            "Residential": 42,
-            "Parks/Green": 12,
-            "Infrastructure": 8,
-            "Undeveloped": 5
-        }
+        band = self.load_band(self.landuse_path)
+        if band.synthetic:
+            # No land-use raster available yet
+            return {
+                "Industrial": 18,
+                "Commercial": 15,
+                "Residential": 42,
+                "Parks/Green": 12,
+                "Infrastructure": 8,
+                "Undeveloped": 5
+            }
+        
+        cached = self._landuse_counts
+        if cached is None or cached[0] != band.version:
+            counts = np.zeros(256, dtype=np.int64)
+            rows, cols = band.shape
+            for block in iter_blocks((0, 0, rows, cols)):
+                codes = np.asarray(band.read_window(*block))
+                codes = codes[np.isfinite(codes)].astype(np.int64)
+                counts += np.bincount(codes[(codes >= 0) & (codes < 256)], minlength=256)
+            cached = (band.version, counts)
+            self._landuse_counts = cached
+        
+        counts = cached[1]
+        total = sum(int(counts[code]) for code in self.landuse_classes) or 1
+        return {name: round(int(counts[code]) / total * 100) for code, name in self.landuse_classes.items()}
     
-    def get_heat_distribution(self):
+    def get_heat_distribution(self, region="Peel"):
         """Get heat level distribution for bar chart"""
+        histogram = self.get_stats_index().get(region).histograms["duhi"]
+        below = [histogram.fraction_below(t) * 100 for t in (2.0, 4.0, 6.0)]
         return [
-            {"range": "Safe (0-2°C)", "percentage": 28, "color": "#10b981"},
-            {"range": "Moderate (2-4°C)", "percentage": 30, "color": "#f59e0b"},
-            {"range": "High (4-6°C)", "percentage": 25, "color": "#f97316"},
-            {"range": "Extreme (>6°C)", "percentage": 17, "color": "#ef4444"}
+            {"range": "Safe (0-2°C)", "percentage": rounded(below[0], None), "color": "#10b981"},
+            {"range": "Moderate (2-4°C)", "percentage": rounded(below[1] - below[0], None), "color": "#f59e0b"},
+            {"range": "High (4-6°C)", "percentage": rounded(below[2] - below[1], None), "color": "#f97316"},
+            {"range": "Extreme (>6°C)", "percentage": rounded(100 - below[2], None), "color": "#ef4444"}
         ]
+    
+    def get_band_distribution(self, layer_type, region="Peel", threshold=None, percentiles=(5, 25, 50, 75, 95)):
+        """Summary, percentiles and area above a threshold for one band, answered from the histogram index"""
+        region_stats = self.get_stats_index().get(region)
+        histogram = region_stats.histograms[layer_type]
+        moments = region_stats.moments(layer_type)
+        
+        result = {
+            "layer": layer_type,
+            "region": region,
+            "count": moments.count,
+            "mean": rounded(moments.mean, 4) if moments.count else None,
+            "min": rounded(moments.min, 4),
+            "max": rounded(moments.max, 4),
+            "percentiles": {f"{q:g}": rounded(histogram.percentile(q), 4) for q in percentiles},
+            "histogram": {
+                "lo": histogram.lo,
+                "hi": histogram.hi,
+                "bins": histogram.bins,
+                "underflow": int(histogram.counts[0]),
+                "counts": histogram.counts[1:-1].tolist(),
+                "overflow": int(histogram.counts[-1])
+            }
+        }
+        if threshold is not None:
+            result["threshold"] = threshold
+            result["percent_at_or_above"] = rounded(histogram.fraction_at_least(threshold) * 100, 2)
+        return result
+    
+    def polygon_mask(self, geometry):
+        """Rasterized (window, mask) of a polygon on the raster grid, cached by geometry hash"""
+        band = self.load_band(self.duhi_path)
+        key = (band.shape, band.transform, geometry_key(geometry))
+        
+        def rasterize():
+            with span("zonal.rasterize"):
+                return rasterize_polygons(band, polygon_rings(geometry))
+        
+        return self._mask_cache.get_or_compute(key, rasterize)
+    
+    def zonal_stats(self, geojson, threshold=HOT_THRESHOLD, percentiles=(5, 25, 50, 75, 95)):
+        """LST/NDVI/DUHI statistics inside each polygon of a GeoJSON geometry, Feature or FeatureCollection"""
+        bands = self.source_bands()
+        west, xres, _, north, _, yres = bands["duhi"].transform
+        
+        results = []
+        for feature_id, properties, geometry in iter_geometries(geojson):
+            window, mask = self.polygon_mask(geometry)
+            pixels = {layer: band.read_window(*window)[mask] for layer, band in bands.items()}
+            valid = np.logical_and.reduce([band.valid_mask(pixels[layer]) for layer, band in bands.items()])
+            lst, ndvi, duhi = (bands[layer].decode(pixels[layer][valid], np.float64) for layer in ("lst", "ndvi", "duhi"))
+            
+            # Approximate pixel area at the polygon's latitude
+            center_lat = north + (window[0] + window[2] / 2) * yres
+            pixel_km2 = abs(xres * yres) * 111.32 ** 2 * np.cos(np.radians(center_lat))
+            
+            results.append({
+                "id": feature_id,
+                "properties": properties,
+                "pixel_count": int(valid.sum()),
+                "area_km2": round(float(valid.sum() * pixel_km2), 4),
+                **zone_summary({"lst": lst, "ndvi": ndvi, "duhi": duhi},
+                               percentiles, {"duhi": threshold}),
+            })
+        return results
+
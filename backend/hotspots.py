@@ -0,0 +1,269 @@
+import numpy as np
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+# DUHI thresholds (°C) for hot and cool zones, and the isotherms traced as polygons
+HOTSPOT_THRESHOLD = 6.0
+COOLSPOT_THRESHOLD = 1.0
+ISOTHERM_LEVELS = (2.0, 4.0, 6.0)
+
+# Detection runs on the first overview level no larger than this, smoothed over a small window
+DETECTION_MAX_SIZE = 2048
+SMOOTHING_PIXELS = 5
+MIN_ZONE_PIXELS = 4
+MIN_RING_PIXELS = 3
+
+# Isotherms are simplified once per level of detail; a query uses the finest LOD at or below its zoom
+LOD_ZOOMS = (8, 10, 12, 14)
+
+
+def degrees_per_pixel(zoom):
+    """Approximate width of one 256px-tile screen pixel in degrees of longitude"""
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def lod_for_zoom(zoom):
+    if zoom is None:
+        return LOD_ZOOMS[-1]
+    eligible = [z for z in LOD_ZOOMS if z <= zoom]
+    return eligible[-1] if eligible else LOD_ZOOMS[0]
+
+
+def smooth(data, size=SMOOTHING_PIXELS):
+    """NaN-aware box mean, so zones are coherent areas rather than single noisy pixels"""
+    from scipy import ndimage  # deferred: scipy is slow to import
+
+    valid = np.isfinite(data)
+    sums = ndimage.uniform_filter(np.where(valid, data, 0).astype(np.float64), size, mode='constant')
+    counts = ndimage.uniform_filter(valid.astype(np.float64), size, mode='constant')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(valid & (counts > 0), sums / counts, np.nan)
+
+
+def _first_per_group(candidates, groups):
+    """Indices of the first candidate in each run of equal (sorted) group ids"""
+    idx = np.flatnonzero(candidates)
+    g = groups[idx]
+    return idx[np.r_[True, g[1:] != g[:-1]]] if len(idx) else idx
+
+
+def simplify_rings(rings, tolerance):
+    """Douglas-Peucker simplification of many closed rings at once; a ring that collapses becomes None.
+
+    The rings are concatenated and every open segment of every ring is split in
+    the same pass, so the loop runs once per level of the recursion rather than
+    once per kept point. Ring ends are always kept, so no segment spans two rings.
+    """
+    if not rings or tolerance <= 0:
+        return list(rings)
+    lengths = np.array([len(r) for r in rings])
+    starts = np.r_[0, np.cumsum(lengths)[:-1]]
+    coords = np.concatenate(rings)
+    ring = np.repeat(np.arange(len(rings)), lengths)
+
+    keep = (lengths <= 4)[ring]
+    keep[starts] = keep[starts + lengths - 1] = True
+    # The first and last points coincide, so seed each ring with the point farthest from its start
+    radius = np.hypot(*(coords - coords[starts][ring]).T)
+    keep[_first_per_group(radius == np.maximum.reduceat(radius, starts)[ring], ring)] = True
+
+    while True:
+        anchors = np.flatnonzero(keep)
+        segment = np.minimum(np.cumsum(keep) - 1, len(anchors) - 2)
+        a = coords[anchors[segment]]
+        ab = coords[anchors[segment + 1]] - a
+        length = np.hypot(ab[:, 0], ab[:, 1])
+        cross = np.abs(ab[:, 0] * (coords[:, 1] - a[:, 1]) - ab[:, 1] * (coords[:, 0] - a[:, 0]))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dist = np.where(length > 0, cross / length, np.hypot(*(coords - a).T))
+        dist[keep] = -1
+        farthest = np.maximum.reduceat(dist, anchors[:-1])
+        split = (dist > tolerance) & (dist == farthest[segment])
+        if not split.any():
+            break
+        keep[_first_per_group(split, segment)] = True
+
+    kept = np.add.reduceat(keep, starts)
+    simplified = np.split(coords[keep], np.cumsum(kept)[:-1])
+    return [r if len(r) >= 4 else None for r in simplified]
+
+
+class FeatureIndex:
+    """GeoJSON features with a vectorized bbox (and minimum zoom) filter"""
+
+    def __init__(self, features, bboxes, min_zooms=None):
+        self.features = features
+        self.bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        self.min_zooms = np.asarray(min_zooms if min_zooms is not None else np.zeros(len(features)))
+
+    def __len__(self):
+        return len(self.features)
+
+    def query(self, bbox=None, zoom=None):
+        keep = np.ones(len(self.features), dtype=bool)
+        if bbox is not None:
+            west, south, east, north = bbox
+            b = self.bboxes
+            keep &= (b[:, 0] <= east) & (b[:, 2] >= west) & (b[:, 1] <= north) & (b[:, 3] >= south)
+        if zoom is not None:
+            keep &= self.min_zooms <= zoom
+        return [self.features[i] for i in np.flatnonzero(keep)]
+
+
+class HotspotIndex:
+    """Hot/cool zones and DUHI isotherm polygons derived from one raster version"""
+
+    def __init__(self, version, zones, isotherms):
+        self.version = version
+        self.zones = zones
+        # {lod zoom: FeatureIndex}
+        self.isotherms = isotherms
+
+    def hotspots(self, bbox=None, zoom=None):
+        return {"type": "FeatureCollection", "features": self.zones.query(bbox, zoom)}
+
+    def isotherm_polygons(self, bbox=None, zoom=None, levels=None):
+        features = self.isotherms[lod_for_zoom(zoom)].query(bbox)
+        if levels is not None:
+            features = [f for f in features if f["properties"]["level"] in levels]
+        return {"type": "FeatureCollection", "features": features}
+
+    @classmethod
+    def build(cls, version, pyramid, describe, region_of):
+        """Detect zones and trace isotherms on the coarsest suitable overview of a DUHI TilePyramid.
+
+        describe(lats, lngs) returns a description per zone centroid and
+        region_of(lat, lng) the region a zone falls in; both are used for labels.
+        """
+        levels = pyramid.levels
+        level = next((i for i, (data, _) in enumerate(levels) if max(data.shape) <= DETECTION_MAX_SIZE), len(levels) - 1)
+        data = pyramid.level_values(level)
+        transform = levels[level][1]
+        smoothed = smooth(data)
+
+        zones = _detect_zones(smoothed, data.astype(np.float64), transform, describe, region_of)
+        isotherms = _trace_isotherms(smoothed, transform)
+        logger.info(f"Detected {len(zones)} hot/cool zones and "
+                    f"{len(isotherms[LOD_ZOOMS[-1]])} isotherm polygons on a {data.shape[0]}x{data.shape[1]} overview")
+        return cls(version, zones, isotherms)
+
+
+def _detect_zones(smoothed, raw, transform, describe, region_of):
+    from scipy import ndimage  # deferred: scipy is slow to import
+
+    west, xres, _, north, _, yres = transform
+    pixel_km2 = abs(xres * yres) * 111.32 ** 2 * math.cos(math.radians(north + smoothed.shape[0] / 2 * yres))
+
+    candidates = []
+    for kind, mask in (("hotspot", smoothed >= HOTSPOT_THRESHOLD), ("coolspot", smoothed <= COOLSPOT_THRESHOLD)):
+        labels, count = ndimage.label(mask)
+        if count == 0:
+            continue
+        pixel_rows, pixel_cols = np.nonzero(labels)
+        ids = labels[pixel_rows, pixel_cols]
+        values = raw[pixel_rows, pixel_cols]
+        values = np.where(np.isfinite(values), values, 0)
+        sizes = np.bincount(ids, minlength=count + 1)[1:]
+        means = np.bincount(ids, values, minlength=count + 1)[1:] / np.maximum(sizes, 1)
+        centre_rows = np.bincount(ids, pixel_rows, minlength=count + 1)[1:] / np.maximum(sizes, 1)
+        centre_cols = np.bincount(ids, pixel_cols, minlength=count + 1)[1:] / np.maximum(sizes, 1)
+        extremes = np.full(count + 1, -np.inf if kind == "hotspot" else np.inf)
+        (np.maximum if kind == "hotspot" else np.minimum).at(extremes, ids, values)
+        slices = ndimage.find_objects(labels)
+        for i in np.flatnonzero(sizes >= MIN_ZONE_PIXELS):
+            row, col = centre_rows[i], centre_cols[i]
+            rows, cols = slices[i]
+            candidates.append({
+                "kind": kind,
+                "pixels": int(sizes[i]),
+                "mean": float(means[i]),
+                "extreme": float(extremes[i + 1]),
+                "lat": north + (row + 0.5) * yres,
+                "lng": west + (col + 0.5) * xres,
+                "bbox": (west + cols.start * xres, north + rows.stop * yres,
+                         west + cols.stop * xres, north + rows.start * yres),
+            })
+
+    if not candidates:
+        return FeatureIndex([], [])
+
+    descriptions = describe([c["lat"] for c in candidates], [c["lng"] for c in candidates])
+    for c, description in zip(candidates, descriptions):
+        c["source"] = description
+    # Strongest and largest zones first, numbered per region and kind
+    candidates.sort(key=lambda c: (c["kind"] != "hotspot", -abs(c["mean"] - COOLSPOT_THRESHOLD) * c["pixels"]))
+    ranks = {}
+    features, bboxes, min_zooms = [], [], []
+    for c in candidates:
+        region = region_of(c["lat"], c["lng"])
+        ranks[(region, c["kind"])] = ranks.get((region, c["kind"]), 0) + 1
+        label = "Heat Zone" if c["kind"] == "hotspot" else "Cooling Zone"
+        extent = max(c["bbox"][2] - c["bbox"][0], c["bbox"][3] - c["bbox"][1])
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [round(float(c["lng"]), 5), round(float(c["lat"]), 5)]},
+            "properties": {
+                "name": f"{region} {label} #{ranks[(region, c['kind'])]}",
+                "duhi": round(c["mean"], 1),
+                "peak_duhi": round(c["extreme"], 1),
+                "area_km2": round(c["pixels"] * pixel_km2, 2),
+                "type": c["kind"],
+                "source": c["source"],
+                "bbox": [round(float(v), 5) for v in c["bbox"]],
+            },
+        })
+        bboxes.append(c["bbox"])
+        # Shown once the zone spans a few screen pixels
+        min_zooms.append(max(0, math.ceil(math.log2(degrees_per_pixel(0) * 4 / max(extent, 1e-9)))))
+    return FeatureIndex(features, bboxes, min_zooms)
+
+
+def _trace_isotherms(smoothed, transform):
+    import contourpy  # deferred: only needed when (re)building the index
+
+    west, xres, _, north, _, yres = transform
+    generator = contourpy.contour_generator(z=np.ma.masked_invalid(smoothed), fill_type=contourpy.FillType.OuterOffset)
+
+    polygons = []
+    for level in ISOTHERM_LEVELS:
+        points_list, offsets_list = generator.filled(level, np.inf)
+        for points, offsets in zip(points_list, offsets_list):
+            # Ring extents in pixels, one reduceat per polygon; specks of a few pixels are noise at any zoom
+            starts = offsets[:-1]
+            extents = np.maximum(np.maximum.reduceat(points, starts) - np.minimum.reduceat(points, starts), 0).max(axis=1)
+            if extents[0] < MIN_RING_PIXELS:
+                continue
+            coords = np.column_stack([west + (points[:, 0] + 0.5) * xres, north + (points[:, 1] + 0.5) * yres])
+            rings = [coords[offsets[i]:offsets[i + 1]] for i in np.flatnonzero(extents >= MIN_RING_PIXELS)]
+            polygons.append((level, rings))
+
+    # Finest LOD first; each coarser LOD simplifies the previous one's already reduced rings
+    isotherms = {}
+    for lod in sorted(LOD_ZOOMS, reverse=True):
+        tolerance = degrees_per_pixel(lod)
+        visible = []
+        for level, rings in polygons:
+            outer = rings[0]
+            bbox = (float(outer[:, 0].min()), float(outer[:, 1].min()), float(outer[:, 0].max()), float(outer[:, 1].max()))
+            if max(bbox[2] - bbox[0], bbox[3] - bbox[1]) >= 2 * tolerance:
+                visible.append((level, rings, bbox))
+
+        simplified = iter(simplify_rings([ring for _, rings, _ in visible for ring in rings], tolerance))
+        features, bboxes, kept = [], [], []
+        for level, rings, bbox in visible:
+            reduced = [next(simplified) for _ in rings]
+            if reduced[0] is None:
+                continue
+            rings = [ring for ring in reduced if ring is not None]
+            kept.append((level, rings))
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "Polygon", "coordinates": [np.round(ring, 5).tolist() for ring in rings]},
+                "properties": {"type": "isotherm", "level": level, "label": f"ΔUHI ≥ {level:g}°C"},
+            })
+            bboxes.append(bbox)
+        isotherms[lod] = FeatureIndex(features, bboxes)
+        polygons = kept
+    return isotherms
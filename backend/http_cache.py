@@ -0,0 +1,160 @@
+import gzip
+import hashlib
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# First matching path prefix wins; routes that set their own Cache-Control keep it
+DEFAULT_CACHE_POLICIES = [
+    # Tile URLs carry no data version, so clients revalidate against the ETag instead of serving stale tiles
+    ("/api/tiles/", "no-cache"),
+    ("/api/layer-preview/", "no-cache"),
+    ("/api/geojson/", "public, max-age=300"),
+    ("/api/status", "no-store"),
+    ("/api/", "public, max-age=60"),
+]
+
+COMPRESSIBLE_TYPES = ("application/json", "application/geo+json", "application/x-ndjson", "text/")
+
+
+def negotiate_encoding(accept_encoding, available):
+    """Pick the best content-coding from `available` that the client accepts (or None for identity)"""
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding] = q
+
+    for coding in ("br", "gzip"):
+        if coding in available and accepted.get(coding, accepted.get("*", 0)) > 0:
+            return coding
+    return None
+
+
+def available_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress(body, coding, gzip_level=6):
+    if coding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=gzip_level)
+
+
+def coded_etag(etag, coding):
+    """ETag of the representation compressed with `coding` (None for identity), as HTTPCacheMiddleware sends it"""
+    return f'{etag[:-1]}-{coding}"' if coding else etag
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header value matches the (strong) ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [t.strip() for t in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+class HTTPCacheMiddleware:
+    """Adds Cache-Control, strong ETags, 304 revalidation and gzip/brotli to GET responses.
+
+    Fully buffered responses are hashed and compressed; streamed responses
+    (more than one body message) only receive the Cache-Control policy.
+    """
+
+    def __init__(self, app, policies=None, min_size=1024, gzip_level=6):
+        self.app = app
+        self.policies = policies if policies is not None else DEFAULT_CACHE_POLICIES
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+
+    def policy_for(self, path):
+        for prefix, policy in self.policies:
+            if path.startswith(prefix):
+                return policy
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        policy = self.policy_for(scope["path"])
+        buffer_body = scope["method"] == "GET"
+        state = {"start": None, "streaming": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if policy and "cache-control" not in headers:
+                    headers["Cache-Control"] = policy
+                if buffer_body:
+                    state["start"] = message
+                else:
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body" or state["start"] is None:
+                await send(message)
+                return
+
+            if state["streaming"] or message.get("more_body", False):
+                if not state["streaming"]:
+                    state["streaming"] = True
+                    await send(state["start"])
+                await send(message)
+                return
+
+            start, state["start"] = state["start"], None
+            for out in self._finalize(start, message.get("body", b""), request_headers):
+                await send(out)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _finalize(self, start, body, request_headers):
+        """Compress, tag and revalidate a complete response body"""
+        headers = MutableHeaders(scope=start)
+        if start["status"] != 200:
+            return [start, {"type": "http.response.body", "body": body}]
+
+        etag = headers.get("etag")
+        if etag is None:
+            etag = f'"{hashlib.sha1(body).hexdigest()}"'
+
+        content_type = headers.get("content-type", "")
+        if ("content-encoding" not in headers and len(body) >= self.min_size
+                and content_type.startswith(COMPRESSIBLE_TYPES)):
+            coding = negotiate_encoding(request_headers.get("accept-encoding"), available_encodings())
+            if coding:
+                body = compress(body, coding, self.gzip_level)
+                headers["Content-Encoding"] = coding
+                headers["Content-Length"] = str(len(body))
+                etag = coded_etag(etag, coding)
+            vary = headers.get("vary")
+            if not vary:
+                headers["Vary"] = "Accept-Encoding"
+            elif "accept-encoding" not in vary.lower():
+                headers["Vary"] = f"{vary}, Accept-Encoding"
+        headers["ETag"] = etag
+
+        if etag_matches(request_headers.get("if-none-match"), etag):
+            kept = {k: v for k, v in headers.items() if k in ("etag", "cache-control", "vary")}
+            start = {
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in kept.items()],
+            }
+            body = b""
+
+        return [start, {"type": "http.response.body", "body": body}]
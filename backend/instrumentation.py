@@ -0,0 +1,316 @@
+import bisect
+import collections
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) shared by every latency histogram
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    """Monotonic counter per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = collections.defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, rendered the way Prometheus expects"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[i] += 1
+            self._values[labels] = (counts, total + value)
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self):
+        result = []
+        with self._lock:
+            items = sorted((labels, list(counts), total) for labels, (counts, total) in self._values.items())
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                result.append((f"{self.name}_bucket", labels + (le,), cumulative, self.labelnames + ("le",)))
+            result.append((f"{self.name}_sum", labels, total))
+            result.append((f"{self.name}_count", labels, cumulative))
+        return result
+
+
+class GaugeCallback:
+    """Gauge (or counter) whose values are read from a callback at scrape time"""
+
+    def __init__(self, name, help, labelnames, callback, kind="gauge"):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self.kind = kind
+
+    def samples(self):
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.error(f"Error collecting {self.name}: {e}")
+            return []
+        return [(self.name, tuple(labels), value) for labels, value in sorted(values.items())]
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None and not isinstance(metric, GaugeCallback):
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def gauge_callback(self, name, help, labelnames, callback, kind="gauge"):
+        """Register (or replace) a metric read from callback() -> {label values tuple: number}"""
+        return self._register(GaugeCallback(name, help, labelnames, callback, kind))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample in metric.samples():
+                name, labels, value = sample[:3]
+                labelnames = sample[3] if len(sample) > 3 else metric.labelnames
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "processor_stage_seconds", "Time spent in each GeoTIFFProcessor stage", ("stage",))
+
+
+def span(stage):
+    """Time a processing stage into processor_stage_seconds{stage=...}"""
+    return STAGE_SECONDS.time(stage)
+
+
+class SlowRequestProfiler:
+    """Opt-in sampling profiler that keeps stack profiles of slow requests.
+
+    A sampled request starts a background thread that snapshots every thread's
+    stack (sys._current_frames) at a fixed interval while the request is in
+    flight, so work handed to the compute pool is captured too. If the request
+    then exceeds the threshold, its most frequent stacks are kept for
+    /internal/profiles and logged.
+    """
+
+    def __init__(self, threshold_ms, sample_rate=1.0, interval=0.005, keep=20):
+        self.threshold = threshold_ms / 1000.0
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.profiles = collections.deque(maxlen=keep)
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls):
+        """Enabled when PROFILE_SLOW_REQUESTS_MS is set; None otherwise"""
+        threshold = os.environ.get('PROFILE_SLOW_REQUESTS_MS')
+        if not threshold:
+            return None
+        return cls(float(threshold), sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 1.0)))
+
+    def start(self):
+        """Begin sampling a request; returns a session, or None when the request is not sampled"""
+        if random.random() >= self.sample_rate:
+            return None
+        session = collections.Counter()
+        with self._lock:
+            self._sessions[id(session)] = session
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample_loop, name="slow-request-profiler", daemon=True)
+                self._thread.start()
+        return session
+
+    def stop(self, session, route, duration):
+        with self._lock:
+            self._sessions.pop(id(session), None)
+        if duration < self.threshold or not session:
+            return
+        total = sum(session.values())
+        top = [{"stack": stack, "samples": count, "share": round(count / total, 3)}
+               for stack, count in session.most_common(15)]
+        self.profiles.append({
+            "route": route,
+            "duration_ms": round(duration * 1000, 1),
+            "samples": total,
+            "recorded": time.time(),
+            "top_stacks": top,
+        })
+        logger.warning(f"Slow request {route} took {duration * 1000:.0f} ms; hottest frame: "
+                       f"{top[0]['stack'].rsplit(';', 1)[-1] if top else 'n/a'}")
+
+    def _sample_loop(self):
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                sessions = list(self._sessions.values())
+                if not sessions:
+                    self._thread = None
+                    return
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = _collapse(frame)
+                if stack is None:
+                    continue
+                for session in sessions:
+                    session[stack] += 1
+
+
+def _collapse(frame, depth=40):
+    """Collapsed 'file:function;...' stack, root first; None for idle threads"""
+    names = []
+    while frame is not None and len(names) < depth:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    if not names or names[0] in _IDLE_FRAMES:
+        return None
+    return ";".join(reversed(names))
+
+
+# Innermost frames of threads that are just waiting for work
+_IDLE_FRAMES = {"threading.py:wait", "queue.py:get", "thread.py:_worker", "selectors.py:select",
+                "base_events.py:_run_once", "threading.py:_wait_for_tstate_lock"}
+
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status"))
+RESPONSE_BYTES = REGISTRY.counter(
+    "http_response_bytes_total", "Response body bytes sent (after compression) by route", ("method", "route"))
+
+
+class InstrumentationMiddleware:
+    """Pure ASGI middleware recording per-route latency and bytes served, and driving the slow-request profiler"""
+
+    def __init__(self, app, profiler=None):
+        self.app = app
+        self.profiler = profiler
+        self._route_paths = {}
+
+    def _route(self, scope):
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            router_app = scope.get("app")
+            for route in getattr(router_app, "routes", ()):
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = route.path
+                    break
+            path = path or getattr(endpoint, "__name__", "unknown")
+            self._route_paths[endpoint] = path
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        sent = 0
+
+        async def send_wrapper(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        session = self.profiler.start() if self.profiler is not None else None
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            route = self._route(scope)
+            REQUEST_SECONDS.observe(duration, scope["method"], route, str(status))
+            RESPONSE_BYTES.inc(scope["method"], route, amount=sent)
+            if session is not None:
+                self.profiler.stop(session, f"{scope['method']} {route}", duration)
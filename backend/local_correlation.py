@@ -0,0 +1,79 @@
+import numpy as np
+import logging
+from streaming_stats import BLOCK_PIXELS
+
+logger = logging.getLogger(__name__)
+
+# Side of the square moving window, in pixels (odd, so it is centred on the pixel)
+DEFAULT_WINDOW = 15
+
+# A window needs at least this fraction of valid NDVI/LST pairs for its r to be reported
+MIN_VALID_FRACTION = 0.5
+
+
+def window_sums(values, window):
+    """Sum of every window x window block of a padded 2-D array via a summed-area table"""
+    rows, cols = values.shape
+    sat = np.zeros((rows + 1, cols + 1), dtype=np.float64)
+    np.cumsum(values, axis=0, out=sat[1:, 1:])
+    np.cumsum(sat[1:, 1:], axis=1, out=sat[1:, 1:])
+    return sat[window:, window:] - sat[:-window, window:] - sat[window:, :-window] + sat[:-window, :-window]
+
+
+def local_correlation(x_band, y_band, out, window=DEFAULT_WINDOW, min_valid_fraction=MIN_VALID_FRACTION,
+                      block_pixels=BLOCK_PIXELS):
+    """Pearson r between two bands over a moving window centred on every pixel, written into `out`.
+
+    Each row strip is read with a halo of window // 2 rows and zero-padded
+    columns; summed-area tables of n, x, y, x², y² and xy over the valid pairs
+    then give every window's sums in four lookups, so the cost per pixel does
+    not depend on the window size. Pixels that are nodata in either band, or
+    whose window holds too few valid pairs, are NaN.
+    """
+    if window < 3 or window % 2 == 0:
+        raise ValueError("window must be an odd number of pixels, at least 3")
+    half = window // 2
+    rows, cols = x_band.shape
+    min_count = max(3, int(np.ceil(min_valid_fraction * window * window)))
+    strip_rows = max(1, block_pixels // max(cols + 2 * half, 1))
+
+    for row_off in range(0, rows, strip_rows):
+        height = min(strip_rows, rows - row_off)
+        r0, r1 = max(row_off - half, 0), min(row_off + height + half, rows)
+        x = x_band.read_window(r0, 0, r1 - r0, cols)
+        y = y_band.read_window(r0, 0, r1 - r0, cols)
+        valid = x_band.valid_mask(x) & y_band.valid_mask(y)
+        x = x_band.decode(x, np.float64)
+        y = y_band.decode(y, np.float64)
+
+        # Rows outside the raster and the column margins stay zero (no pairs), like nodata
+        pad_top = half - (row_off - r0)
+        shape = (height + 2 * half, cols + 2 * half)
+        inner = (slice(pad_top, pad_top + r1 - r0), slice(half, half + cols))
+        n = np.zeros(shape)
+        n[inner] = valid
+        if not valid.any():
+            out[row_off:row_off + height] = np.nan
+            continue
+
+        # Centring on the strip means keeps the x², y² and xy tables small, limiting cancellation
+        xc = np.zeros(shape)
+        yc = np.zeros(shape)
+        xc[inner] = np.where(valid, x - x[valid].mean(), 0.0)
+        yc[inner] = np.where(valid, y - y[valid].mean(), 0.0)
+
+        count = window_sums(n, window)
+        sx = window_sums(xc, window)
+        sy = window_sums(yc, window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = window_sums(xc * yc, window) - sx * sy / count
+            var_x = window_sums(xc * xc, window) - sx * sx / count
+            var_y = window_sums(yc * yc, window) - sy * sy / count
+            r = cov / np.sqrt(var_x * var_y)
+
+        # Flat windows (zero variance, up to rounding) have no defined correlation
+        flat = (var_x <= 1e-9 * count) | (var_y <= 1e-9 * count)
+        r[(count < min_count) | flat | (n[half:half + height, half:half + cols] == 0)] = np.nan
+        out[row_off:row_off + height] = np.clip(r, -1.0, 1.0)
+
+    return out
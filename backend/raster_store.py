@@ -0,0 +1,358 @@
+import numpy as np
+import json
+import os
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Extent used when a source raster carries no georeferencing (same as PEEL_BOUNDS in MapView.jsx)
+PEEL_BOUNDS = (-80.2, 43.4, -79.4, 44.0)  # west, south, east, north
+SYNTHETIC_SHAPE = (1000, 1000)
+
+# GeoTIFF tags
+MODEL_PIXEL_SCALE_TAG = 33550
+MODEL_TIEPOINT_TAG = 33922
+GDAL_NODATA_TAG = 42113
+
+# Physically plausible range per band; pixels outside it are treated as nodata
+VALID_RANGES = {
+    "lst": (-50.0, 100.0),
+    "ndvi": (-1.0, 1.0),
+}
+
+
+class Quantization:
+    """Compact pixel encoding: code * scale + offset in an unsigned integer, or plain float16.
+
+    NaN and values outside valid_range are stored as a nodata sentinel (the
+    integer maximum, or NaN for float16), so validity is one comparison on the
+    stored codes and every possible code has a fixed decoded value.
+    """
+
+    def __init__(self, dtype, scale=1.0, offset=0.0, valid_range=None):
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.dtype(np.uint8), np.dtype(np.uint16), np.dtype(np.float16)):
+            raise ValueError(f"Unsupported compact dtype {self.dtype}; use uint8, uint16 or float16")
+        self.scale = float(scale)
+        self.offset = float(offset)
+        self.valid_range = tuple(float(v) for v in valid_range) if valid_range is not None else None
+        self.integer = self.dtype.kind == "u"
+        self.nodata = np.iinfo(self.dtype).max if self.integer else np.nan
+
+    def to_dict(self):
+        return {"dtype": self.dtype.name, "scale": self.scale, "offset": self.offset,
+                "valid_range": list(self.valid_range) if self.valid_range is not None else None}
+
+    def encode(self, values, strip_rows=1024):
+        """Codes for an array of physical values, converted one row strip at a time"""
+        codes = np.empty(np.shape(values), dtype=self.dtype)
+        for start in range(0, codes.shape[0], strip_rows):
+            strip = np.asarray(values[start:start + strip_rows], dtype=np.float64)
+            valid = np.isfinite(strip)
+            if self.valid_range is not None:
+                valid &= (strip >= self.valid_range[0]) & (strip <= self.valid_range[1])
+            if self.integer:
+                strip = np.rint((strip - self.offset) / self.scale)
+                np.clip(strip, 0, self.nodata - 1, out=strip)
+            strip[~valid] = self.nodata
+            codes[start:start + strip_rows] = strip
+        return codes
+
+    def valid(self, codes):
+        codes = np.asarray(codes)
+        return codes != self.nodata if self.integer else np.isfinite(codes)
+
+    def decode(self, codes, dtype=np.float32):
+        """Physical values for stored codes (NaN for nodata)"""
+        codes = np.asarray(codes)
+        if not self.integer:
+            return codes.astype(dtype)
+        values = codes.astype(dtype) * dtype(self.scale) + dtype(self.offset)
+        values[codes == self.nodata] = np.nan
+        return values
+
+    def lookup_indices(self, codes):
+        """Non-negative integer index of every code, for tables with one entry per possible code"""
+        codes = np.asarray(codes)
+        return codes if self.integer else codes.view(np.uint16)
+
+    def code_values(self):
+        """Decoded value of every possible code, indexed like lookup_indices"""
+        codes = np.arange(2 ** (8 * self.dtype.itemsize), dtype=np.dtype(f"u{self.dtype.itemsize}"))
+        return self.decode(codes if self.integer else codes.view(self.dtype))
+
+
+# Opt-in compact storage (RASTER_STORAGE=compact): 2 bytes per pixel instead of 4.
+# Power-of-two scales keep thresholds like 2/4/6 °C exactly representable.
+COMPACT_ENCODINGS = {
+    "lst": Quantization("uint16", scale=2 ** -8, offset=-64.0, valid_range=VALID_RANGES["lst"]),    # 1/256 °C
+    "ndvi": Quantization("uint16", scale=2 ** -14, offset=-1.0, valid_range=VALID_RANGES["ndvi"]),  # ~6e-5
+    "duhi": Quantization("uint16", scale=2 ** -10, offset=-32.0),                                   # 1/1024 °C
+}
+
+
+class RasterBand:
+    """A single decoded raster band backed by a read-only memory map"""
+
+    def __init__(self, name, data, transform, version, synthetic=False, quantization=None, valid_range=None):
+        self.name = name
+        # Stored pixels: float32 with NaN nodata, or codes when quantization is set
+        self.data = data
+        # GDAL-style north-up affine: (west, x_res, 0, north, 0, -y_res)
+        self.transform = tuple(float(v) for v in transform)
+        self.version = version
+        self.synthetic = synthetic
+        self.quantization = quantization
+        self.valid_range = valid_range
+
+    def valid_mask(self, pixels):
+        """Which stored pixels hold usable data (a single sentinel comparison for compact bands)"""
+        if self.quantization is not None:
+            return self.quantization.valid(pixels)
+        pixels = np.asarray(pixels)
+        if self.valid_range is None:
+            return np.isfinite(pixels)
+        return (pixels >= self.valid_range[0]) & (pixels <= self.valid_range[1])
+
+    def decode(self, pixels, dtype=np.float32):
+        """Physical values of stored pixels (NaN for nodata)"""
+        if self.quantization is not None:
+            return self.quantization.decode(pixels, dtype)
+        return np.asarray(pixels, dtype=dtype)
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def bounds(self):
+        """Return (west, south, east, north) of the band"""
+        west, xres, _, north, _, yres = self.transform
+        rows, cols = self.shape
+        return (west, north + rows * yres, west + cols * xres, north)
+
+    def rowcol(self, lat, lng):
+        """Map lat/lng (scalars or arrays) to fractional row/col pixel coordinates"""
+        west, xres, _, north, _, yres = self.transform
+        col = (np.asarray(lng, dtype=float) - west) / xres
+        row = (np.asarray(lat, dtype=float) - north) / yres
+        return row, col
+
+    def read_window(self, row_off, col_off, height, width):
+        """Return a view of the pixels inside the window, clipped to the raster"""
+        rows, cols = self.shape
+        r0 = max(int(row_off), 0)
+        c0 = max(int(col_off), 0)
+        r1 = min(int(row_off) + int(height), rows)
+        c1 = min(int(col_off) + int(width), cols)
+        if r1 <= r0 or c1 <= c0:
+            return self.data[0:0, 0:0]
+        return self.data[r0:r1, c0:c1]
+
+    def bbox_window(self, west, south, east, north):
+        """Return (row_off, col_off, height, width) covering a lat/lng bbox"""
+        top, left = self.rowcol(north, west)
+        bottom, right = self.rowcol(south, east)
+        row_off = int(np.floor(min(top, bottom)))
+        col_off = int(np.floor(min(left, right)))
+        height = int(np.ceil(max(top, bottom))) - row_off
+        width = int(np.ceil(max(left, right))) - col_off
+        return row_off, col_off, max(height, 0), max(width, 0)
+
+    def read_bbox(self, west, south, east, north):
+        """Return a view of the pixels covering a lat/lng bbox"""
+        return self.read_window(*self.bbox_window(west, south, east, north))
+
+
+class RasterStore:
+    """Decode each source raster once and serve it from a memory-mapped .npy cache.
+
+    Cached arrays live in ``cache_dir`` next to a small JSON sidecar recording the
+    source file's mtime and size; the cache is rebuilt whenever either changes.
+    Several worker processes mapping the same file share one copy in the page cache.
+    Bands named in ``encodings`` are stored quantized (see COMPACT_ENCODINGS).
+    """
+
+    def __init__(self, cache_dir, encodings=None):
+        self.cache_dir = Path(cache_dir)
+        self.encodings = encodings or {}
+        self._encoding_keys = {name: json.dumps(q.to_dict(), sort_keys=True) for name, q in self.encodings.items()}
+        self.cache_dir.mkdir(exist_ok=True, parents=True)
+        self._bands = {}
+        self._lock = threading.Lock()
+
+    def load(self, source_path, name=None):
+        """Return the RasterBand for a source file, decoding it only if stale"""
+        source_path = Path(source_path)
+        name = name or source_path.stem
+        signature = self._source_signature(source_path)
+
+        band = self._bands.get(name)
+        if band is not None and band.version == self._version(name, signature):
+            return band
+
+        with self._lock:
+            band = self._bands.get(name)
+            if band is None or band.version != self._version(name, signature):
+                band = self._load_cached(source_path, name, signature)
+                self._bands[name] = band
+        return band
+
+    def _source_signature(self, source_path):
+        try:
+            st = source_path.stat()
+            return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+        except FileNotFoundError:
+            return {"mtime_ns": None, "size": None}
+
+    def _version(self, name, signature):
+        key = f"{name}:{signature['mtime_ns']}:{signature['size']}"
+        if name in self._encoding_keys:
+            # Quantized values differ slightly, so anything derived from them is versioned separately
+            key += f":{self._encoding_keys[name]}"
+        return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+    def _load_cached(self, source_path, name, signature):
+        npy_path = self.cache_dir / f"{name}.npy"
+        meta_path = self.cache_dir / f"{name}.json"
+        version = self._version(name, signature)
+
+        meta = None
+        if meta_path.exists() and npy_path.exists():
+            try:
+                with open(meta_path, 'r') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = None
+
+        quantization = self.encodings.get(name)
+        encoding = quantization.to_dict() if quantization is not None else None
+        if meta is None or meta.get("source") != signature or meta.get("encoding") != encoding:
+            data, transform, synthetic = self._decode(source_path, name)
+            if quantization is not None:
+                data = quantization.encode(data)
+            meta = {"source": signature, "transform": list(transform), "synthetic": synthetic, "encoding": encoding}
+            self._write_atomic(npy_path, lambda f: np.save(f, data))
+            self._write_atomic(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+            logger.info(f"Cached raster {name} ({data.shape[0]}x{data.shape[1]}) at {npy_path}")
+
+        data = np.load(npy_path, mmap_mode='r')
+        return RasterBand(name, data, meta["transform"], version, synthetic=meta["synthetic"],
+                          quantization=quantization, valid_range=VALID_RANGES.get(name))
+
+    def derived(self, name, source_version, shape, transform, build, synthetic=False):
+        """Return a float32 RasterBand computed from other bands, rebuilt only when source_version changes.
+
+        ``build(out)`` fills a writable memory map of ``shape`` strip by strip,
+        so the derived raster never has to fit in memory.
+        """
+        version = hashlib.sha1(f"{name}:{source_version}".encode()).hexdigest()[:12]
+        band = self._bands.get(name)
+        if band is not None and band.version == version:
+            return band
+
+        with self._lock:
+            band = self._bands.get(name)
+            if band is None or band.version != version:
+                band = self._load_derived(name, version, shape, transform, build, synthetic)
+                self._bands[name] = band
+        return band
+
+    def _load_derived(self, name, version, shape, transform, build, synthetic):
+        npy_path = self.cache_dir / f"{name}.npy"
+        meta_path = self.cache_dir / f"{name}.json"
+        source = {"derived": version}
+
+        meta = None
+        if meta_path.exists() and npy_path.exists():
+            try:
+                with open(meta_path, 'r') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = None
+
+        if meta is None or meta.get("source") != source:
+            tmp_path = npy_path.with_name(f".{npy_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=tuple(shape))
+            build(out)
+            out.flush()
+            del out
+            os.replace(tmp_path, npy_path)
+            meta = {"source": source, "transform": list(transform), "synthetic": synthetic, "encoding": None}
+            self._write_atomic(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+            logger.info(f"Cached derived raster {name} ({shape[0]}x{shape[1]}) at {npy_path}")
+
+        data = np.load(npy_path, mmap_mode='r')
+        return RasterBand(name, data, meta["transform"], version, synthetic=meta["synthetic"],
+                          valid_range=VALID_RANGES.get(name))
+
+    def _write_atomic(self, path, write):
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+
+    def _decode(self, source_path, name):
+        """Decode a GeoTIFF band to float32, falling back to a synthetic raster"""
+        try:
+            return decode_geotiff(source_path) + (False,)
+        except Exception as e:
+            logger.warning(f"Could not decode {source_path} ({e}); using synthetic {name} raster")
+            return synthetic_band(name), default_transform(SYNTHETIC_SHAPE), True
+
+
+def default_transform(shape, bounds=PEEL_BOUNDS):
+    """Affine transform stretching a raster of the given shape over bounds"""
+    west, south, east, north = bounds
+    rows, cols = shape
+    return (west, (east - west) / cols, 0.0, north, 0.0, -(north - south) / rows)
+
+
+def decode_geotiff(path):
+    """Read the first band of a GeoTIFF as float32 with NaN nodata and its transform"""
+    from PIL import Image  # deferred: only needed when (re)decoding a source file
+    with Image.open(path) as img:
+        if img.mode not in ("F", "I", "I;16", "I;16B", "L"):
+            img = img.getchannel(0)
+        data = np.asarray(img, dtype=np.float32).copy()
+        tags = img.tag_v2 if hasattr(img, "tag_v2") else {}
+
+        nodata = tags.get(GDAL_NODATA_TAG)
+        if nodata is not None:
+            try:
+                data[data == np.float32(float(str(nodata).strip("\x00 ")))] = np.nan
+            except ValueError:
+                pass
+
+        scale = tags.get(MODEL_PIXEL_SCALE_TAG)
+        tiepoint = tags.get(MODEL_TIEPOINT_TAG)
+        if scale and tiepoint:
+            i, j, _, x, y, _ = tiepoint[:6]
+            sx, sy = scale[0], scale[1]
+            transform = (x - i * sx, sx, 0.0, y + j * sy, 0.0, -sy)
+        else:
+            transform = default_transform(data.shape)
+
+    return data, transform
+
+
+def synthetic_band(name, shape=SYNTHETIC_SHAPE):
+    """Deterministic stand-in raster used until real GeoTIFFs are available"""
+    seed = int(hashlib.sha1(name.encode()).hexdigest()[:8], 16)
+    rng = np.random.default_rng(seed)
+    name = name.lower()
+
+    if 'lst' in name:
+        data = rng.standard_normal(shape) * 3 + 32.0
+    elif 'ndvi' in name:
+        data = np.clip(rng.standard_normal(shape) * 0.1 + 0.35, -1, 1)
+    elif 'duhi' in name:
+        data = rng.exponential(2.5, shape) + rng.standard_normal(shape) * 0.5
+        data = np.clip(data, -2, 10)
+    else:
+        data = np.zeros(shape)
+
+    return data.astype(np.float32)
@@ -0,0 +1,133 @@
+import numpy as np
+import logging
+from streaming_stats import BLOCK_PIXELS, RunningCovariance, RunningHistogram, RunningMoments, iter_blocks
+
+logger = logging.getLogger(__name__)
+
+# Approximate municipal bounding boxes (west, south, east, north); "Peel" covers the whole raster
+REGION_BOUNDS = {
+    "Brampton": (-79.89, 43.62, -79.63, 43.78),
+    "Mississauga": (-79.81, 43.47, -79.54, 43.62),
+    "Caledon": (-80.20, 43.78, -79.62, 44.00),
+    "Peel": None,
+}
+
+# Names used by the frontend and static exports for the same regions
+REGION_ALIASES = {
+    "Peel (All)": "Peel",
+}
+
+HOT_THRESHOLD = 4.0
+
+# (lo, hi, bins) per band; power-of-two bin widths keep thresholds like 2/4/6 °C on exact bin edges
+HISTOGRAM_BINS = {
+    "duhi": (-2.0, 10.0, 192),  # 1/16 °C
+    "ndvi": (-1.0, 1.0, 256),   # 1/128
+    "lst": (0.0, 64.0, 512),    # 1/8 °C
+}
+
+
+def canonical_region(region):
+    """Map a requested region name or alias onto a REGION_BOUNDS key; raises ValueError for unknown names"""
+    name = REGION_ALIASES.get(region, region)
+    if name not in REGION_BOUNDS:
+        raise ValueError(f"Unknown region {region!r}; expected one of {', '.join(REGION_BOUNDS)}")
+    return name
+
+
+def region_containing(lat, lng):
+    """Name of the first municipality whose bounds contain a point ("Peel" otherwise)"""
+    for name, bounds in REGION_BOUNDS.items():
+        if bounds is not None and bounds[0] <= lng <= bounds[2] and bounds[1] <= lat <= bounds[3]:
+            return name
+    return "Peel"
+
+
+class RegionAccumulator:
+    """Streaming statistics over the valid pixels of one region"""
+
+    def __init__(self):
+        self.ndvi_lst = RunningCovariance()
+        self.duhi = RunningMoments()
+        self.histograms = {band: RunningHistogram(*bins) for band, bins in HISTOGRAM_BINS.items()}
+
+    @property
+    def count(self):
+        return self.ndvi_lst.count
+
+    def add(self, lst, ndvi, duhi):
+        """Accumulate one block of already-validated, flattened float64 pixels"""
+        self.ndvi_lst.update(ndvi, lst)
+        self.duhi.update(duhi)
+        self.histograms["lst"].update(lst)
+        self.histograms["ndvi"].update(ndvi)
+        self.histograms["duhi"].update(duhi)
+
+    def merge(self, other):
+        self.ndvi_lst.merge(other.ndvi_lst)
+        self.duhi.merge(other.duhi)
+        for band, histogram in self.histograms.items():
+            histogram.merge(other.histograms[band])
+
+    def moments(self, band):
+        """RunningMoments of one band"""
+        return {"ndvi": self.ndvi_lst.x, "lst": self.ndvi_lst.y, "duhi": self.duhi}[band]
+
+    @property
+    def mean_lst(self):
+        return self.ndvi_lst.y.mean
+
+    @property
+    def mean_ndvi(self):
+        return self.ndvi_lst.x.mean
+
+    @property
+    def mean_duhi(self):
+        return self.duhi.mean
+
+    @property
+    def area_exceeding_4c(self):
+        return self.histograms["duhi"].fraction_at_least(HOT_THRESHOLD) * 100
+
+    @property
+    def correlation(self):
+        """Pearson r between NDVI and LST, or None when undefined"""
+        return self.ndvi_lst.correlation
+
+
+class RegionStatsIndex:
+    """Per-region statistics built once per raster version so metrics are O(1) per request"""
+
+    def __init__(self, version, regions):
+        self.version = version
+        self.regions = regions
+
+    def get(self, region):
+        return self.regions[canonical_region(region)]
+
+    @classmethod
+    def build(cls, version, lst_band, ndvi_band, duhi_band, block_pixels=BLOCK_PIXELS):
+        """Walk every region window in row blocks and accumulate its statistics"""
+        regions = {}
+        for name, bounds in REGION_BOUNDS.items():
+            if bounds is None:
+                rows, cols = lst_band.shape
+                window = (0, 0, rows, cols)
+            else:
+                window = lst_band.bbox_window(*bounds)
+
+            acc = RegionAccumulator()
+            for block in iter_blocks(window, block_pixels):
+                lst = lst_band.read_window(*block)
+                ndvi = ndvi_band.read_window(*block)
+                duhi = duhi_band.read_window(*block)
+
+                # Stored pixels are only decoded once known to be valid
+                valid = lst_band.valid_mask(lst) & ndvi_band.valid_mask(ndvi) & duhi_band.valid_mask(duhi)
+                acc.add(lst_band.decode(lst[valid], np.float64), ndvi_band.decode(ndvi[valid], np.float64),
+                        duhi_band.decode(duhi[valid], np.float64))
+
+            regions[name] = acc
+            logger.info(f"Indexed {name}: {acc.count} valid pixels")
+
+        return cls(version, regions)
@@ -0,0 +1,264 @@
+import numpy as np
+import json
+import logging
+import math
+from region_stats import REGION_BOUNDS
+from zonal_stats import geometry_key, polygon_rings
+
+logger = logging.getLogger(__name__)
+
+INTERVENTION_TYPES = ("ndvi", "albedo")
+
+# LST change per unit NDVI for classes without a usable fit: 0.1 NDVI -> 1.5 °C cooler
+DEFAULT_NDVI_SLOPE = -15.0
+# A class's own fit is used only with enough pixels and a clear cooling signal (r <= -MIN_FIT_CORRELATION)
+MIN_FIT_PIXELS = 1000
+MIN_FIT_CORRELATION = 0.1
+
+# Surface LST change per unit roof albedo, scaled by the roof share of each land-use class
+ALBEDO_LST_SENSITIVITY = -25.0
+ROOF_FRACTION = {
+    "Industrial": 0.45,
+    "Commercial": 0.40,
+    "Residential": 0.30,
+    "Infrastructure": 0.10,
+    "All": 0.25,  # no land-use raster: an average urban roof share
+}
+
+# Interventions are applied and aggregated per square tile of this many pixels
+SCENARIO_TILE = 512
+
+
+class ResponseModel:
+    """Per land-use class linear fit of LST on NDVI, used to turn NDVI changes into LST changes"""
+
+    def __init__(self, classes, sums):
+        # {code: name} and per-code [n, Σx, Σy, Σxx, Σxy, Σyy] with x = NDVI, y = LST
+        self.classes = classes
+        self.slopes = np.full(256, DEFAULT_NDVI_SLOPE)
+        self.roof_fraction = np.zeros(256)
+        self.fits = {}
+        for code, name in classes.items():
+            n, sx, sy, sxx, sxy, syy = sums[:, code]
+            var_x = n * sxx - sx * sx
+            var_y = n * syy - sy * sy
+            defined = var_x > 0 and var_y > 0
+            correlation = (n * sxy - sx * sy) / math.sqrt(var_x * var_y) if defined else None
+            fitted = n >= MIN_FIT_PIXELS and defined and correlation <= -MIN_FIT_CORRELATION
+            if fitted:
+                self.slopes[code] = (n * sxy - sx * sy) / var_x
+            self.roof_fraction[code] = ROOF_FRACTION.get(name, 0.0)
+            self.fits[name] = {
+                "pixels": int(n),
+                "slope": round(float(self.slopes[code]), 3),
+                "intercept": round(float((sy - self.slopes[code] * sx) / n), 3) if n else None,
+                "correlation": round(float(correlation), 3) if defined else None,
+                "source": "fitted" if fitted else "default",
+            }
+
+    def to_dict(self):
+        return {
+            "lst_per_ndvi": self.fits,
+            "albedo_lst_sensitivity": ALBEDO_LST_SENSITIVITY,
+            "roof_fraction": {name: ROOF_FRACTION.get(name, 0.0) for name in self.classes.values()},
+        }
+
+
+class ScenarioEngine:
+    """Applies cooling interventions over the raster tile by tile.
+
+    Region aggregates start from the baseline RegionStatsIndex and only the
+    tiles an intervention touches are read. Each tile's partial result is
+    cached under the interventions that reach it, so adding or editing one
+    intervention recomputes just that intervention's tiles.
+    """
+
+    def __init__(self, version, bands, landuse, model, tile_classes, tile_cache):
+        self.version = version
+        self.bands = bands
+        # Land-use band on the same grid, or None when there is no land-use raster
+        self.landuse = landuse
+        self.model = model
+        # (tile rows, tile cols, 256) presence of each land-use code per tile
+        self.tile_classes = tile_classes
+        self.tile_cache = tile_cache
+        rows, cols = bands["duhi"].shape
+        self.region_windows = {}
+        for name, bounds in REGION_BOUNDS.items():
+            r0, c0, h, w = (0, 0, rows, cols) if bounds is None else bands["lst"].bbox_window(*bounds)
+            self.region_windows[name] = (max(r0, 0), max(c0, 0), min(r0 + h, rows), min(c0 + w, cols))
+
+    @classmethod
+    def build(cls, version, bands, landuse, classes, tile_cache, tile_size=SCENARIO_TILE):
+        """Fit the response model and index land-use presence per tile in one pass over the rasters"""
+        if landuse is not None and landuse.shape != bands["duhi"].shape:
+            logger.warning(f"Land-use raster {landuse.shape} does not match the band grid; ignoring it")
+            landuse = None
+        if landuse is None:
+            classes = {0: "All"}
+
+        rows, cols = bands["duhi"].shape
+        tile_classes = np.zeros((-(-rows // tile_size), -(-cols // tile_size), 256), dtype=bool)
+        sums = np.zeros((6, 256))
+        for ti, r0 in enumerate(range(0, rows, tile_size)):
+            for tj, c0 in enumerate(range(0, cols, tile_size)):
+                window = (r0, c0, tile_size, tile_size)
+                valid, lst, ndvi, _, codes = _read_tile(bands, landuse, window)
+                tile_classes[ti, tj] = np.bincount(codes.ravel(), minlength=256)[:256] > 0
+                codes, x, y = codes[valid], ndvi[valid], lst[valid]
+                for k, weights in enumerate((None, x, y, x * x, x * y, y * y)):
+                    sums[k] += np.bincount(codes, weights=weights, minlength=256)[:256]
+
+        model = ResponseModel(classes, sums)
+        logger.info("Fitted scenario response model: " + ", ".join(
+            f"{name} {fit['slope']} °C/NDVI ({fit['source']})" for name, fit in model.fits.items()))
+        return cls(version, bands, landuse, model, tile_classes, tile_cache)
+
+    def _normalize(self, interventions, polygon_mask):
+        """Validate interventions and resolve each to (key, type, amount, class code, (window, mask) or None)"""
+        codes = {name: code for code, name in self.model.classes.items()}
+        resolved = []
+        for i, item in enumerate(interventions):
+            kind = item.get("type")
+            if kind not in INTERVENTION_TYPES:
+                raise ValueError(f"Intervention {i}: type must be one of {', '.join(INTERVENTION_TYPES)}")
+            amount = float(item.get("amount", 0))
+            if not math.isfinite(amount) or not -1 <= amount <= 1:
+                raise ValueError(f"Intervention {i}: amount must be between -1 and 1")
+            landuse = item.get("landuse")
+            if landuse is not None and landuse not in codes:
+                if self.landuse is None:
+                    raise ValueError(f"Intervention {i}: no land-use raster is available to target {landuse}")
+                raise ValueError(f"Intervention {i}: unknown land-use class {landuse}")
+            geometry = item.get("geometry")
+            area = None
+            if geometry is not None:
+                polygon_rings(geometry)  # raises ValueError on malformed geometry
+                area = polygon_mask(geometry)
+            key = json.dumps([kind, amount, landuse, geometry_key(geometry) if geometry is not None else None])
+            resolved.append((key, kind, amount, codes.get(landuse), area))
+        return resolved
+
+    def _tiles_for(self, code, area, tile_size):
+        """(tile row, tile col) pairs an intervention can change"""
+        touched = np.ones(self.tile_classes.shape[:2], dtype=bool)
+        if code is not None:
+            touched &= self.tile_classes[:, :, code]
+        if area is not None:
+            (r0, c0, h, w), mask = area
+            rows, cols = np.nonzero(mask)
+            hit = np.zeros_like(touched)
+            hit[(rows + r0) // tile_size, (cols + c0) // tile_size] = True
+            touched &= hit
+        return set(zip(*np.nonzero(touched)))
+
+    def simulate(self, interventions, threshold, stats_index, polygon_mask, tile_size=SCENARIO_TILE):
+        """DUHI change and area above threshold per region, before and after the interventions"""
+        resolved = self._normalize(interventions, polygon_mask)
+        per_tile = {}
+        for intervention in resolved:
+            for tile in self._tiles_for(intervention[3], intervention[4], tile_size):
+                per_tile.setdefault(tile, []).append(intervention)
+
+        totals = {name: np.zeros(5) for name in self.region_windows}
+        tiles = []
+        rows, cols = self.bands["duhi"].shape
+        west, xres, _, north, _, yres = self.bands["duhi"].transform
+        for (ti, tj), applied in sorted(per_tile.items()):
+            key = (self.version, int(ti), int(tj), threshold, tuple(item[0] for item in applied))
+            partial = self.tile_cache.get_or_compute(
+                key, lambda: self._simulate_tile(ti * tile_size, tj * tile_size, tile_size, applied, threshold))
+            for name, values in partial.items():
+                totals[name] += values
+            changed, delta_sum = partial["Peel"][0], partial["Peel"][1]
+            if changed:
+                r0, c0 = ti * tile_size, tj * tile_size
+                r1, c1 = min(r0 + tile_size, rows), min(c0 + tile_size, cols)
+                tiles.append({
+                    "bbox": [west + c0 * xres, north + r1 * yres, west + c1 * xres, north + r0 * yres],
+                    "changed_pixels": int(changed),
+                    "mean_duhi_change": round(float(delta_sum / changed), 3),
+                })
+
+        regions = {}
+        for name, values in totals.items():
+            changed, delta_sum, hot_before, hot_after, _ = values.tolist()
+            acc = stats_index.get(name)
+            count = acc.count
+            if count == 0:
+                regions[name] = None
+                continue
+            before = acc.histograms["duhi"].fraction_at_least(threshold) * 100
+            after = before + (hot_after - hot_before) / count * 100
+            regions[name] = {
+                "mean_duhi_before": round(acc.mean_duhi, 3),
+                "mean_duhi_after": round(acc.mean_duhi + delta_sum / count, 3),
+                "mean_duhi_change": round(delta_sum / count, 3),
+                "area_above_threshold_before": round(before, 2),
+                "area_above_threshold_after": round(min(max(after, 0.0), 100.0), 2),
+                "area_above_threshold_change": round(after - before, 2),
+                "changed_pixels": int(changed),
+                "mean_change_where_applied": round(delta_sum / changed, 3) if changed else 0.0,
+            }
+
+        return {
+            "threshold": threshold,
+            "regions": regions,
+            "tiles": tiles,
+            "tiles_touched": len(per_tile),
+            "tiles_total": int(self.tile_classes.shape[0] * self.tile_classes.shape[1]),
+        }
+
+    def _simulate_tile(self, r0, c0, tile_size, applied, threshold):
+        """Per-region [changed pixels, Σ ΔDUHI, hot before, hot after, valid pixels] for one tile"""
+        valid, _, ndvi, duhi, codes = _read_tile(self.bands, self.landuse, (r0, c0, tile_size, tile_size))
+        delta = np.zeros(ndvi.shape)
+        for _, kind, amount, code, area in applied:
+            selected = valid.copy()
+            if code is not None:
+                selected &= codes == code
+            if area is not None:
+                selected &= _tile_mask(area, r0, c0, selected.shape)
+            if kind == "ndvi":
+                raised = np.clip(ndvi + amount, -1, 1)
+                delta[selected] += (self.model.slopes[codes] * (raised - ndvi))[selected]
+                ndvi = np.where(selected, raised, ndvi)
+            else:
+                delta[selected] += ALBEDO_LST_SENSITIVITY * amount * self.model.roof_fraction[codes[selected]]
+
+        changed = valid & (delta != 0)
+        hot_before = valid & (duhi >= threshold)
+        hot_after = valid & (duhi + delta >= threshold)
+        partial = {}
+        for name, (wr0, wc0, wr1, wc1) in self.region_windows.items():
+            rs = slice(max(wr0 - r0, 0), max(min(wr1 - r0, valid.shape[0]), 0))
+            cs = slice(max(wc0 - c0, 0), max(min(wc1 - c0, valid.shape[1]), 0))
+            partial[name] = np.array([
+                changed[rs, cs].sum(), delta[rs, cs][valid[rs, cs]].sum(),
+                hot_before[rs, cs].sum(), hot_after[rs, cs].sum(), valid[rs, cs].sum(),
+            ], dtype=np.float64)
+        return partial
+
+
+def _read_tile(bands, landuse, window):
+    """Valid mask, decoded LST/NDVI/DUHI (NaN where invalid) and land-use codes for one tile window"""
+    pixels = {layer: band.read_window(*window) for layer, band in bands.items()}
+    valid = np.logical_and.reduce([band.valid_mask(pixels[layer]) for layer, band in bands.items()])
+    lst, ndvi, duhi = (bands[layer].decode(pixels[layer], np.float64) for layer in ("lst", "ndvi", "duhi"))
+    if landuse is None:
+        codes = np.zeros(valid.shape, dtype=np.int64)
+    else:
+        raw = np.asarray(landuse.read_window(*window), dtype=np.float64)
+        codes = np.where(np.isfinite(raw) & (raw >= 0) & (raw < 256), raw, 0).astype(np.int64)
+    return valid, lst, ndvi, duhi, codes
+
+
+def _tile_mask(area, r0, c0, shape):
+    """A polygon's (window, mask) cropped to one tile"""
+    (wr0, wc0, h, w), mask = area
+    out = np.zeros(shape, dtype=bool)
+    top, left = max(wr0, r0), max(wc0, c0)
+    bottom, right = min(wr0 + h, r0 + shape[0]), min(wc0 + w, c0 + shape[1])
+    if bottom > top and right > left:
+        out[top - r0:bottom - r0, left - c0:right - c0] = mask[top - wr0:bottom - wr0, left - wc0:right - wc0]
+    return out
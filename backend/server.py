@@ -1,17 +1,27 @@
-from fastapi import FastAPI, APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import os
 import logging
+import base64
 import json
+import numpy as np
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import uuid
 from datetime import datetime, timezone
 from geotiff_processor import GeoTIFFProcessor
+from region_stats import canonical_region
+from tiles import MAX_ZOOM
+from executor import ComputeExecutor, OverloadedError
+from static_store import StaticDataStore
+from http_cache import HTTPCacheMiddleware, available_encodings, coded_etag, etag_matches, negotiate_encoding
+from columnar import columnar_response, negotiate_format, records_to_columns
+from status_store import MemoryStatusStore, MongoStatusStore, StatusCheckStore
+from instrumentation import REGISTRY, InstrumentationMiddleware, SlowRequestProfiler, span
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -20,29 +30,105 @@ load_dotenv(ROOT_DIR / '.env')
 USE_STATIC_DATA = os.environ.get('USE_STATIC_DATA', 'false').lower() == 'true'
 STATIC_DATA_DIR = Path('/app/data/static')
 
-# MongoDB connection (optional if using static data)
-try:
-    mongo_url = os.environ['MONGO_URL']
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[os.environ['DB_NAME']]
-    MONGODB_AVAILABLE = True
-except Exception as e:
-    logging.warning(f"MongoDB not available: {e}. Using static data mode.")
-    MONGODB_AVAILABLE = False
-    db = None
+# MongoDB connection (optional if using static data); the client is created at startup
+MONGODB_AVAILABLE = bool(os.environ.get('MONGO_URL') and os.environ.get('DB_NAME'))
+client = None
+db = None
 
-processor = GeoTIFFProcessor()
+def connect_mongo():
+    """Create the motor client (imported here because motor is slow to import)"""
+    global client, db, MONGODB_AVAILABLE
+    try:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(
+            os.environ['MONGO_URL'],
+            maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', 50)),
+            minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', 0)),
+            maxIdleTimeMS=int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 60000)),
+            serverSelectionTimeoutMS=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+        )
+        db = client[os.environ['DB_NAME']]
+    except Exception as e:
+        logging.warning(f"MongoDB not available: {e}. Using static data mode.")
+        MONGODB_AVAILABLE = False
+        client = None
+        db = None
+
+static_store = StaticDataStore(STATIC_DATA_DIR)
+
+# Replaced by a MongoStatusStore at startup when MongoDB is configured
+status_store = MemoryStatusStore(**StatusCheckStore.settings_from_env())
+
+# Readiness flips once the background warmup has mapped rasters and filled caches
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', 'true').lower() == 'true'
+readiness = {"ready": False, "warmup": None, "error": None}
+warmup_task = None
 
 app = FastAPI(title="Urban Heat & Greenness Dashboard API")
 api_router = APIRouter(prefix="/api")
+profiler = SlowRequestProfiler.from_env()
+
+def compute_gauge(attribute):
+    compute = getattr(app.state, "compute", None)
+    return {(): getattr(compute, attribute)} if compute is not None else {}
+
+REGISTRY.gauge_callback("compute_pending", "Computations queued or running in the executor", (),
+                        lambda: compute_gauge("pending"))
+REGISTRY.gauge_callback("compute_queued", "Computations waiting for a thread-pool worker", (),
+                        lambda: compute_gauge("queued"))
+REGISTRY.gauge_callback("compute_inflight_keys", "Distinct single-flight keys currently computing", (),
+                        lambda: compute_gauge("inflight"))
+REGISTRY.gauge_callback("compute_coalesced_total", "Requests that joined an identical in-flight computation", (),
+                        lambda: compute_gauge("coalesced"), kind="counter")
+REGISTRY.gauge_callback("compute_rejected_total", "Requests shed with 503 because the queue was full", (),
+                        lambda: compute_gauge("rejected"), kind="counter")
+
+def cache_counts(attribute):
+    processor = getattr(app.state, "processor", None)
+    if processor is None:
+        return {}
+    return {(name,): len(cache) if attribute == "entries" else getattr(cache, attribute)
+            for name, cache in processor.memory_caches.items()}
+
+def result_cache_stats():
+    """Counters of the on-disk result cache, or {} before startup or when it is disabled"""
+    processor = getattr(app.state, "processor", None)
+    return processor.result_cache.stats() if processor is not None and processor.result_cache else {}
+
+REGISTRY.gauge_callback("cache_hits_total", "In-memory cache hits", ("cache",),
+                        lambda: cache_counts("hits"), kind="counter")
+REGISTRY.gauge_callback("cache_misses_total", "In-memory cache misses", ("cache",),
+                        lambda: cache_counts("misses"), kind="counter")
+REGISTRY.gauge_callback("cache_entries", "Entries held by each in-memory cache", ("cache",),
+                        lambda: cache_counts("entries"))
+REGISTRY.gauge_callback("result_cache_events_total", "On-disk result cache hits, misses, writes, evictions and errors", ("event",),
+                        lambda: {(event,): value for event, value in result_cache_stats().items()
+                                 if event not in ("bytes", "max_bytes")},
+                        kind="counter")
+REGISTRY.gauge_callback("result_cache_bytes", "Bytes held by the on-disk result cache", (),
+                        lambda: {(): result_cache_stats()["bytes"]} if result_cache_stats() else {})
+REGISTRY.gauge_callback("status_checks_written_total", "Status checks written to the store", (),
+                        lambda: {(): status_store.written}, kind="counter")
+REGISTRY.gauge_callback("status_checks_buffered", "Status checks waiting for the next batched write", (),
+                        lambda: {(): status_store.pending})
+REGISTRY.gauge_callback("static_data_version", "Reload counter of the static JSON store", (),
+                        lambda: {(): static_store.version})
 
 def load_static_json(filename):
     """Load data from static JSON files"""
-    filepath = STATIC_DATA_DIR / filename
-    if filepath.exists():
-        with open(filepath, 'r') as f:
-            return json.load(f)
-    return None
+    entry = static_store.get(filename)
+    return entry.data if entry else None
+
+async def run_compute(method, *args, key=None, render=False):
+    """Run a processor method off the event loop, answering 503 while starting up or when the compute queue is full"""
+    compute = getattr(app.state, "compute", None)
+    if compute is None:
+        raise HTTPException(status_code=503, detail="Server starting, please retry", headers={"Retry-After": "1"})
+    try:
+        return await compute.run(method, *args, key=key, render=render)
+    except OverloadedError as e:
+        logging.warning(f"Shedding {method} request: {e}")
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
 
 class StatusCheck(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -54,25 +140,67 @@ class StatusCheckCreate(BaseModel):
     client_name: str
 
 class MetricsResponse(BaseModel):
-    mean_duhi: float
-    area_exceeding_4c: float
-    mean_ndvi: float
-    correlation_ndvi_lst: float
-    mean_lst: float
-    duhi_trend: float
+    # None for a region without valid pixels
+    mean_duhi: Optional[float]
+    area_exceeding_4c: Optional[float]
+    mean_ndvi: Optional[float]
+    correlation_ndvi_lst: Optional[float]
+    mean_lst: Optional[float]
+    duhi_trend: Optional[float]
     region: str
 
 class TimeseriesResponse(BaseModel):
     years: List[int]
-    lst: List[float]
-    ndvi: List[float]
-    duhi: List[float]
+    # None for a year in which the region has no valid pixels
+    lst: List[Optional[float]]
+    ndvi: List[Optional[float]]
+    duhi: List[Optional[float]]
 
 class LocationDataRequest(BaseModel):
     lat: float
     lng: float
     year: Optional[int] = 2025
 
+class LocationPoint(BaseModel):
+    lat: float
+    lng: float
+
+class BatchLocationDataRequest(BaseModel):
+    points: List[LocationPoint]
+    year: Optional[int] = 2025
+
+REGIONAL_BREAKDOWN_FIELDS = ("name", "mean_ndvi", "mean_lst", "duhi_trend", "correlation")
+
+MAX_BATCH_POINTS = int(os.environ.get('MAX_BATCH_POINTS', 50000))
+
+class ZonalStatsRequest(BaseModel):
+    geojson: Dict[str, Any]
+    threshold: Optional[float] = 4.0
+    percentiles: List[float] = [5, 25, 50, 75, 95]
+
+class ScenarioIntervention(BaseModel):
+    type: str  # "ndvi" (uplift) or "albedo" (roof albedo change)
+    amount: float
+    geometry: Optional[Dict[str, Any]] = None
+    landuse: Optional[str] = None
+
+class ScenarioRequest(BaseModel):
+    interventions: List[ScenarioIntervention]
+    threshold: float = 4.0
+
+# Layers served as previews and tiles; "correlation" is the local NDVI-LST r derived from the bands
+MAP_LAYERS = ("duhi", "ndvi", "lst", "correlation")
+
+def resolve_region(region):
+    """Canonical name of a requested region, so aliases share one compute key; 400 for unknown names"""
+    try:
+        return canonical_region(region)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+MAX_ZONAL_FEATURES = int(os.environ.get('MAX_ZONAL_FEATURES', 1000))
+MAX_SCENARIO_INTERVENTIONS = int(os.environ.get('MAX_SCENARIO_INTERVENTIONS', 50))
+
 @api_router.get("/")
 async def root():
     mode = "Static Data Mode" if USE_STATIC_DATA or not MONGODB_AVAILABLE else "Database Mode"
@@ -86,19 +214,31 @@ async def root():
 @api_router.get("/metrics", response_model=MetricsResponse)
 async def get_metrics(region: str = "Peel"):
     """Get key metrics for dashboard KPI cards"""
+    region = resolve_region(region)
     try:
-        metrics = processor.calculate_regional_metrics(region)
+        metrics = await run_compute("calculate_regional_metrics", region, key=("metrics", region))
         return metrics
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error getting metrics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/timeseries", response_model=TimeseriesResponse)
-async def get_timeseries():
-    """Get time series data for trend charts (2018-2025)"""
+async def get_timeseries(request: Request, response: Response, region: str = "Peel"):
+    """Get time series data for trend charts (2018-2025); binary columnar on request via Accept"""
+    region = resolve_region(region)
     try:
-        data = processor.generate_timeseries_data()
+        data = await run_compute("generate_timeseries_data", region, key=("timeseries", region))
+        fmt = negotiate_format(request.headers.get("accept"))
+        if fmt:
+            columns = {"years": np.asarray(data["years"], dtype=np.int16),
+                       **{band: np.asarray(data[band], dtype=np.float64) for band in ("lst", "ndvi", "duhi")}}
+            return columnar_response(fmt, columns, {"region": region})
+        response.headers["Vary"] = "Accept"
         return data
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error getting timeseries: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -107,137 +247,465 @@ async def get_timeseries():
 async def get_location_data(request: LocationDataRequest):
     """Get accurate data for a specific lat/lng location"""
     try:
-        data = processor.get_location_data(request.lat, request.lng, request.year)
+        data = await run_compute("get_location_data", request.lat, request.lng, request.year)
         return data
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error getting location data: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/location-data/batch")
+async def get_location_data_batch(request: BatchLocationDataRequest, http_request: Request):
+    """Get data for many lat/lng locations in one request"""
+    if len(request.points) > MAX_BATCH_POINTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_POINTS} points per request")
+    
+    try:
+        lats = [p.lat for p in request.points]
+        lngs = [p.lng for p in request.points]
+        fmt = negotiate_format(http_request.headers.get("accept"))
+        if fmt:
+            columns = await run_compute("get_locations_columns", lats, lngs, request.year)
+            columns = {"lat": np.asarray(lats), "lng": np.asarray(lngs), **columns}
+            return columnar_response(fmt, columns, {"year": request.year, "count": len(lats)})
+        
+        results = await run_compute("get_locations_data", lats, lngs, request.year) if request.points else []
+        for point, result in zip(request.points, results):
+            result["lat"] = point.lat
+            result["lng"] = point.lng
+        return JSONResponse({"year": request.year, "count": len(results), "results": results}, headers={"Vary": "Accept"})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error getting batch location data: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/zonal-stats")
+async def get_zonal_stats(request: ZonalStatsRequest):
+    """Get LST/NDVI/DUHI statistics inside arbitrary GeoJSON polygons"""
+    features = request.geojson.get("features") if request.geojson.get("type") == "FeatureCollection" else None
+    if features is not None and len(features) > MAX_ZONAL_FEATURES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_ZONAL_FEATURES} features per request")
+    if any(q < 0 or q > 100 for q in request.percentiles):
+        raise HTTPException(status_code=400, detail="percentiles must be between 0 and 100")
+    region = resolve_region(region)
+    
+    try:
+        results = await run_compute("zonal_stats", request.geojson, request.threshold, tuple(request.percentiles))
+        return {"threshold": request.threshold, "count": len(results), "results": results}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error computing zonal stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/scenarios/model")
+async def get_scenario_model():
+    """Get the NDVI->LST response fitted per land-use class and the albedo assumptions behind scenarios"""
+    try:
+        return await run_compute("get_scenario_model", key=("scenario_model",))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error fitting scenario model: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/scenarios/simulate")
+async def simulate_scenario(request: ScenarioRequest):
+    """Simulate greening and cool-roof interventions and return DUHI and hot-area changes per region"""
+    if not request.interventions:
+        raise HTTPException(status_code=400, detail="At least one intervention is required")
+    if len(request.interventions) > MAX_SCENARIO_INTERVENTIONS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_SCENARIO_INTERVENTIONS} interventions per request")
+    
+    try:
+        interventions = [intervention.model_dump() for intervention in request.interventions]
+        return await run_compute("simulate_scenario", interventions, request.threshold)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error simulating scenario: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/layer-preview/{layer_type}")
-async def get_layer_preview(layer_type: str):
+async def get_layer_preview(layer_type: str, request: Request):
     """Get base64 encoded map layer preview"""
-    if layer_type not in ["duhi", "ndvi", "lst"]:
+    if layer_type not in MAP_LAYERS:
         raise HTTPException(status_code=400, detail="Invalid layer type")
     
     try:
-        preview = processor.generate_layer_preview(layer_type)
-        if preview:
-            return {"image": preview, "layer": layer_type}
-        else:
-            raise HTTPException(status_code=500, detail="Failed to generate preview")
+        png, etag = await run_compute("render_layer_preview", layer_type, key=("preview", layer_type), render=True)
+        headers = {"ETag": etag}
+        # The middleware gzips/brotlis the JSON and suffixes the ETag, so revalidate against that tag
+        sent = coded_etag(etag, negotiate_encoding(request.headers.get("accept-encoding"), available_encodings()))
+        if etag_matches(request.headers.get("if-none-match"), sent):
+            return Response(status_code=304, headers={"ETag": sent, "Vary": "Accept-Encoding"})
+        
+        with span("preview.base64"):
+            preview = f"data:image/png;base64,{base64.b64encode(png).decode('utf-8')}"
+        return JSONResponse({"image": preview, "layer": layer_type}, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error generating layer preview: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/tiles/{layer_type}/{z}/{x}/{y}.png")
+async def get_map_tile(layer_type: str, z: int, x: int, y: int):
+    """Get a 256px XYZ map tile for a layer as raw PNG bytes"""
+    if layer_type not in MAP_LAYERS:
+        raise HTTPException(status_code=400, detail="Invalid layer type")
+    if not 0 <= z <= MAX_ZOOM or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    
+    try:
+        png = await run_compute("render_tile", layer_type, z, x, y, key=("tile", layer_type, z, x, y), render=True)
+        return Response(content=png, media_type="image/png")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error rendering tile {layer_type}/{z}/{x}/{y}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def parse_bbox(bbox):
+    """Parse a "west,south,east,north" query parameter (None passes through)"""
+    if bbox is None:
+        return None
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
+    if west > east or south > north:
+        raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
+    return west, south, east, north
+
 @api_router.get("/geojson/hotspots")
-async def get_hotspots():
-    """Get hotspot locations as GeoJSON with heat sources"""
+async def get_hotspots(bbox: Optional[str] = None, zoom: Optional[int] = None):
+    """Get hot and cool zones detected from the DUHI raster as GeoJSON, optionally only those visible in a map view"""
+    bounds = parse_bbox(bbox)
     try:
-        return processor.get_hotspots()
+        return await run_compute("get_hotspots", bounds, zoom, key=("hotspots", bounds, zoom))
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error getting hotspots: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/geojson/isotherms")
+async def get_isotherms(bbox: Optional[str] = None, zoom: Optional[int] = None, levels: Optional[str] = None):
+    """Get DUHI isotherm polygons (2/4/6 °C) simplified for a map zoom as GeoJSON"""
+    bounds = parse_bbox(bbox)
+    try:
+        selected = tuple(float(v) for v in levels.split(",") if v.strip()) if levels else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="levels must be comma-separated numbers")
+    try:
+        return await run_compute("get_isotherms", bounds, zoom, selected, key=("isotherms", bounds, zoom, selected))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error getting isotherms: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/regional-breakdown")
-async def get_regional_breakdown():
+async def get_regional_breakdown(request: Request):
     """Get metrics breakdown by region"""
     try:
+        fmt = negotiate_format(request.headers.get("accept"))
+        
         # Try static data first if enabled
         if USE_STATIC_DATA or not MONGODB_AVAILABLE:
-            static_data = load_static_json('regional_breakdown.json')
-            if static_data:
-                return static_data
+            entry = static_store.get('regional_breakdown.json')
+            if entry:
+                if fmt:
+                    return columnar_response(fmt, records_to_columns(entry.data, REGIONAL_BREAKDOWN_FIELDS))
+                response = entry.response(request)
+                response.headers["Vary"] = "Accept, Accept-Encoding"
+                return response
         
-        return processor.get_regional_breakdown()
+        regions = await run_compute("get_regional_breakdown", key=("regional-breakdown",))
+        if fmt:
+            return columnar_response(fmt, records_to_columns(regions, REGIONAL_BREAKDOWN_FIELDS))
+        return JSONResponse(regions, headers={"Vary": "Accept"})
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error getting regional breakdown: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/land-use-distribution")
-async def get_land_use_distribution():
+async def get_land_use_distribution(request: Request):
     """Get land use distribution for pie chart"""
     try:
         if USE_STATIC_DATA or not MONGODB_AVAILABLE:
-            static_data = load_static_json('land_use.json')
-            if static_data:
-                return static_data
+            entry = static_store.get('land_use.json')
+            if entry:
+                return entry.response(request)
         
-        return processor.get_land_use_distribution()
+        return await run_compute("get_land_use_distribution", key=("land-use",))
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error getting land use distribution: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/heat-distribution")
-async def get_heat_distribution():
+async def get_heat_distribution(request: Request):
     """Get heat level distribution for bar chart"""
     try:
         if USE_STATIC_DATA or not MONGODB_AVAILABLE:
-            static_data = load_static_json('heat_distribution.json')
-            if static_data:
-                return static_data
+            entry = static_store.get('heat_distribution.json')
+            if entry:
+                return entry.response(request)
         
-        return processor.get_heat_distribution()
+        return await run_compute("get_heat_distribution", key=("heat-distribution",))
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error getting heat distribution: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/distribution/{layer_type}")
+async def get_band_distribution(layer_type: str, region: str = "Peel", threshold: Optional[float] = None,
+                                percentiles: str = "5,25,50,75,95"):
+    """Get histogram, percentiles and area above a threshold for a layer"""
+    if layer_type not in ["duhi", "ndvi", "lst"]:
+        raise HTTPException(status_code=400, detail="Invalid layer type")
+    try:
+        qs = tuple(float(q) for q in percentiles.split(",") if q.strip())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="percentiles must be comma-separated numbers")
+    if any(q < 0 or q > 100 for q in qs):
+        raise HTTPException(status_code=400, detail="percentiles must be between 0 and 100")
+    region = resolve_region(region)
+    
+    try:
+        return await run_compute("get_band_distribution", layer_type, region, threshold, qs,
+                                 key=("distribution", layer_type, region, threshold, qs))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error getting distribution: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+INSIGHTS = [
+    {
+        "category": "THE PROBLEM",
+        "title": "Almost Half of Peel is Dangerously Hot",
+        "text": "42% of our region is over 4°C hotter than nearby countryside. That's like adding 10 extra scorching summer days per year. Industrial areas and parking lots are the worst offenders.",
+        "icon": "thermometer"
+    },
+    {
+        "category": "WHY IT HAPPENS",
+        "title": "We Cut Down Trees, Heat Goes Up",
+        "text": "Simple math: Less green = More heat. When we replace trees and grass with concrete and asphalt, we create heat traps. These surfaces absorb sunlight all day and radiate heat all night.",
+        "icon": "activity"
+    },
+    {
+        "category": "WHERE TO ACT",
+        "title": "Cool Zones Show Us What Works",
+        "text": "Claireville Conservation and forested areas stay 3-5°C cooler than downtown. Copy their recipe: more trees, green spaces, and water features. Target industrial zones and commercial districts first.",
+        "icon": "map-pin"
+    },
+    {
+        "category": "THE SOLUTION",
+        "title": "Small Changes, Big Impact",
+        "text": "Plant trees to add just 10% more greenery → Cool temps by 1.5°C. Paint roofs white → Reduce building heat by 30%. These aren't expensive - tree planting costs less than treating heat-related illness.",
+        "icon": "trending-down"
+    },
+    {
+        "category": "WHY ACT NOW",
+        "title": "It's Getting Worse Fast",
+        "text": "Peel is heating up 3.8°C every year - fastest in the Greater Toronto Area. If we don't act now, heat waves will become the norm, not the exception. This affects everyone: kids, elderly, your energy bills.",
+        "icon": "alert-circle"
+    }
+]
+
 @api_router.get("/insights")
 async def get_insights():
     """Get auto-generated insights based on data"""
-    insights = [
-        {
-            "category": "THE PROBLEM",
-            "title": "Almost Half of Peel is Dangerously Hot",
-            "text": "42% of our region is over 4°C hotter than nearby countryside. That's like adding 10 extra scorching summer days per year. Industrial areas and parking lots are the worst offenders.",
-            "icon": "thermometer"
-        },
-        {
-            "category": "WHY IT HAPPENS",
-            "title": "We Cut Down Trees, Heat Goes Up",
-            "text": "Simple math: Less green = More heat. When we replace trees and grass with concrete and asphalt, we create heat traps. These surfaces absorb sunlight all day and radiate heat all night.",
-            "icon": "activity"
-        },
-        {
-            "category": "WHERE TO ACT",
-            "title": "Cool Zones Show Us What Works",
-            "text": "Claireville Conservation and forested areas stay 3-5°C cooler than downtown. Copy their recipe: more trees, green spaces, and water features. Target industrial zones and commercial districts first.",
-            "icon": "map-pin"
-        },
-        {
-            "category": "THE SOLUTION",
-            "title": "Small Changes, Big Impact",
-            "text": "Plant trees to add just 10% more greenery → Cool temps by 1.5°C. Paint roofs white → Reduce building heat by 30%. These aren't expensive - tree planting costs less than treating heat-related illness.",
-            "icon": "trending-down"
-        },
-        {
-            "category": "WHY ACT NOW",
-            "title": "It's Getting Worse Fast",
-            "text": "Peel is heating up 3.8°C every year - fastest in the Greater Toronto Area. If we don't act now, heat waves will become the norm, not the exception. This affects everyone: kids, elderly, your energy bills.",
-            "icon": "alert-circle"
-        }
-    ]
-    return insights
+    return INSIGHTS
+
+async def dashboard_section(name, region, layer):
+    """Compute one /api/dashboard section (the same document its standalone endpoint returns)"""
+    if name == "metrics":
+        metrics = await run_compute("calculate_regional_metrics", region, key=("metrics", region))
+        return MetricsResponse(**metrics).model_dump()
+    if name == "timeseries":
+        data = await run_compute("generate_timeseries_data", region, key=("timeseries", region))
+        return TimeseriesResponse(**data).model_dump()
+    if name == "regional_breakdown":
+        if USE_STATIC_DATA or not MONGODB_AVAILABLE:
+            entry = static_store.get('regional_breakdown.json')
+            if entry:
+                return entry.data
+        return await run_compute("get_regional_breakdown", key=("regional-breakdown",))
+    if name == "insights":
+        return INSIGHTS
+    if name == "hotspots":
+        return await run_compute("get_hotspots", None, None, key=("hotspots", None, None))
+    if name == "layer_preview":
+        png, _ = await run_compute("render_layer_preview", layer, key=("preview", layer), render=True)
+        with span("preview.base64"):
+            return {"image": f"data:image/png;base64,{base64.b64encode(png).decode('utf-8')}", "layer": layer}
+    raise ValueError(f"Unknown dashboard section: {name}")
+
+def project_fields(data, fields):
+    """Keep only the selected keys of a section (applied per record for list sections)"""
+    if not fields:
+        return data
+    if isinstance(data, list):
+        return [project_fields(record, fields) for record in data]
+    if isinstance(data, dict):
+        return {k: v for k, v in data.items() if k in fields}
+    return data
+
+def dashboard_json(document):
+    with span("dashboard.serialize"):
+        return json.dumps(document, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+# Sections the KPI cards and charts need come first; the rest follow as separate NDJSON parts
+DASHBOARD_SECTIONS = ("metrics", "timeseries", "regional_breakdown", "insights", "hotspots", "layer_preview")
+DASHBOARD_DEFERRED = ("hotspots", "layer_preview")
+
+@api_router.get("/dashboard")
+async def get_dashboard(request: Request, region: str = "Peel", sections: Optional[str] = None,
+                        fields: Optional[str] = None, layer: str = "duhi"):
+    """Get every dashboard section in one document computed concurrently; NDJSON parts via Accept: application/x-ndjson"""
+    selected = [s.strip() for s in sections.split(",") if s.strip()] if sections else list(DASHBOARD_SECTIONS)
+    unknown = [s for s in selected if s not in DASHBOARD_SECTIONS]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"sections must be a comma-separated subset of {', '.join(DASHBOARD_SECTIONS)}")
+    selected = [s for s in DASHBOARD_SECTIONS if s in selected]
+    if "layer_preview" in selected and layer not in MAP_LAYERS:
+        raise HTTPException(status_code=400, detail="Invalid layer type")
+    region = resolve_region(region)
+
+    # fields=metrics.mean_duhi,regional_breakdown.name keeps only those keys of each named section
+    selectors = {}
+    for field in (f.strip() for f in (fields or "").split(",")):
+        if not field:
+            continue
+        section, _, key = field.partition(".")
+        if section not in selected or not key:
+            raise HTTPException(status_code=400, detail="fields must be section.field for a selected section")
+        selectors.setdefault(section, set()).add(key)
+
+    async def section(name):
+        return name, project_fields(await dashboard_section(name, region, layer), selectors.get(name))
+
+    tasks = {name: asyncio.ensure_future(section(name)) for name in selected}
+    streaming = "application/x-ndjson" in (request.headers.get("accept") or "")
+    primary = [name for name in selected if not streaming or name not in DASHBOARD_DEFERRED]
+    try:
+        document = dict(await asyncio.gather(*(tasks[name] for name in primary)))
+    except HTTPException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+    except ValueError as e:
+        for task in tasks.values():
+            task.cancel()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        for task in tasks.values():
+            task.cancel()
+        logging.error(f"Error building dashboard: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not streaming:
+        return Response(content=dashboard_json(document), media_type="application/json", headers={"Vary": "Accept"})
+
+    deferred = {tasks[name]: name for name in selected if name not in primary}
+
+    async def parts():
+        pending = set(deferred)
+        try:
+            yield dashboard_json(document) + b"\n"
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        name, data = task.result()
+                        yield dashboard_json({name: data}) + b"\n"
+                    except Exception as e:
+                        # Headers are already sent, so a failed deferred section is reported in-band
+                        detail = e.detail if isinstance(e, HTTPException) else str(e)
+                        logging.error(f"Error streaming dashboard section {deferred[task]}: {detail}")
+                        yield dashboard_json({"errors": {deferred[task]: detail}}) + b"\n"
+        finally:
+            for task in pending:
+                task.cancel()
+
+    return StreamingResponse(parts(), media_type="application/x-ndjson", headers={"Vary": "Accept"})
 
 # Legacy routes
+MAX_STATUS_PAGE = 1000
+
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
-    status_dict = input.model_dump()
-    status_obj = StatusCheck(**status_dict)
-    doc = status_obj.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
-    _ = await db.status_checks.insert_one(doc)
+    status_obj = StatusCheck(**input.model_dump())
+    try:
+        await status_store.add(status_obj.model_dump())
+    except Exception as e:
+        logging.error(f"Error storing status check: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
-    for check in status_checks:
-        if isinstance(check['timestamp'], str):
-            check['timestamp'] = datetime.fromisoformat(check['timestamp'])
-    return status_checks
+async def get_status_checks(response: Response, limit: int = MAX_STATUS_PAGE, cursor: Optional[str] = None,
+                            client_name: Optional[str] = None):
+    """Get status checks newest first; follow X-Next-Cursor for the next page"""
+    limit = max(1, min(limit, MAX_STATUS_PAGE))
+    try:
+        checks, next_cursor = await status_store.page(limit, cursor, client_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error getting status checks: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return checks
+
+@api_router.get("/status/export")
+async def export_status_checks(client_name: Optional[str] = None):
+    """Stream every status check as NDJSON, newest first"""
+    async def lines():
+        async for check in status_store.iter_checks(client_name=client_name):
+            yield StatusCheck(**check).model_dump_json() + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/internal/metrics", include_in_schema=False)
+async def get_internal_metrics():
+    """Prometheus text-format metrics"""
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/internal/ready", include_in_schema=False)
+async def get_readiness():
+    """Readiness probe: 200 once warm, 503 while warming up"""
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+@app.get("/internal/profiles", include_in_schema=False)
+async def get_slow_request_profiles():
+    """Stack profiles of recent slow requests (enable with PROFILE_SLOW_REQUESTS_MS)"""
+    if profiler is None:
+        return {"enabled": False, "profiles": []}
+    return {"enabled": True, "threshold_ms": profiler.threshold * 1000, "profiles": list(profiler.profiles)}
 
 app.include_router(api_router)
 
+app.add_middleware(
+    HTTPCacheMiddleware,
+    min_size=int(os.environ.get('COMPRESSION_MIN_SIZE', 1024)),
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -246,13 +714,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so latency and bytes include compression and CORS
+app.add_middleware(InstrumentationMiddleware, profiler=profiler)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+async def warm_up():
+    """Map rasters and fill the statistics, time-cube and preview caches off the event loop"""
+    try:
+        timings = await app.state.compute.run("warm_up", key=("warm_up",))
+        readiness.update(ready=True, warmup=timings)
+        logger.info(f"Warmup finished: {timings}")
+    except Exception as e:
+        logging.error(f"Warmup failed: {e}")
+        readiness["error"] = str(e)
+
+@app.on_event("startup")
+async def load_static_data():
+    global status_store, warmup_task
+    static_store.start()
+    
+    # Built here rather than at import so importing the app touches no cache directory
+    processor = GeoTIFFProcessor()
+    app.state.processor = processor
+    app.state.compute = ComputeExecutor.from_env(processor)
+    
+    if MONGODB_AVAILABLE:
+        connect_mongo()
+    if MONGODB_AVAILABLE:
+        status_store = MongoStatusStore(db.status_checks, **StatusCheckStore.settings_from_env())
+    else:
+        logging.warning("MongoDB not configured. Using static data mode.")
+    await status_store.start()
+    
+    if WARMUP_ENABLED:
+        warmup_task = asyncio.get_running_loop().create_task(warm_up())
+    else:
+        readiness["ready"] = True
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if warmup_task is not None:
+        warmup_task.cancel()
+    static_store.stop()
+    await status_store.stop()
+    if getattr(app.state, "compute", None) is not None:
+        app.state.compute.shutdown()
     if MONGODB_AVAILABLE and client:
         client.close()
@@ -0,0 +1,117 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import signal
+import threading
+from pathlib import Path
+from fastapi.responses import Response
+from http_cache import brotli, negotiate_encoding, etag_matches
+
+logger = logging.getLogger(__name__)
+
+STATIC_SUFFIXES = {".json": "application/json", ".geojson": "application/geo+json"}
+
+
+class StaticEntry:
+    """One static file, parsed and pre-encoded for every supported content-coding"""
+
+    def __init__(self, path, data, mtime_ns):
+        self.path = path
+        self.data = data
+        self.mtime_ns = mtime_ns
+        self.media_type = STATIC_SUFFIXES[path.suffix]
+
+        body = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        digest = hashlib.sha1(body).hexdigest()
+        self.bodies = {None: body, "gzip": gzip.compress(body, compresslevel=9)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(body)
+        self.etags = {coding: f'"{digest}-{coding}"' if coding else f'"{digest}"' for coding in self.bodies}
+
+    def response(self, request):
+        """Build a (possibly 304) response negotiated against the request headers"""
+        coding = negotiate_encoding(request.headers.get("accept-encoding"), self.bodies)
+        headers = {"ETag": self.etags[coding], "Vary": "Accept-Encoding"}
+
+        if etag_matches(request.headers.get("if-none-match"), self.etags[coding]):
+            return Response(status_code=304, headers=headers)
+
+        if coding:
+            headers["Content-Encoding"] = coding
+        return Response(content=self.bodies[coding], media_type=self.media_type, headers=headers)
+
+
+class StaticDataStore:
+    """Loads data/static once, serves pre-encoded bytes, and hot-reloads on change or SIGHUP"""
+
+    def __init__(self, data_dir):
+        self.data_dir = Path(data_dir)
+        self.version = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._watch_task = None
+
+    def get(self, filename):
+        return self._entries.get(filename)
+
+    def reload(self):
+        """Re-read files whose mtime changed; returns the names that were (re)loaded"""
+        with self._lock:
+            entries = dict(self._entries)
+            changed = []
+            present = set()
+            for path in sorted(self.data_dir.glob("*")) if self.data_dir.is_dir() else []:
+                if path.suffix not in STATIC_SUFFIXES:
+                    continue
+                present.add(path.name)
+                mtime_ns = path.stat().st_mtime_ns
+                current = entries.get(path.name)
+                if current is not None and current.mtime_ns == mtime_ns:
+                    continue
+                try:
+                    with open(path, 'r') as f:
+                        entries[path.name] = StaticEntry(path, json.load(f), mtime_ns)
+                    changed.append(path.name)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Error loading static file {path}: {e}")
+
+            for name in set(entries) - present:
+                del entries[name]
+                changed.append(name)
+
+            if changed:
+                self._entries = entries
+                self.version += 1
+                logger.info(f"Static data v{self.version}: reloaded {', '.join(changed)}")
+            return changed
+
+    async def _watch(self):
+        try:
+            from watchfiles import awatch
+        except ImportError:
+            awatch = None
+
+        if awatch is not None:
+            async for _ in awatch(self.data_dir):
+                self.reload()
+        else:
+            while True:
+                await asyncio.sleep(5)
+                self.reload()
+
+    def start(self):
+        """Load everything and start hot-reloading (file watcher plus SIGHUP)"""
+        self.reload()
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGHUP, self.reload)
+        except (NotImplementedError, RuntimeError, AttributeError):
+            logger.info("SIGHUP reload not available on this platform")
+        if self.data_dir.is_dir():
+            self._watch_task = loop.create_task(self._watch())
+
+    def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
@@ -0,0 +1,222 @@
+import asyncio
+import base64
+import bisect
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(doc):
+    """Opaque pagination token pointing just past doc (newest-first order)"""
+    raw = json.dumps([doc["timestamp"].isoformat(), doc["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        timestamp, doc_id = json.loads(raw)
+        return _as_utc(datetime.fromisoformat(timestamp)), str(doc_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+
+
+def _as_utc(timestamp):
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+
+class StatusCheckStore:
+    """Buffers status checks and writes them in batches on a size or time flush.
+
+    Subclasses implement _write(docs), _ensure_indexes() and iter_checks().
+    Reads flush the buffer first so a client always sees its own checks.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=1.0, ttl_days=30):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.ttl = timedelta(days=ttl_days) if ttl_days else None
+        self.written = 0
+        self.flushes = 0
+        self._buffer = []
+        self._lock = asyncio.Lock()
+        self._flush_task = None
+        self._index_task = None
+
+    @classmethod
+    def settings_from_env(cls):
+        return {
+            "batch_size": int(os.environ.get('STATUS_BATCH_SIZE', 100)),
+            "flush_interval": int(os.environ.get('STATUS_FLUSH_INTERVAL_MS', 1000)) / 1000,
+            "ttl_days": float(os.environ.get('STATUS_TTL_DAYS', 30)),
+        }
+
+    @property
+    def pending(self):
+        """Checks buffered for the next batched write"""
+        return len(self._buffer)
+
+    async def add(self, doc):
+        """Queue one check (timestamp as a native datetime); flushes when the batch is full"""
+        self._buffer.append(doc)
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._buffer:
+                return
+            docs, self._buffer = self._buffer, []
+            try:
+                await self._write(docs)
+            except Exception:
+                # Keep the checks for the next flush rather than dropping them
+                self._buffer[:0] = docs
+                raise
+            self.written += len(docs)
+            self.flushes += 1
+
+    async def page(self, limit=1000, cursor=None, client_name=None):
+        """Return (checks newest first, next cursor or None)"""
+        docs = []
+        async for doc in self.iter_checks(limit=limit + 1, cursor=cursor, client_name=client_name):
+            docs.append(doc)
+        next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+        return docs[:limit], next_cursor
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing status checks: {e}")
+
+    async def _create_indexes(self):
+        try:
+            await self._ensure_indexes()
+        except Exception as e:
+            logger.error(f"Error creating status check indexes: {e}")
+
+    async def start(self):
+        """Start the periodic flush; indexes are created in the background so startup never waits on the database"""
+        loop = asyncio.get_running_loop()
+        self._index_task = loop.create_task(self._create_indexes())
+        self._flush_task = loop.create_task(self._flush_periodically())
+
+    async def stop(self):
+        for task in (self._index_task, self._flush_task):
+            if task is not None:
+                task.cancel()
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing status checks on shutdown: {e}")
+
+    async def _write(self, docs):
+        raise NotImplementedError
+
+    async def _ensure_indexes(self):
+        pass
+
+    async def iter_checks(self, limit=None, cursor=None, client_name=None):
+        """Async iterator over checks, newest first, strictly after cursor"""
+        raise NotImplementedError
+
+
+class MongoStatusStore(StatusCheckStore):
+    """Status checks in a MongoDB collection with a TTL index and keyset pagination"""
+
+    def __init__(self, collection, **settings):
+        super().__init__(**settings)
+        self.collection = collection
+
+    async def _write(self, docs):
+        await self.collection.insert_many(docs, ordered=False)
+
+    async def _ensure_indexes(self):
+        # Older deployments stored ISO strings; convert them so the TTL index applies
+        result = await self.collection.update_many(
+            {"timestamp": {"$type": "string"}},
+            [{"$set": {"timestamp": {"$toDate": "$timestamp"}}}],
+        )
+        if result.modified_count:
+            logger.info(f"Converted {result.modified_count} status check timestamps to dates")
+
+        if self.ttl is not None:
+            await self.collection.create_index(
+                "timestamp", name="timestamp_ttl", expireAfterSeconds=int(self.ttl.total_seconds()))
+        await self.collection.create_index([("timestamp", -1), ("id", -1)], name="timestamp_id")
+        await self.collection.create_index([("client_name", 1), ("timestamp", -1), ("id", -1)], name="client_timestamp_id")
+
+    async def iter_checks(self, limit=None, cursor=None, client_name=None):
+        await self.flush()
+        query = {}
+        if client_name is not None:
+            query["client_name"] = client_name
+        if cursor is not None:
+            timestamp, doc_id = decode_cursor(cursor)
+            query["$or"] = [{"timestamp": {"$lt": timestamp}}, {"timestamp": timestamp, "id": {"$lt": doc_id}}]
+
+        find = self.collection.find(query, {"_id": 0}).sort([("timestamp", -1), ("id", -1)])
+        if limit:
+            find = find.limit(limit).batch_size(min(limit, 1000))
+        async for doc in find:
+            doc["timestamp"] = _as_utc(doc["timestamp"])
+            yield doc
+
+
+class MemoryStatusStore(StatusCheckStore):
+    """In-process stand-in used when MongoDB is unavailable (lost on restart)"""
+
+    def __init__(self, max_checks=100000, **settings):
+        super().__init__(**settings)
+        self.max_checks = max_checks
+        # Sorted oldest first by (timestamp, id)
+        self._keys = []
+        self._docs = []
+
+    async def _write(self, docs):
+        for doc in docs:
+            doc = dict(doc, timestamp=_as_utc(doc["timestamp"]))
+            key = (doc["timestamp"], doc["id"])
+            i = bisect.bisect_right(self._keys, key)
+            self._keys.insert(i, key)
+            self._docs.insert(i, doc)
+
+        expired = 0
+        if self.ttl is not None:
+            expired = bisect.bisect_left(self._keys, (datetime.now(timezone.utc) - self.ttl, ""))
+        expired = max(expired, len(self._docs) - self.max_checks)
+        if expired > 0:
+            del self._keys[:expired]
+            del self._docs[:expired]
+
+    async def iter_checks(self, limit=None, cursor=None, client_name=None):
+        await self.flush()
+        key = decode_cursor(cursor) if cursor is not None else None
+        chunk = limit or 1000
+        produced = 0
+        while True:
+            # Copy one chunk under the write lock and continue from its last key, so a page costs
+            # O(limit) and flushes may insert and expire while a slow consumer is iterating
+            async with self._lock:
+                end = len(self._keys) if key is None else bisect.bisect_left(self._keys, key)
+                start = max(end - chunk, 0)
+                docs = self._docs[start:end]
+
+            for doc in reversed(docs):
+                if client_name is not None and doc["client_name"] != client_name:
+                    continue
+                yield dict(doc)
+                produced += 1
+                if limit and produced >= limit:
+                    return
+            if start == 0:
+                return
+            key = (docs[0]["timestamp"], docs[0]["id"])
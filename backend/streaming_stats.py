@@ -0,0 +1,156 @@
+import numpy as np
+import os
+
+# Pixels per block when walking a raster; bounds peak memory independently of raster size
+BLOCK_PIXELS = int(os.environ.get('STATS_BLOCK_PIXELS', 1 << 20))
+
+
+def iter_blocks(window, block_pixels=BLOCK_PIXELS):
+    """Split a (row_off, col_off, height, width) window into full-width row strips"""
+    row_off, col_off, height, width = window
+    block_rows = max(1, block_pixels // max(width, 1))
+    for start in range(row_off, row_off + height, block_rows):
+        yield start, col_off, min(block_rows, row_off + height - start), width
+
+
+class RunningMoments:
+    """Count, mean, variance, min and max merged block-by-block (Chan/Welford update)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        n_b = values.size
+        if n_b == 0:
+            return
+        mean_b = float(values.mean())
+        m2_b = float(np.square(values - mean_b).sum())
+        self._merge(n_b, mean_b, m2_b)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other):
+        if other.count:
+            self._merge(other.count, other.mean, other.m2)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+
+    def _merge(self, n_b, mean_b, m2_b):
+        n = self.count + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * self.count * n_b / n
+        self.count = n
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count else float('nan')
+
+
+class RunningCovariance:
+    """Paired moments of (x, y) merged block-by-block, giving a numerically stable Pearson r"""
+
+    def __init__(self):
+        self.x = RunningMoments()
+        self.y = RunningMoments()
+        self.comoment = 0.0
+
+    @property
+    def count(self):
+        return self.x.count
+
+    def update(self, x, y):
+        n_b = x.size
+        if n_b == 0:
+            return
+        mean_x_b = float(x.mean())
+        mean_y_b = float(y.mean())
+        comoment_b = float(np.dot(x - mean_x_b, y - mean_y_b))
+        self._merge_comoment(n_b, mean_x_b, mean_y_b, comoment_b)
+        self.x.update(x)
+        self.y.update(y)
+
+    def merge(self, other):
+        if other.count:
+            self._merge_comoment(other.count, other.x.mean, other.y.mean, other.comoment)
+            self.x.merge(other.x)
+            self.y.merge(other.y)
+
+    def _merge_comoment(self, n_b, mean_x_b, mean_y_b, comoment_b):
+        n_a = self.count
+        n = n_a + n_b
+        self.comoment += comoment_b + (mean_x_b - self.x.mean) * (mean_y_b - self.y.mean) * n_a * n_b / n
+
+    @property
+    def correlation(self):
+        """Pearson r, or None when undefined"""
+        if self.count <= 100 or self.x.m2 <= 0 or self.y.m2 <= 0:
+            return None
+        return self.comoment / np.sqrt(self.x.m2 * self.y.m2)
+
+
+class RunningHistogram:
+    """Fixed-width bins over [lo, hi) plus underflow/overflow, accumulated with np.bincount"""
+
+    def __init__(self, lo, hi, bins):
+        self.lo = float(lo)
+        self.hi = float(hi)
+        self.bins = int(bins)
+        self.width = (self.hi - self.lo) / self.bins
+        # counts[0] is underflow, counts[-1] overflow
+        self.counts = np.zeros(self.bins + 2, dtype=np.int64)
+
+    def update(self, values):
+        if values.size == 0:
+            return
+        idx = np.floor((values - self.lo) / self.width).astype(np.int64) + 1
+        np.clip(idx, 0, self.bins + 1, out=idx)
+        self.counts += np.bincount(idx, minlength=self.bins + 2)
+
+    def merge(self, other):
+        self.counts += other.counts
+
+    @property
+    def edges(self):
+        return np.linspace(self.lo, self.hi, self.bins + 1)
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def count_below(self, value):
+        """Samples below value, interpolating linearly inside the bin that contains it"""
+        if value <= self.lo:
+            return float(self.counts[0])
+        if value >= self.hi:
+            return float(self.counts[:-1].sum())
+        position = (value - self.lo) / self.width
+        i = int(position)
+        return float(self.counts[:i + 1].sum() + (position - i) * self.counts[i + 1])
+
+    def fraction_below(self, value):
+        total = self.total
+        return self.count_below(value) / total if total else float('nan')
+
+    def fraction_at_least(self, value):
+        return 1.0 - self.fraction_below(value)
+
+    def percentile(self, q):
+        """Approximate q-th percentile (0-100), exact to within one bin width"""
+        total = self.total
+        if total == 0:
+            return float('nan')
+        target = q / 100.0 * total
+        cumulative = np.cumsum(self.counts)
+        i = int(np.searchsorted(cumulative, target, side='left'))
+        if i == 0:
+            return self.lo
+        if i > self.bins:
+            return self.hi
+        before = cumulative[i - 1]
+        frac = (target - before) / self.counts[i] if self.counts[i] else 0.0
+        return self.lo + (i - 1 + frac) * self.width
@@ -0,0 +1,174 @@
+import numpy as np
+import functools
+import math
+import logging
+from colormap import apply_lut, encode_png
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+MAX_ZOOM = 22
+
+
+def tile_pixel_centers(z, x, y, size=TILE_SIZE):
+    """Return (lats, lngs) of the pixel centres of an XYZ web-mercator tile"""
+    n = 2 ** z
+    offsets = (np.arange(size) + 0.5) / size
+    lngs = (x + offsets) / n * 360.0 - 180.0
+    merc_y = math.pi * (1 - 2 * (y + offsets) / n)
+    lats = np.degrees(np.arctan(np.sinh(merc_y)))
+    return lats, lngs
+
+
+def tile_bounds(z, x, y):
+    """Return (west, south, east, north) of an XYZ tile"""
+    n = 2 ** z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return west, south, east, north
+
+
+def tiles_covering(bounds, z):
+    """Yield (x, y) of every XYZ tile at zoom z intersecting a (west, south, east, north) bbox"""
+    west, south, east, north = bounds
+    n = 2 ** z
+
+    def to_tile(lat, lng):
+        x = int((lng + 180.0) / 360.0 * n)
+        y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+        return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+    x0, y0 = to_tile(north, west)
+    x1, y1 = to_tile(south, east)
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            yield x, y
+
+
+def downsample(data, strip_rows=1024, quantization=None):
+    """Halve a raster's resolution with a NaN-aware 2x2 mean, one row strip at a time.
+
+    Quantized input is decoded per strip and the result re-encoded, so every level stays compact.
+    """
+    rows, cols = data.shape
+    out = np.empty(((rows + 1) // 2, (cols + 1) // 2), dtype=np.float32)
+
+    for start in range(0, rows, strip_rows):
+        strip = data[start:start + strip_rows]
+        strip = quantization.decode(strip) if quantization is not None else np.asarray(strip, dtype=np.float32)
+        h, w = strip.shape
+        padded = np.full((h + h % 2, w + w % 2), np.nan, dtype=np.float32)
+        padded[:h, :w] = strip
+
+        blocks = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2)
+        valid = np.isfinite(blocks)
+        sums = np.where(valid, blocks, 0).sum(axis=(1, 3))
+        counts = valid.sum(axis=(1, 3))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[start // 2:start // 2 + sums.shape[0]] = np.where(counts > 0, sums / counts, np.nan)
+
+    return quantization.encode(out) if quantization is not None else out
+
+
+class TilePyramid:
+    """A band plus its precomputed power-of-two overview levels"""
+
+    def __init__(self, version, levels, quantization=None):
+        self.version = version
+        # [(data, transform)] from full resolution (level 0) to coarsest; codes when quantization is set
+        self.levels = levels
+        self.quantization = quantization
+        self._code_luts = {}
+
+    @classmethod
+    def build(cls, band, min_size=TILE_SIZE):
+        """Precompute overviews until the coarsest level fits within one tile"""
+        levels = [(band.data, band.transform)]
+        data, transform = band.data, band.transform
+        while max(data.shape) > min_size:
+            data = downsample(data, quantization=band.quantization)
+            west, xres, _, north, _, yres = transform
+            transform = (west, xres * 2, 0.0, north, 0.0, yres * 2)
+            levels.append((data, transform))
+        logger.info(f"Built {len(levels)} overview levels for {band.name}")
+        return cls(band.version, levels, band.quantization)
+
+    @property
+    def nodata(self):
+        return self.quantization.nodata if self.quantization is not None else np.nan
+
+    def level_values(self, level):
+        """Physical values of one overview level as float32 (NaN for nodata)"""
+        data = self.levels[level][0]
+        return self.quantization.decode(data) if self.quantization is not None else np.asarray(data, dtype=np.float32)
+
+    def colorize(self, pixels, lut, vmin, vmax):
+        """Colormap sampled pixels to RGBA; quantized pixels index a per-code table with no float conversion"""
+        if self.quantization is None:
+            return apply_lut(pixels, lut, vmin, vmax)
+        key = (id(lut), vmin, vmax)
+        code_lut = self._code_luts.get(key)
+        if code_lut is None:
+            code_lut = apply_lut(self.quantization.code_values()[np.newaxis, :], lut, vmin, vmax)[0]
+            self._code_luts[key] = code_lut
+        return code_lut[self.quantization.lookup_indices(pixels)]
+
+    def bounds(self):
+        data, (west, xres, _, north, _, yres) = self.levels[0]
+        rows, cols = data.shape
+        return west, north + rows * yres, west + cols * xres, north
+
+    def select_level(self, z):
+        """Pick the coarsest overview that is still at least as fine as the tile's pixels"""
+        base_res = self.levels[0][1][1]
+        tile_res = 360.0 / (2 ** z * TILE_SIZE)
+        level = int(math.floor(math.log2(tile_res / base_res))) if tile_res > base_res else 0
+        return min(max(level, 0), len(self.levels) - 1)
+
+    def sample_tile(self, z, x, y):
+        """Nearest-neighbour sample the tile's stored pixels, or None if it misses the raster"""
+        west, south, east, north = self.bounds()
+        t_west, t_south, t_east, t_north = tile_bounds(z, x, y)
+        if t_east <= west or t_west >= east or t_north <= south or t_south >= north:
+            return None
+
+        data, (l_west, xres, _, l_north, _, yres) = self.levels[self.select_level(z)]
+        lats, lngs = tile_pixel_centers(z, x, y)
+        rows = np.floor((lats - l_north) / yres).astype(np.int64)
+        cols = np.floor((lngs - l_west) / xres).astype(np.int64)
+        row_ok = (rows >= 0) & (rows < data.shape[0])
+        col_ok = (cols >= 0) & (cols < data.shape[1])
+
+        tile = np.asarray(data[np.ix_(np.clip(rows, 0, data.shape[0] - 1),
+                                      np.clip(cols, 0, data.shape[1] - 1))],
+                          dtype=np.float32 if self.quantization is None else data.dtype)
+        tile[~row_ok, :] = self.nodata
+        tile[:, ~col_ok] = self.nodata
+        return tile
+
+    def sample_preview(self, width, height):
+        """Nearest-neighbour resample the whole raster to width x height from the closest overview"""
+        level = 0
+        for i, (data, _) in enumerate(self.levels):
+            if data.shape[0] >= height and data.shape[1] >= width:
+                level = i
+        data = self.levels[level][0]
+
+        rows = ((np.arange(height) + 0.5) * data.shape[0] / height).astype(np.int64)
+        cols = ((np.arange(width) + 0.5) * data.shape[1] / width).astype(np.int64)
+        return np.asarray(data[np.ix_(rows, cols)], dtype=np.float32 if self.quantization is None else data.dtype)
+
+    def render_tile(self, z, x, y, lut, vmin, vmax):
+        """Render an XYZ tile to PNG bytes, or None if it misses the raster"""
+        tile = self.sample_tile(z, x, y)
+        if tile is None:
+            return None
+        return encode_png(self.colorize(tile, lut, vmin, vmax))
+
+
+@functools.lru_cache(maxsize=1)
+def empty_tile():
+    """Shared fully transparent tile PNG"""
+    return encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
@@ -0,0 +1,251 @@
+import numpy as np
+import hashlib
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from raster_store import VALID_RANGES
+from region_stats import REGION_BOUNDS, canonical_region
+from streaming_stats import BLOCK_PIXELS, RunningMoments, iter_blocks
+
+logger = logging.getLogger(__name__)
+
+BANDS = ("lst", "ndvi", "duhi")
+YEARLY_FILE_PATTERN = re.compile(r"^(lst|ndvi|duhi)_(\d{4})\.tif$")
+
+# Used only when no per-year rasters exist: years, and (slope per year, noise sd) per band
+SYNTHETIC_YEARS = list(range(2018, 2026))
+SYNTHETIC_TRENDS = {"lst": (0.8, 0.5), "ndvi": (0.01, 0.02), "duhi": (0.3, 0.2)}
+
+# Bumped when ingest changes what it stores, so cubes built by older code are re-ingested
+CUBE_FORMAT = "2"
+
+
+def discover_years(data_dir):
+    """Return {year: {band: path}} for years that have all three bands as <band>_<year>.tif"""
+    found = {}
+    for path in Path(data_dir).glob("*_*.tif"):
+        match = YEARLY_FILE_PATTERN.match(path.name)
+        if match:
+            found.setdefault(int(match.group(2)), {})[match.group(1)] = path
+    return {year: paths for year, paths in sorted(found.items()) if set(paths) == set(BANDS)}
+
+
+def linear_trend(cube, years):
+    """Per-pixel least-squares slope and two-sided p-value over the year axis of a (years, rows, cols) block"""
+    t = np.asarray(years, dtype=np.float64)
+    t -= t.mean()
+    n = len(t)
+    s_tt = float(np.dot(t, t))
+
+    y = np.asarray(cube, dtype=np.float64)
+    y_mean = y.mean(axis=0)
+    resid = y - y_mean
+    slope = np.tensordot(t, resid, axes=(0, 0)) / s_tt
+
+    if n <= 2:
+        return slope.astype(np.float32), np.full(slope.shape, np.nan, dtype=np.float32)
+
+    sse = np.maximum(np.square(resid).sum(axis=0) - slope * slope * s_tt, 0.0)
+    se = np.sqrt(sse / (n - 2) / s_tt)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_stat = np.where(se > 0, slope / se, np.where(slope != 0, np.inf, 0.0))
+    from scipy import stats  # deferred: only needed when ingesting
+    p_value = 2 * stats.t.sf(np.abs(t_stat), n - 2)
+    return slope.astype(np.float32), p_value.astype(np.float32)
+
+
+class TimeCube:
+    """Stacked (year, row, col) rasters per band plus trend rasters and regional series precomputed at ingest"""
+
+    def __init__(self, cube_dir, meta):
+        self.cube_dir = Path(cube_dir)
+        self.version = meta["version"]
+        self.years = meta["years"]
+        self.timeseries = meta["timeseries"]
+        self.region_trends = meta["region_trends"]
+        self.synthetic = meta["synthetic"]
+        self.cubes = {band: np.load(self.cube_dir / f"{band}.npy", mmap_mode='r') for band in BANDS}
+        self.slopes = {band: np.load(self.cube_dir / f"{band}_slope.npy", mmap_mode='r') for band in BANDS}
+        self.p_values = {band: np.load(self.cube_dir / f"{band}_pvalue.npy", mmap_mode='r') for band in BANDS}
+
+    @staticmethod
+    def source_version(raster_store, data_dir, base_bands):
+        """Version of every input raster (per-year files, or the base bands when synthesizing)"""
+        yearly = discover_years(data_dir)
+        if yearly:
+            versions = [raster_store.load(path, f"{band}_{year}").version
+                        for year, paths in yearly.items() for band, path in sorted(paths.items())]
+        else:
+            versions = [base_bands[band].version for band in BANDS]
+        return hashlib.sha1("-".join([CUBE_FORMAT] + versions).encode()).hexdigest()[:12], yearly
+
+    @classmethod
+    def load_or_build(cls, cube_dir, raster_store, data_dir, base_bands, block_pixels=BLOCK_PIXELS):
+        """Open the cube for the current inputs, ingesting it first if missing or stale"""
+        cube_dir = Path(cube_dir)
+        cube_dir.mkdir(exist_ok=True, parents=True)
+        version, yearly = cls.source_version(raster_store, data_dir, base_bands)
+
+        meta_path = cube_dir / "meta.json"
+        if meta_path.exists():
+            try:
+                with open(meta_path, 'r') as f:
+                    meta = json.load(f)
+                if meta.get("version") == version:
+                    return cls(cube_dir, meta)
+            except (OSError, ValueError):
+                pass
+
+        meta = ingest(cube_dir, version, yearly, raster_store, base_bands, block_pixels)
+        return cls(cube_dir, meta)
+
+    def year_index(self, year):
+        return self.years.index(year) if year in self.years else None
+
+    def regional_timeseries(self, region="Peel"):
+        series = self.timeseries[canonical_region(region)]
+        return {"years": list(self.years), **{band: list(series[band]) for band in BANDS}}
+
+    def region_trend(self, region, band="duhi"):
+        return self.region_trends[canonical_region(region)][band]
+
+    def change_since_latest(self, band, rows, cols, year):
+        """Per-point change of a band from the latest cube year to `year` (trend-extrapolated outside the cube)"""
+        cube = self.cubes[band]
+        inside = (rows >= 0) & (rows < cube.shape[1]) & (cols >= 0) & (cols < cube.shape[2])
+        r, c = rows[inside], cols[inside]
+        delta = np.zeros(len(rows))
+
+        idx = self.year_index(year)
+        if idx is not None:
+            delta[inside] = cube[idx, r, c].astype(np.float64) - cube[-1, r, c]
+        else:
+            delta[inside] = self.slopes[band][r, c].astype(np.float64) * (year - self.years[-1])
+        return np.nan_to_num(delta)
+
+
+def _write_npy(path, shape):
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    return tmp_path, np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=shape)
+
+
+def ingest(cube_dir, version, yearly, raster_store, base_bands, block_pixels=BLOCK_PIXELS):
+    """Stack the yearly bands, then precompute trend rasters and regional timeseries"""
+    synthetic = not yearly
+    years = list(yearly) if yearly else SYNTHETIC_YEARS
+    reference_band = base_bands["duhi"]
+    if yearly:
+        reference_band = raster_store.load(yearly[years[-1]]["duhi"], f"duhi_{years[-1]}")
+    shape = reference_band.shape
+    if yearly:
+        years = _matching_years(yearly, years, shape, raster_store)
+    full_window = (0, 0, shape[0], shape[1])
+    logger.info(f"Ingesting {'synthetic' if synthetic else 'yearly'} time cube for {years[0]}-{years[-1]}")
+
+    for band in BANDS:
+        tmp_path, cube = _write_npy(cube_dir / f"{band}.npy", (len(years),) + shape)
+        for i, year in enumerate(years):
+            source = raster_store.load(yearly[year][band], f"{band}_{year}") if yearly else base_bands[band]
+            # Row strips in order, so the synthetic noise stream matches one full-raster draw
+            noise = None if yearly else _noise_generator(band, year)
+            slope, noise_sd = SYNTHETIC_TRENDS[band]
+            for row_off, col_off, height, width in iter_blocks(full_window, block_pixels):
+                values = source.decode(source.read_window(row_off, col_off, height, width))
+                if noise is not None:
+                    drift = noise.standard_normal((height, width)).astype(np.float32) * noise_sd
+                    values = values + (year - years[-1]) * slope + drift
+                cube[i, row_off:row_off + height] = values
+        cube.flush()
+        del cube
+        os.replace(tmp_path, cube_dir / f"{band}.npy")
+
+        cube = np.load(cube_dir / f"{band}.npy", mmap_mode='r')
+        slope_tmp, slope_out = _write_npy(cube_dir / f"{band}_slope.npy", shape)
+        p_tmp, p_out = _write_npy(cube_dir / f"{band}_pvalue.npy", shape)
+        for row_off, _, height, _ in iter_blocks(full_window, max(block_pixels // len(years), 1)):
+            block = cube[:, row_off:row_off + height]
+            slope_out[row_off:row_off + height], p_out[row_off:row_off + height] = linear_trend(block, years)
+        slope_out.flush()
+        p_out.flush()
+        del slope_out, p_out
+        os.replace(slope_tmp, cube_dir / f"{band}_slope.npy")
+        os.replace(p_tmp, cube_dir / f"{band}_pvalue.npy")
+
+    timeseries, region_trends = _regional_summaries(cube_dir, years, shape, reference_band, block_pixels)
+    meta = {
+        "version": version,
+        "years": years,
+        "synthetic": synthetic,
+        "timeseries": timeseries,
+        "region_trends": region_trends,
+    }
+    tmp_path = cube_dir / f".meta.json.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, cube_dir / "meta.json")
+    return meta
+
+
+def _matching_years(yearly, years, shape, raster_store):
+    """Years whose three rasters all share the reference grid; the others are skipped with a warning"""
+    matching = []
+    for year in years:
+        shapes = {band: raster_store.load(yearly[year][band], f"{band}_{year}").shape for band in BANDS}
+        mismatched = {band: s for band, s in shapes.items() if s != shape}
+        if mismatched:
+            logger.warning(f"Skipping {year} in the time cube: rasters {mismatched} do not match the {shape} grid")
+        else:
+            matching.append(year)
+    if not matching:
+        raise ValueError(f"No yearly rasters match the {shape} grid")
+    return matching
+
+
+def valid_values(band, values):
+    """Mask of decoded values inside the band's valid range, as RegionStatsIndex counts them"""
+    valid = np.isfinite(values)
+    if band in VALID_RANGES:
+        lo, hi = VALID_RANGES[band]
+        valid &= (values >= lo) & (values <= hi)
+    return valid
+
+
+def _noise_generator(band, year):
+    seed = int(hashlib.sha1(f"{band}:{year}".encode()).hexdigest()[:8], 16)
+    return np.random.default_rng(seed)
+
+
+def _regional_summaries(cube_dir, years, shape, reference_band, block_pixels):
+    """Mean of every band per region per year, and the mean per-pixel slope per region"""
+    cubes = {band: np.load(cube_dir / f"{band}.npy", mmap_mode='r') for band in BANDS}
+    slopes = {band: np.load(cube_dir / f"{band}_slope.npy", mmap_mode='r') for band in BANDS}
+
+    timeseries = {}
+    region_trends = {}
+    for name, bounds in REGION_BOUNDS.items():
+        row_off, col_off, height, width = (0, 0) + shape if bounds is None else reference_band.bbox_window(*bounds)
+        # Clip both edges, so a box reaching past the top or left keeps only the rows and columns it covers
+        r0, c0 = max(row_off, 0), max(col_off, 0)
+        r1, c1 = min(row_off + height, shape[0]), min(col_off + width, shape[1])
+        window = (r0, c0, max(r1 - r0, 0), max(c1 - c0, 0))
+
+        means = {band: [RunningMoments() for _ in years] for band in BANDS}
+        trend_means = {band: RunningMoments() for band in BANDS}
+        for r0, c0, h, w in iter_blocks(window, block_pixels):
+            # Same population as RegionStatsIndex: pixels where every band is valid
+            for i in range(len(years)):
+                values = {band: np.asarray(cubes[band][i, r0:r0 + h, c0:c0 + w], dtype=np.float64) for band in BANDS}
+                valid = np.logical_and.reduce([valid_values(band, v) for band, v in values.items()])
+                for band in BANDS:
+                    means[band][i].update(values[band][valid])
+            # Trends over the pixels valid in the latest year, the year the index is built on
+            for band in BANDS:
+                slope = np.asarray(slopes[band][r0:r0 + h, c0:c0 + w], dtype=np.float64)
+                trend_means[band].update(slope[valid & np.isfinite(slope)])
+
+        timeseries[name] = {band: [m.mean if m.count else None for m in means[band]] for band in BANDS}
+        region_trends[name] = {band: trend_means[band].mean if trend_means[band].count else None for band in BANDS}
+
+    return timeseries, region_trends
@@ -0,0 +1,115 @@
+import numpy as np
+import hashlib
+import json
+
+
+def polygon_rings(geometry):
+    """Return the polygons of a GeoJSON Polygon/MultiPolygon as lists of (N, 2) lng/lat ring arrays"""
+    geom_type = geometry.get("type") if isinstance(geometry, dict) else None
+    if geom_type == "Polygon":
+        polygons = [geometry.get("coordinates")]
+    elif geom_type == "MultiPolygon":
+        polygons = geometry.get("coordinates")
+    else:
+        raise ValueError(f"Unsupported geometry type: {geom_type}")
+
+    result = []
+    for polygon in polygons or []:
+        rings = []
+        for ring in polygon or []:
+            coords = np.asarray(ring, dtype=np.float64)
+            if coords.ndim != 2 or coords.shape[0] < 3 or coords.shape[1] < 2:
+                raise ValueError("Polygon rings need at least three [lng, lat] positions")
+            if not np.isfinite(coords[:, :2]).all():
+                raise ValueError("Polygon coordinates must be finite")
+            rings.append(coords[:, :2])
+        if rings:
+            result.append(rings)
+    if not result:
+        raise ValueError("Geometry has no polygon rings")
+    return result
+
+
+def iter_geometries(geojson):
+    """Yield (feature id, properties, geometry) from a FeatureCollection, Feature or bare geometry"""
+    geojson_type = geojson.get("type") if isinstance(geojson, dict) else None
+    if geojson_type == "FeatureCollection":
+        for i, feature in enumerate(geojson.get("features") or []):
+            yield feature.get("id", i), feature.get("properties") or {}, feature.get("geometry")
+    elif geojson_type == "Feature":
+        yield geojson.get("id", 0), geojson.get("properties") or {}, geojson.get("geometry")
+    else:
+        yield 0, {}, geojson
+
+
+def geometry_key(geometry):
+    """Stable hash of a geometry's canonical JSON, used to cache its rasterized mask"""
+    canonical = json.dumps(geometry, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def rasterize_polygons(band, polygons):
+    """Rasterize polygons onto the band grid; returns (window, mask) cropped to the polygons' bbox.
+
+    Pixel centres are tested with an even-odd scanline rule: every edge's crossing
+    with each row centre is binned to a column, and a running parity along the row
+    marks the pixels inside.  Rings within a polygon combine by parity (holes),
+    separate polygons by union.
+    """
+    rows, cols = band.shape
+    west, xres, _, north, _, yres = band.transform
+
+    all_coords = np.concatenate([ring for rings in polygons for ring in rings])
+    row_off, col_off, height, width = band.bbox_window(
+        all_coords[:, 0].min(), all_coords[:, 1].min(), all_coords[:, 0].max(), all_coords[:, 1].max())
+    r0, c0 = max(row_off, 0), max(col_off, 0)
+    r1, c1 = min(row_off + height, rows), min(col_off + width, cols)
+    window = (r0, c0, max(r1 - r0, 0), max(c1 - c0, 0))
+    mask = np.zeros(window[2:], dtype=bool)
+    if mask.size == 0:
+        return window, mask
+
+    # Row centres in lat and column centres in fractional column units
+    center_lat = north + (np.arange(r0, r1) + 0.5) * yres
+    for rings in polygons:
+        crossings = np.zeros((mask.shape[0], mask.shape[1] + 1), dtype=np.int32)
+        for ring in rings:
+            x0, y0 = ring[:, 0], ring[:, 1]
+            x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+            spans = (y0[:, None] > center_lat[None, :]) != (y1[:, None] > center_lat[None, :])
+            edge, row = np.nonzero(spans)
+            if edge.size == 0:
+                continue
+            t = (center_lat[row] - y0[edge]) / (y1[edge] - y0[edge])
+            x_cross = x0[edge] + t * (x1[edge] - x0[edge])
+            # The crossing lies right of pixels j < k, whose centres sit at col + 0.5
+            k = np.ceil((x_cross - west) / xres - 0.5).astype(np.int64) - c0
+            np.clip(k, 0, mask.shape[1], out=k)
+            np.add.at(crossings, (row, k), 1)
+        # Pixel j counts the crossings binned after it; odd means inside
+        right = np.cumsum(crossings[:, ::-1], axis=1)[:, ::-1]
+        mask |= (right[:, 1:] & 1).astype(bool)
+    return window, mask
+
+
+def zone_summary(values, percentiles=(), thresholds=None):
+    """Per-band summaries of {band: 1-D valid pixel values}, all bands sharing one pixel set"""
+    if not values or next(iter(values.values())).size == 0:
+        return {band: None for band in values}
+    stack = np.vstack(list(values.values()))
+    means, mins, maxs = stack.mean(axis=1), stack.min(axis=1), stack.max(axis=1)
+    quantiles = np.percentile(stack, percentiles, axis=1) if len(percentiles) else None
+
+    summaries = {}
+    for i, band in enumerate(values):
+        summary = {
+            "mean": round(float(means[i]), 4),
+            "min": round(float(mins[i]), 4),
+            "max": round(float(maxs[i]), 4),
+            "percentiles": {f"{q:g}": round(float(quantiles[j, i]), 4) for j, q in enumerate(percentiles)},
+        }
+        threshold = (thresholds or {}).get(band)
+        if threshold is not None:
+            summary["percent_at_or_above"] = round(float((stack[i] >= threshold).mean() * 100), 2)
+        summaries[band] = summary
+    return summaries
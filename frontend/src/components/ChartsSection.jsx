@@ -10,9 +10,9 @@ const ChartsSection = ({ timeseriesData, metrics }) => {
   // Prepare data for charts
   const trendData = timeseriesData ? timeseriesData.years.map((year, idx) => ({
     year,
-    LST: timeseriesData.lst[idx].toFixed(1),
-    NDVI: timeseriesData.ndvi[idx].toFixed(2),
-    DUHI: timeseriesData.duhi[idx].toFixed(1)
+    LST: timeseriesData.lst[idx]?.toFixed(1),
+    NDVI: timeseriesData.ndvi[idx]?.toFixed(2),
+    DUHI: timeseriesData.duhi[idx]?.toFixed(1)
   })) : [];
 
   // Distribution data (mock histogram)
@@ -382,10 +382,10 @@ const LearningDashboard = ({ metrics, timeseriesData, regionalData, insights })
                             region.mean_ndvi >= 0.4 ? 'text-green-400' : 
                             region.mean_ndvi >= 0.3 ? 'text-yellow-400' : 'text-red-400'
                           }`}>
-                            {region.mean_ndvi.toFixed(2)}
+                            {region.mean_ndvi?.toFixed(2) ?? 'n/a'}
                           </span>
                         </td>
-                        <td className="py-3 text-orange-400 text-sm">{region.mean_lst.toFixed(1)}°C</td>
+                        <td className="py-3 text-orange-400 text-sm">{region.mean_lst?.toFixed(1) ?? 'n/a'}°C</td>
                         <td className="py-3 text-red-400 text-sm font-semibold">+{region.duhi_trend}°C/yr</td>
                         <td className="py-3">
                           <span className={`px-2 py-1 rounded text-xs font-semibold ${
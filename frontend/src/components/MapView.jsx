@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
-import { MapContainer, TileLayer, ImageOverlay, GeoJSON, useMapEvents } from 'react-leaflet';
+import { MapContainer, TileLayer, GeoJSON, useMapEvents } from 'react-leaflet';
 import 'leaflet/dist/leaflet.css';
 import L from 'leaflet';
 import { toast } from 'sonner';
@@ -34,26 +34,15 @@ const MapClickHandler = ({ onMapClick }) => {
 const MapView = () => {
   const [selectedLayer, setSelectedLayer] = useState('duhi');
   const [opacity, setOpacity] = useState(0.7);
-  const [layerPreview, setLayerPreview] = useState(null);
   const [hotspots, setHotspots] = useState(null);
   const [clickedLocation, setClickedLocation] = useState(null);
   const [clickedData, setClickedData] = useState(null);
   const [selectedYear, setSelectedYear] = useState(2025);
 
   useEffect(() => {
-    fetchLayerPreview();
     fetchHotspots();
   }, [selectedLayer]);
 
-  const fetchLayerPreview = async () => {
-    try {
-      const res = await axios.get(`${API}/layer-preview/${selectedLayer}`);
-      setLayerPreview(res.data.image);
-    } catch (error) {
-      console.error('Error fetching layer preview:', error);
-    }
-  };
-
   const fetchHotspots = async () => {
     try {
       if (USE_EMBEDDED_DATA) {
@@ -121,6 +110,12 @@ const MapView = () => {
       label: 'Surface Temperature (LST)', 
       description: 'Ground heat from satellites',
       legend: { min: '20°C', max: '45°C', gradient: 'linear-gradient(to right, #313695, #4575b4, #74add1, #fdae61, #f46d43, #d73027)' }
+    },
+    { 
+      value: 'correlation', 
+      label: 'Greenery Cooling (NDVI–LST r)', 
+      description: 'Where more vegetation means cooler ground',
+      legend: { min: 'Cools', max: 'No effect', gradient: 'linear-gradient(to right, #1a9850, #91cf60, #f7f7f7, #dfc27d, #8c510a)' }
     }
   ];
 
@@ -260,9 +255,10 @@ const MapView = () => {
 
                 <MapClickHandler onMapClick={handleMapClick} />
 
-                {layerPreview && (
-                  <ImageOverlay
-                    url={layerPreview}
+                {!USE_EMBEDDED_DATA && (
+                  <TileLayer
+                    key={selectedLayer}
+                    url={`${API}/tiles/${selectedLayer}/{z}/{x}/{y}.png`}
                     bounds={PEEL_BOUNDS}
                     opacity={opacity}
                   />
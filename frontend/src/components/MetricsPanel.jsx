@@ -22,7 +22,7 @@ const MetricsPanel = ({ metrics, regionalData, insights }) => {
     },
     {
       title: 'Mean NDVI',
-      value: metrics.mean_ndvi.toFixed(3),
+      value: metrics.mean_ndvi?.toFixed(3) ?? 'n/a',
       trend: metrics.mean_ndvi > 0.35 ? 'up' : 'down',
       caption: 'Vegetation index',
       icon: Leaf,
@@ -30,7 +30,7 @@ const MetricsPanel = ({ metrics, regionalData, insights }) => {
     },
     {
       title: 'NDVI-LST Correlation',
-      value: metrics.correlation_ndvi_lst.toFixed(2),
+      value: metrics.correlation_ndvi_lst?.toFixed(2) ?? 'n/a',
       trend: 'down',
       caption: 'Inverse relationship',
       icon: Activity,
@@ -106,8 +106,8 @@ const MetricsPanel = ({ metrics, regionalData, insights }) => {
                   {regionalData.map((region, idx) => (
                     <tr key={idx} className="border-b border-slate-800 hover:bg-cyan-500/5 transition-colors">
                       <td className="py-2 text-white">{region.name}</td>
-                      <td className="text-right py-2 text-slate-300">{region.mean_ndvi.toFixed(2)}</td>
-                      <td className="text-right py-2 text-slate-300">{region.mean_lst.toFixed(1)}°C</td>
+                      <td className="text-right py-2 text-slate-300">{region.mean_ndvi?.toFixed(2) ?? 'n/a'}</td>
+                      <td className="text-right py-2 text-slate-300">{region.mean_lst?.toFixed(1) ?? 'n/a'}°C</td>
                       <td className="text-right py-2">
                         <span className="text-red-400">+{region.duhi_trend}°C/yr</span>
                       </td>
@@ -59,17 +59,15 @@ const Dashboard = () => {
 
       // Try API with fallback to embedded data
       try {
-        const [metricsRes, timeseriesRes, regionalRes, insightsRes] = await Promise.all([
-          axios.get(`${API}/metrics?region=Peel (All)`),
-          axios.get(`${API}/timeseries`),
-          axios.get(`${API}/regional-breakdown`),
-          axios.get(`${API}/insights`)
-        ]);
-
-        setMetrics(metricsRes.data);
-        setTimeseriesData(timeseriesRes.data);
-        setRegionalData(regionalRes.data);
-        setInsights(insightsRes.data);
+        // One round trip: the server gathers the KPI and chart sections concurrently
+        const res = await axios.get(`${API}/dashboard`, {
+          params: { region: 'Peel (All)', sections: 'metrics,timeseries,regional_breakdown,insights' }
+        });
+
+        setMetrics(res.data.metrics);
+        setTimeseriesData(res.data.timeseries);
+        setRegionalData(res.data.regional_breakdown);
+        setInsights(res.data.insights);
         
         toast.success('Dashboard data loaded successfully');
       } catch (apiError) {
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for GeoTIFFProcessor
+Times each processor method against synthetic rasters of several sizes,
+tracking peak traced memory, and writes the results as JSON so runs can be
+compared (--compare baseline.json).
+
+Note: the 10k x 10k size needs roughly 12 GB of scratch disk for the raster
+cache and the multi-year time cube.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'backend'))
+
+import numpy as np
+from PIL import Image
+from geotiff_processor import GeoTIFFProcessor
+from raster_store import PEEL_BOUNDS, synthetic_band
+from tiles import tiles_covering
+
+ROOT_DIR = Path(__file__).parent.parent
+
+
+def write_rasters(data_dir, size):
+    """Write synthetic LST/NDVI/DUHI GeoTIFFs of size x size pixels"""
+    for name in ("lst", "ndvi", "duhi"):
+        Image.fromarray(synthetic_band(name, (size, size))).save(data_dir / f"{name}.tif")
+
+
+def random_points(count, seed=0):
+    rng = np.random.default_rng(seed)
+    west, south, east, north = PEEL_BOUNDS
+    return rng.uniform(south, north, count).tolist(), rng.uniform(west, east, count).tolist()
+
+
+def random_polygons(count, seed=0):
+    rng = np.random.default_rng(seed)
+    west, south, east, north = PEEL_BOUNDS
+    angles = np.linspace(0, 2 * np.pi, 24)
+    features = []
+    for _ in range(count):
+        cx, cy, r = rng.uniform(west + 0.05, east - 0.05), rng.uniform(south + 0.05, north - 0.05), rng.uniform(0.005, 0.03)
+        ring = np.c_[cx + r * np.cos(angles), cy + r * np.sin(angles)].tolist()
+        features.append({"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [ring]}})
+    return {"type": "FeatureCollection", "features": features}
+
+
+def benchmarks(processor):
+    """(name, reset, call) per benchmark; reset clears in-memory result caches so warm runs time the computation"""
+    lats, lngs = random_points(10000)
+    polygons = random_polygons(100)
+    tiles = list(tiles_covering(PEEL_BOUNDS, 12))
+    tile_x, tile_y = tiles[len(tiles) // 2]
+
+    def clear_results():
+        for cache in processor.memory_caches.values():
+            cache.clear()
+
+    return [
+        ("calculate_regional_metrics", None, lambda: processor.calculate_regional_metrics("Peel")),
+        ("generate_timeseries_data", None, lambda: processor.generate_timeseries_data("Brampton")),
+        ("get_regional_breakdown", None, processor.get_regional_breakdown),
+        ("get_heat_distribution", None, processor.get_heat_distribution),
+        ("generate_layer_preview", clear_results, lambda: processor.generate_layer_preview("duhi")),
+        ("render_tile_z12", None, lambda: processor.render_tile("lst", 12, tile_x, tile_y)),
+        ("classify_location", clear_results, lambda: processor.classify_location(43.7315, -79.7624)),
+        ("get_location_data", clear_results, lambda: processor.get_location_data(43.7315, -79.7624)),
+        ("get_locations_data_10k", None, lambda: processor.get_locations_data(lats, lngs, 2025)),
+        ("zonal_stats_100", clear_results, lambda: processor.zonal_stats(polygons)),
+    ]
+
+
+def run_benchmark(reset, call, repeat):
+    """Time one cold call and `repeat` warm calls; returns timings and peak traced memory"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    call()
+    cold = time.perf_counter() - start
+    _, cold_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    warm = []
+    tracemalloc.start()
+    for _ in range(repeat):
+        if reset:
+            reset()
+        start = time.perf_counter()
+        call()
+        warm.append(time.perf_counter() - start)
+    _, warm_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "cold_s": round(cold, 6),
+        "warm_s": {
+            "min": round(min(warm), 6),
+            "median": round(statistics.median(warm), 6),
+            "mean": round(statistics.fmean(warm), 6),
+            "max": round(max(warm), 6),
+        },
+        "repeat": repeat,
+        "cold_peak_mb": round(cold_peak / 2 ** 20, 2),
+        "warm_peak_mb": round(warm_peak / 2 ** 20, 2),
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def compare(results, baseline_path):
+    """Print the warm-median ratio of each benchmark against a previous run"""
+    with open(baseline_path, 'r') as f:
+        baseline = {(r["size"], r["name"]): r for r in json.load(f)["results"]}
+
+    print(f"\n📊 Compared with {baseline_path} (warm median, <1.00 is faster):")
+    for r in results:
+        before = baseline.get((r["size"], r["name"]))
+        if before is None:
+            continue
+        ratio = r["warm_s"]["median"] / before["warm_s"]["median"] if before["warm_s"]["median"] else float('inf')
+        flag = "  ⚠️" if ratio > 1.2 else ""
+        print(f"  - {r['size']:>5}² {r['name']:<28} {ratio:5.2f}x{flag}")
+
+
+def main(args):
+    sizes = [int(s) for s in args.sizes.split(',')]
+    selected = set(args.only.split(',')) if args.only else None
+    results = []
+
+    for size in sizes:
+        print(f"\n🧪 {size} x {size} rasters")
+        work_dir = Path(tempfile.mkdtemp(prefix=f"bench-{size}-", dir=args.scratch_dir))
+        try:
+            data_dir = work_dir / 'geotiff'
+            data_dir.mkdir()
+            write_rasters(data_dir, size)
+            processor = GeoTIFFProcessor(str(data_dir), str(work_dir / 'cache'), deterministic=True)
+            # Time the computations themselves, not reads from the on-disk result cache
+            processor.result_cache = None
+
+            for name, reset, call in benchmarks(processor):
+                if selected and name not in selected:
+                    continue
+                result = {"size": size, "name": name, **run_benchmark(reset, call, args.repeat)}
+                results.append(result)
+                print(f"  - {name:<28} cold {result['cold_s'] * 1000:9.1f} ms   "
+                      f"warm {result['warm_s']['median'] * 1000:8.2f} ms   peak {result['cold_peak_mb']:8.1f} MB")
+            del processor
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "environment": environment(),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\n✅ Results written to: {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark GeoTIFFProcessor methods across raster sizes")
+    parser.add_argument('--sizes', default='1000,4000,10000', help="comma-separated raster edge lengths")
+    parser.add_argument('--repeat', type=int, default=5, help="warm runs per benchmark")
+    parser.add_argument('--only', help="comma-separated benchmark names to run")
+    parser.add_argument('--scratch-dir', help="where to write temporary rasters and caches")
+    parser.add_argument('--output', help="write JSON results to this file")
+    parser.add_argument('--compare', help="previous JSON results to compare against")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
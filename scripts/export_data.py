@@ -1,80 +1,303 @@
 #!/usr/bin/env python3
 """
-Data Export Script for Urban Heat Dashboard
-Run this to export current data to static JSON files for team sharing
+Data Ingest Pipeline for Urban Heat Dashboard
+Precomputes every dashboard artifact (statistics, histograms, tile pyramids,
+previews, compact JSON) into a versioned build directory, and refreshes the
+static JSON files in data/static for team sharing.
 """
 
+import argparse
+import hashlib
 import json
-import sys
 import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
 
 # Add backend to path
 sys.path.insert(0, str(Path(__file__).parent.parent / 'backend'))
 
 from geotiff_processor import GeoTIFFProcessor
+from region_stats import REGION_BOUNDS
+from tiles import tiles_covering
+
+# Bump when the layout or content of build artifacts changes
+PIPELINE_VERSION = "3"
+
+ROOT_DIR = Path(__file__).parent.parent
+
+# Per-process GeoTIFFProcessor used by pool workers
+_processor = None
+
+
+def _init_worker(data_dir, cache_dir):
+    global _processor
+    _processor = GeoTIFFProcessor(data_dir, cache_dir)
+
+
+def write_bytes(path, data):
+    """Write a file atomically (temp file + rename)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_json(path, data, indent=None):
+    separators = None if indent else (",", ":")
+    write_bytes(path, json.dumps(data, indent=indent, separators=separators).encode("utf-8"))
+
+
+class StageTimer:
+    """Records wall-clock time per pipeline stage"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        print(f"  ⏱️  {name}...")
+        start = time.perf_counter()
+        yield
+        self.timings[name] = round(time.perf_counter() - start, 3)
+
+    def report(self):
+        print("\n⏱️  Stage timings:")
+        for name, seconds in self.timings.items():
+            print(f"  - {name}: {seconds:.2f}s")
+
+
+def hash_inputs(data_dir):
+    """Content hash of every GeoTIFF in data_dir; returns (combined digest, {file: digest})"""
+    files = {}
+    for path in sorted(Path(data_dir).glob('*.tif')):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        files[path.name] = digest.hexdigest()
+    combined = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()
+    return combined, files
+
+
+def band_job(layer, build_dir, zooms):
+    """Preview, histogram and tile pyramid for one source layer"""
+    build_dir = Path(build_dir)
+    timings = {}
+
+    start = time.perf_counter()
+    write_json(build_dir / 'histograms' / f'{layer}.json', _processor.get_band_distribution(layer))
+    timings['histogram'] = time.perf_counter() - start
+
+    tile_count = render_layer(layer, build_dir, zooms, timings)
+    return layer, timings, tile_count
+
+
+def derived_layer_job(layer, build_dir, zooms):
+    """Preview and tile pyramid for a layer derived from the source bands (no histogram)"""
+    timings = {}
+    tile_count = render_layer(layer, Path(build_dir), zooms, timings)
+    return layer, timings, tile_count
+
+
+def render_layer(layer, build_dir, zooms, timings):
+    """Write the preview and every tile of a layer; returns the tile count"""
+    start = time.perf_counter()
+    png, _ = _processor.render_layer_preview(layer)
+    write_bytes(build_dir / 'previews' / f'{layer}.png', png)
+    timings['preview'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bounds = _processor.get_tile_pyramid(layer).bounds()
+    tile_count = 0
+    for z in zooms:
+        for x, y in tiles_covering(bounds, z):
+            write_bytes(build_dir / 'tiles' / layer / str(z) / str(x) / f'{y}.png', _processor.render_tile(layer, z, x, y))
+            tile_count += 1
+    timings['tiles'] = time.perf_counter() - start
+    return tile_count
+
+
+def region_job(region, build_dir):
+    """Metrics, timeseries and band distributions for one region"""
+    start = time.perf_counter()
+    write_json(Path(build_dir) / 'regions' / f'{region}.json', {
+        "metrics": _processor.calculate_regional_metrics(region),
+        "timeseries": _processor.generate_timeseries_data(region),
+        "heat_distribution": _processor.get_heat_distribution(region),
+        "distributions": {layer: _processor.get_band_distribution(layer, region) for layer in _processor.source_bands()},
+    })
+    return region, time.perf_counter() - start
+
+
+def parse_zooms(spec):
+    lo, _, hi = spec.partition('-')
+    return list(range(int(lo), int(hi or lo) + 1))
 
-def export_data():
+
+def export_static(processor, output_dir):
     """Export all dashboard data to static JSON files"""
-    
-    output_dir = Path(__file__).parent.parent / 'data' / 'static'
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
-    processor = GeoTIFFProcessor()
-    
-    print("🔄 Exporting dashboard data...")
-    
-    # Export metrics
     print("  📊 Exporting metrics...")
-    metrics = processor.calculate_regional_metrics("Peel")
-    with open(output_dir / 'metrics.json', 'w') as f:
-        json.dump(metrics, f, indent=2)
-    
-    # Export timeseries
+    write_json(output_dir / 'metrics.json', processor.calculate_regional_metrics("Peel"), indent=2)
+
     print("  📈 Exporting timeseries...")
-    timeseries = processor.generate_timeseries_data()
-    with open(output_dir / 'timeseries.json', 'w') as f:
-        json.dump(timeseries, f, indent=2)
-    
-    # Export regional breakdown
+    write_json(output_dir / 'timeseries.json', processor.generate_timeseries_data(), indent=2)
+
     print("  🌍 Exporting regional breakdown...")
-    regions = processor.get_regional_breakdown()
-    with open(output_dir / 'regional_breakdown.json', 'w') as f:
-        json.dump(regions, f, indent=2)
-    
-    # Export hotspots
+    write_json(output_dir / 'regional_breakdown.json', processor.get_regional_breakdown(), indent=2)
+
     print("  📍 Exporting hotspots...")
-    hotspots = processor.get_hotspots()
-    with open(output_dir / 'hotspots.geojson', 'w') as f:
-        json.dump(hotspots, f, indent=2)
-    
-    # Export land use
+    write_json(output_dir / 'hotspots.geojson', processor.get_hotspots(), indent=2)
+
     print("  🏗️  Exporting land use distribution...")
-    land_use = processor.get_land_use_distribution()
-    with open(output_dir / 'land_use.json', 'w') as f:
-        json.dump(land_use, f, indent=2)
-    
-    # Export heat distribution
+    write_json(output_dir / 'land_use.json', processor.get_land_use_distribution(), indent=2)
+
     print("  🌡️  Exporting heat distribution...")
-    heat_dist = processor.get_heat_distribution()
-    with open(output_dir / 'heat_distribution.json', 'w') as f:
-        json.dump(heat_dist, f, indent=2)
-    
-    print(f"\n✅ Data exported successfully to: {output_dir}")
-    print("\n📦 Files created:")
-    for file in output_dir.glob('*.json'):
-        size = file.stat().st_size
-        print(f"  - {file.name} ({size} bytes)")
-    for file in output_dir.glob('*.geojson'):
+    write_json(output_dir / 'heat_distribution.json', processor.get_heat_distribution(), indent=2)
+
+
+def export_data(args):
+    """Run the ingest pipeline"""
+    timer = StageTimer()
+    data_dir = Path(args.data_dir)
+    cache_dir = Path(args.cache_dir)
+    build_root = Path(args.build_dir)
+    static_dir = Path(args.static_dir)
+    zooms = parse_zooms(args.zooms)
+
+    print("🔄 Running ingest pipeline...")
+
+    with timer.stage("hash inputs"):
+        input_digest, input_files = hash_inputs(data_dir)
+    version = hashlib.sha256(f"{PIPELINE_VERSION}:{input_digest}:{zooms}".encode()).hexdigest()[:12]
+    final_dir = build_root / version
+
+    if final_dir.exists() and not args.force:
+        print(f"\n✅ Inputs unchanged; build {version} is up to date")
+        write_bytes(build_root / 'CURRENT', version.encode())
+        return
+
+    processor = GeoTIFFProcessor(str(data_dir), str(cache_dir))
+
+    # Shared on-disk caches are built once here; workers only memory-map them
+    with timer.stage("decode rasters"):
+        source_layers = list(processor.source_bands())
+    with timer.stage("time cube"):
+        processor.get_time_cube()
+    with timer.stage("statistics index"):
+        processor.get_stats_index()
+    with timer.stage("correlation raster"):
+        processor.get_correlation_band()
+    derived_layers = [layer for layer in processor.layer_styles if layer not in source_layers]
+
+    build_dir = build_root / f".tmp-{version}-{os.getpid()}"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    build_dir.mkdir(parents=True)
+
+    tile_counts = {}
+    with timer.stage("per-band and per-region artifacts"):
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(str(data_dir), str(cache_dir))) as pool:
+            futures = [pool.submit(band_job, layer, str(build_dir), zooms) for layer in source_layers]
+            futures += [pool.submit(region_job, region, str(build_dir)) for region in REGION_BOUNDS]
+            for future in as_completed(futures):
+                result = future.result()
+                if len(result) == 3:
+                    layer, timings, tile_count = result
+                    tile_counts[layer] = tile_count
+                    for step, seconds in timings.items():
+                        timer.timings[f"{layer}/{step}"] = round(seconds, 3)
+                    print(f"  🗺️  {layer}: preview, histogram, {tile_count} tiles")
+                else:
+                    region, seconds = result
+                    timer.timings[f"region/{region}"] = round(seconds, 3)
+                    print(f"  🌍 {region}: metrics, timeseries, distributions")
+
+    with timer.stage("derived layers"):
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(str(data_dir), str(cache_dir))) as pool:
+            futures = [pool.submit(derived_layer_job, layer, str(build_dir), zooms) for layer in derived_layers]
+            for future in as_completed(futures):
+                layer, timings, tile_count = future.result()
+                tile_counts[layer] = tile_count
+                for step, seconds in timings.items():
+                    timer.timings[f"{layer}/{step}"] = round(seconds, 3)
+                print(f"  🗺️  {layer}: preview, {tile_count} tiles")
+
+    with timer.stage("dashboard JSON"):
+        build_static = build_dir / 'static'
+        build_static.mkdir()
+        write_json(build_static / 'metrics.json', processor.calculate_regional_metrics("Peel"))
+        write_json(build_static / 'timeseries.json', processor.generate_timeseries_data())
+        write_json(build_static / 'regional_breakdown.json', processor.get_regional_breakdown())
+        write_json(build_static / 'hotspots.geojson', processor.get_hotspots())
+        write_json(build_static / 'land_use.json', processor.get_land_use_distribution())
+        write_json(build_static / 'heat_distribution.json', processor.get_heat_distribution())
+
+    write_json(build_dir / 'manifest.json', {
+        "version": version,
+        "pipeline_version": PIPELINE_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "inputs": input_files,
+        "raster_version": processor.raster_version,
+        "tile_zooms": zooms,
+        "tile_counts": tile_counts,
+        "timings": timer.timings,
+    })
+
+    if final_dir.exists():
+        shutil.rmtree(final_dir)
+    os.replace(build_dir, final_dir)
+    write_bytes(build_root / 'CURRENT', version.encode())
+
+    with timer.stage("static export"):
+        static_dir.mkdir(parents=True, exist_ok=True)
+        export_static(processor, static_dir)
+
+    prune_builds(build_root, keep=args.keep, current=version)
+
+    print(f"\n✅ Build {version} written to: {final_dir}")
+    print(f"✅ Static data exported to: {static_dir}")
+    print("\n📦 Static files:")
+    for file in sorted(static_dir.glob('*.json')) + sorted(static_dir.glob('*.geojson')):
         size = file.stat().st_size
         print(f"  - {file.name} ({size} bytes)")
-    
-    print("\n📤 These files can be committed to Git and shared with teammates!")
+    timer.report()
+
+    print("\n📤 The static files can be committed to Git and shared with teammates!")
     print("🎯 Teammates can run the dashboard without MongoDB using static data mode.")
 
+
+def prune_builds(build_root, keep, current):
+    """Delete all but the newest `keep` builds (never the current one)"""
+    builds = [d for d in build_root.iterdir() if d.is_dir() and not d.name.startswith('.')]
+    builds.sort(key=lambda d: d.stat().st_mtime, reverse=True)
+    for old in builds[keep:]:
+        if old.name != current:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Precompute dashboard artifacts")
+    parser.add_argument('--data-dir', default=str(ROOT_DIR / 'data' / 'geotiff'))
+    parser.add_argument('--cache-dir', default=str(ROOT_DIR / 'data' / 'cache'))
+    parser.add_argument('--build-dir', default=str(ROOT_DIR / 'data' / 'build'))
+    parser.add_argument('--static-dir', default=str(ROOT_DIR / 'data' / 'static'))
+    parser.add_argument('--zooms', default='8-12', help="tile zoom range, e.g. 8-12")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--keep', type=int, default=3, help="number of builds to keep")
+    parser.add_argument('--force', action='store_true', help="rebuild even if inputs are unchanged")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
     try:
-        export_data()
+        export_data(parse_args())
     except Exception as e:
         print(f"\n❌ Error: {e}")
         sys.exit(1)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+In-process load generator for the dashboard API
+Replays the request mix of Dashboard.jsx, LearningDashboard.jsx and MapView.jsx
+against server.app over an ASGI transport (no network, no uvicorn) at a fixed
+concurrency, and reports per-route p50/p95/p99 latency and throughput as JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'backend'))
+
+import httpx
+import numpy as np
+from raster_store import PEEL_BOUNDS
+from tiles import tiles_covering
+
+
+def request_mix(rng, zooms):
+    """(route label, weight, request factory) per route; weights follow what the frontend issues per page view and map pan"""
+    west, south, east, north = PEEL_BOUNDS
+    tiles = {z: list(tiles_covering(PEEL_BOUNDS, z)) for z in zooms}
+    layers = ["duhi", "ndvi", "lst"]
+
+    def tile():
+        z = rng.choice(zooms)
+        x, y = rng.choice(tiles[z])
+        return "GET", f"/api/tiles/{rng.choice(layers)}/{z}/{x}/{y}.png", None
+
+    def location():
+        body = {"lat": rng.uniform(south, north), "lng": rng.uniform(west, east), "year": rng.choice([2018, 2020, 2025])}
+        return "POST", "/api/location-data", body
+
+    return [
+        ("GET /metrics", 4, lambda: ("GET", "/api/metrics?region=Peel (All)", None)),
+        ("GET /timeseries", 4, lambda: ("GET", "/api/timeseries", None)),
+        ("GET /regional-breakdown", 4, lambda: ("GET", "/api/regional-breakdown", None)),
+        ("GET /insights", 4, lambda: ("GET", "/api/insights", None)),
+        ("GET /land-use-distribution", 2, lambda: ("GET", "/api/land-use-distribution", None)),
+        ("GET /heat-distribution", 2, lambda: ("GET", "/api/heat-distribution", None)),
+        ("GET /geojson/hotspots", 3, lambda: ("GET", "/api/geojson/hotspots", None)),
+        ("POST /location-data", 6, location),
+        ("GET /tiles", 60, tile),
+    ]
+
+
+def percentile_summary(latencies):
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": len(latencies),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+async def run_load(app, args):
+    rng = random.Random(args.seed)
+    mix = request_mix(rng, args.zooms)
+    labels = [m[0] for m in mix]
+    weights = [m[1] for m in mix]
+    factories = {m[0]: m[2] for m in mix}
+
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    bytes_received = Counter()
+    remaining = args.requests
+    deadline = time.perf_counter() + args.duration if args.duration else None
+
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Accept-Encoding": "gzip, br"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", headers=headers) as http:
+        async def issue(label):
+            method, url, body = factories[label]()
+            start = time.perf_counter()
+            response = await http.request(method, url, json=body)
+            return label, time.perf_counter() - start, response
+
+        # Warm caches and lazily built indexes before measuring
+        for label in labels:
+            await issue(label)
+        for _ in range(args.warmup):
+            await issue(rng.choices(labels, weights)[0])
+
+        async def worker():
+            nonlocal remaining
+            while True:
+                if deadline is not None:
+                    if time.perf_counter() >= deadline:
+                        return
+                elif remaining <= 0:
+                    return
+                remaining -= 1
+                label, elapsed, response = await issue(rng.choices(labels, weights)[0])
+                latencies[label].append(elapsed)
+                statuses[label][response.status_code] += 1
+                bytes_received[label] += len(response.content)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - start
+
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "concurrency": args.concurrency,
+        "requests": total,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(total / wall, 1) if wall else math.inf,
+        "overall": percentile_summary([x for v in latencies.values() for x in v]) if total else None,
+        "routes": {
+            label: {
+                **percentile_summary(latencies[label]),
+                "status": {str(code): n for code, n in sorted(statuses[label].items())},
+                "bytes": bytes_received[label],
+            }
+            for label in labels if latencies[label]
+        },
+    }
+
+
+async def main(args):
+    from server import app
+
+    await app.router.startup()
+    try:
+        report = await run_load(app, args)
+    finally:
+        await app.router.shutdown()
+
+    print(f"\n🚦 {report['requests']} requests in {report['wall_s']}s at concurrency {report['concurrency']} "
+          f"→ {report['throughput_rps']} req/s")
+    print(f"  {'route':<28} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  status")
+    for label, route in report["routes"].items():
+        print(f"  {label:<28} {route['count']:>6} {route['p50_ms']:>9.2f} {route['p95_ms']:>9.2f} "
+              f"{route['p99_ms']:>9.2f}  {route['status']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\n✅ Results written to: {args.output}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay the frontend request mix against server.app in-process")
+    parser.add_argument('--concurrency', type=int, default=32, help="simultaneous in-flight requests")
+    parser.add_argument('--requests', type=int, default=2000, help="total measured requests")
+    parser.add_argument('--duration', type=float, help="run for this many seconds instead of a request count")
+    parser.add_argument('--warmup', type=int, default=50, help="unmeasured requests before the run")
+    parser.add_argument('--zooms', default='10,11,12', help="comma-separated tile zoom levels")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write JSON results to this file")
+    args = parser.parse_args()
+    args.zooms = [int(z) for z in args.zooms.split(',')]
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
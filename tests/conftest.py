@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+
+# Backend modules and scripts import each other as flat modules
+sys.path.insert(0, str(ROOT_DIR / 'backend'))
+sys.path.insert(0, str(ROOT_DIR / 'scripts'))
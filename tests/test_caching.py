@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from caching import DiskCache, LRUCache, fcntl
+
+
+def _worker(directory, log_path, start, results):
+    def compute():
+        with open(log_path, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        time.sleep(0.2)
+        return {"value": 42}
+
+    start.wait()
+    results.put(DiskCache(directory).get_or_compute("metrics", ("Peel",), "v1", compute))
+
+
+@pytest.mark.skipif(fcntl is None, reason="needs flock")
+def test_concurrent_workers_compute_once(tmp_path):
+    context = multiprocessing.get_context("fork")
+    start = context.Event()
+    results = context.Queue()
+    log_path = tmp_path / "computed.log"
+    workers = [context.Process(target=_worker, args=(tmp_path / "cache", log_path, start, results))
+               for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    start.set()
+    values = [results.get(timeout=10) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=10)
+
+    assert values == [{"value": 42}] * 4
+    assert len(log_path.read_text().split()) == 1
+
+
+def test_hit_miss_and_version(tmp_path):
+    cache = DiskCache(tmp_path)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [1, 2, 3]
+
+    assert cache.get_or_compute("m", (1,), "v1", compute) == [1, 2, 3]
+    assert cache.get_or_compute("m", (1,), "v1", compute) == [1, 2, 3]
+    # Survives a restart, and a new data version or salt is a different entry
+    assert DiskCache(tmp_path).get_or_compute("m", (1,), "v1", compute) == [1, 2, 3]
+    cache.get_or_compute("m", (1,), "v2", compute)
+    DiskCache(tmp_path, salt="other-build").get_or_compute("m", (1,), "v1", compute)
+
+    assert len(calls) == 3
+    assert (cache.hits, cache.misses, cache.writes) == (1, 2, 2)
+
+
+def test_unreadable_entry_is_recomputed(tmp_path):
+    cache = DiskCache(tmp_path)
+    cache.get_or_compute("m", (), "v1", lambda: "first")
+    path = cache._path(cache.key("m", (), "v1"))
+    path.write_bytes(b"not a pickle")
+
+    assert cache.get_or_compute("m", (), "v1", lambda: "second") == "second"
+    assert cache.errors == 1
+    assert cache.get_or_compute("m", (), "v1", lambda: "third") == "second"
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=10 ** 9)
+    blob = b"x" * 1000
+    for i in range(5):
+        cache.get_or_compute("m", (i,), "v", lambda: blob)
+        os.utime(cache._path(cache.key("m", (i,), "v")), (1000 + i, 1000 + i))
+    # Reading entry 0 makes it the most recently used
+    cache.get_or_compute("m", (0,), "v", lambda: pytest.fail("should be a hit"))
+
+    entry_size = cache.size_bytes() // 5
+    cache.max_bytes = 3 * entry_size
+    cache.evict(target=1.0)
+
+    kept = [i for i in range(5) if cache._path(cache.key("m", (i,), "v")).exists()]
+    assert kept == [0, 3, 4]
+    assert cache.evictions == 2
+    assert cache.size_bytes() == 3 * entry_size
+
+
+def test_writes_past_max_bytes_evict(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=2500)
+    for i in range(10):
+        cache.get_or_compute("m", (i,), "v", lambda: b"x" * 1000)
+    assert cache.size_bytes() <= 2500
+    assert cache.size_bytes() == sum(size for _, size, _ in cache._entries())
+
+
+def test_lru_cache_evicts_oldest():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get_or_compute("a", lambda: pytest.fail("should be a hit")) == 1
+    assert len(cache) == 2
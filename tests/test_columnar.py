@@ -0,0 +1,90 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from columnar import (ALIGNMENT, COLUMNAR_MAGIC, COLUMNAR_MEDIA_TYPE, decode_columns, encode_columns,
+                      negotiate_format, records_to_columns)
+
+
+def test_round_trip_keeps_dtypes_and_values():
+    columns = {
+        "lst": np.array([31.5, 29.25, np.nan], dtype=np.float32),
+        "pixels": np.array([10, 0, 7], dtype=np.int64),
+        "urban": np.array([True, False, True]),
+        "region": ["Peel", "Toronto", "Peel"],
+    }
+    decoded, meta = decode_columns(encode_columns(columns, {"year": 2024}))
+
+    assert meta == {"year": 2024}
+    assert decoded["lst"].dtype == np.float32
+    np.testing.assert_array_equal(decoded["lst"], columns["lst"])
+    assert decoded["pixels"].tolist() == [10, 0, 7]
+    assert decoded["urban"].tolist() == [1, 0, 1]
+    assert decoded["region"] == ["Peel", "Toronto", "Peel"]
+
+
+def test_strings_are_dictionary_encoded():
+    payload = encode_columns({"region": ["b", "a", "b", "b"]})
+    (header_length,) = struct.unpack_from("<I", payload, 4)
+    (entry,) = json.loads(payload[8:8 + header_length])["columns"]
+
+    assert payload[:4] == COLUMNAR_MAGIC
+    assert entry["categories"] == ["a", "b"] and entry["dtype"] == "|u1"
+
+
+def test_buffers_are_aligned():
+    payload = encode_columns({"a": np.arange(3, dtype=np.uint8), "b": np.arange(5, dtype=np.float64)})
+    (header_length,) = struct.unpack_from("<I", payload, 4)
+    assert (8 + header_length) % ALIGNMENT == 0
+    columns, _ = decode_columns(payload)
+    assert columns["b"].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_empty_batch_round_trips():
+    columns = records_to_columns([], ["region", "lst"])
+    decoded, meta = decode_columns(encode_columns(columns))
+    assert meta == {}
+    assert {name: len(values) for name, values in decoded.items()} == {"region": 0, "lst": 0}
+
+    decoded, _ = decode_columns(encode_columns({}))
+    assert decoded == {}
+
+
+def test_records_to_columns_maps_missing_values_to_nan():
+    records = [{"region": "Peel", "lst": 30.5}, {"region": "Empty", "lst": None}]
+    columns = records_to_columns(records, ["region", "lst"])
+    assert columns["region"] == ["Peel", "Empty"]
+    decoded, _ = decode_columns(encode_columns(columns))
+    assert decoded["lst"][0] == 30.5 and np.isnan(decoded["lst"][1])
+
+
+def test_rejects_foreign_payload():
+    with pytest.raises(ValueError):
+        decode_columns(b'{"not": "columnar"}')
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, None),
+    ("application/json", None),
+    (COLUMNAR_MEDIA_TYPE, "columnar"),
+    (f"application/json;q=0.5, {COLUMNAR_MEDIA_TYPE}", "columnar"),
+    (f"application/json, {COLUMNAR_MEDIA_TYPE};q=0.5", None),
+])
+def test_negotiate_format(accept, expected):
+    assert negotiate_format(accept) == expected
+
+
+def test_arrow_stream_round_trip():
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+    from columnar import encode_arrow
+
+    columns = {"lst": np.array([31.5, np.nan]), "region": ["Peel", "Caledon"]}
+    table = pyarrow.ipc.open_stream(encode_arrow(columns, {"year": 2024})).read_all()
+
+    assert json.loads(table.schema.metadata[b"meta"]) == {"year": 2024}
+    assert table.column("region").to_pylist() == ["Peel", "Caledon"]
+    lst = table.column("lst").to_numpy()
+    assert lst[0] == 31.5 and np.isnan(lst[1])
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from executor import ComputeExecutor, OverloadedError
+
+
+class SlowProcessor:
+    """Stand-in processor whose calls block until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def metrics(self, region):
+        self.calls.append(region)
+        self.release.wait(5)
+        return {"region": region}
+
+
+async def wait_for_calls(processor, count):
+    while len(processor.calls) < count:
+        await asyncio.sleep(0.005)
+
+
+def test_identical_calls_share_one_computation():
+    processor = SlowProcessor()
+    executor = ComputeExecutor(processor, thread_workers=4)
+
+    async def scenario():
+        tasks = [asyncio.create_task(executor.run("metrics", "Peel", key=("metrics", "Peel"))) for _ in range(5)]
+        other = asyncio.create_task(executor.run("metrics", "York", key=("metrics", "York")))
+        await wait_for_calls(processor, 2)
+        assert executor.inflight == 2
+        processor.release.set()
+        return await asyncio.gather(*tasks), await other
+
+    try:
+        results, other = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+    assert results == [{"region": "Peel"}] * 5 and other == {"region": "York"}
+    assert sorted(processor.calls) == ["Peel", "York"]
+    assert executor.coalesced == 4
+    assert (executor.pending, executor.inflight) == (0, 0)
+
+
+def test_calls_without_key_are_not_coalesced():
+    processor = SlowProcessor()
+    processor.release.set()
+    executor = ComputeExecutor(processor, thread_workers=2)
+
+    async def scenario():
+        return await asyncio.gather(*(executor.run("metrics", "Peel") for _ in range(3)))
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert processor.calls == ["Peel"] * 3 and executor.coalesced == 0
+
+
+def test_rejects_when_saturated():
+    processor = SlowProcessor()
+    executor = ComputeExecutor(processor, thread_workers=1, max_pending=2)
+
+    async def scenario():
+        running = [asyncio.create_task(executor.run("metrics", region, key=region)) for region in ("A", "B")]
+        await wait_for_calls(processor, 1)
+        with pytest.raises(OverloadedError):
+            await executor.run("metrics", "C", key="C")
+        # Joining an in-flight computation does not add to the queue
+        joined = asyncio.create_task(executor.run("metrics", "A", key="A"))
+        await asyncio.sleep(0)
+        processor.release.set()
+        return await asyncio.gather(*running, joined)
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert results == [{"region": "A"}, {"region": "B"}, {"region": "A"}]
+    assert processor.calls == ["A", "B"]
+    assert (executor.rejected, executor.coalesced, executor.pending) == (1, 1, 0)
+
+
+def test_run_compute_answers_503_when_overloaded(monkeypatch):
+    processor = SlowProcessor()
+    executor = ComputeExecutor(processor, thread_workers=1, max_pending=1)
+    monkeypatch.setattr(server.app.state, "compute", executor, raising=False)
+
+    async def scenario():
+        running = asyncio.create_task(server.run_compute("metrics", "A"))
+        await wait_for_calls(processor, 1)
+        with pytest.raises(HTTPException) as excinfo:
+            await server.run_compute("metrics", "B")
+        processor.release.set()
+        await running
+        return excinfo.value
+
+    try:
+        error = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert error.status_code == 503
+    assert error.headers == {"Retry-After": "1"}
+
+
+def test_run_compute_answers_503_before_startup(monkeypatch):
+    monkeypatch.delattr(server.app.state, "compute", raising=False)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.run_compute("metrics", "Peel"))
+    assert excinfo.value.status_code == 503
+
+
+def test_queued_counts_calls_waiting_for_a_worker():
+    processor = SlowProcessor()
+    executor = ComputeExecutor(processor, thread_workers=1)
+
+    async def scenario():
+        running = [asyncio.create_task(executor.run("metrics", region)) for region in ("A", "B", "C")]
+        await wait_for_calls(processor, 1)
+        queued = executor.queued
+        processor.release.set()
+        await asyncio.gather(*running)
+        return queued
+
+    try:
+        assert asyncio.run(scenario()) == 2
+    finally:
+        executor.shutdown()
+    assert executor.queued == 0
@@ -0,0 +1,40 @@
+import json
+from argparse import Namespace
+
+import export_data
+
+
+def test_export_synthetic_rasters(tmp_path):
+    args = Namespace(
+        data_dir=str(tmp_path / 'geotiff'),
+        cache_dir=str(tmp_path / 'cache'),
+        build_dir=str(tmp_path / 'build'),
+        static_dir=str(tmp_path / 'static'),
+        zooms='8-8',
+        workers=1,
+        keep=3,
+        force=False,
+    )
+    (tmp_path / 'geotiff').mkdir()
+
+    export_data.export_data(args)
+
+    version = (tmp_path / 'build' / 'CURRENT').read_text()
+    build = tmp_path / 'build' / version
+    manifest = json.loads((build / 'manifest.json').read_text())
+    assert set(manifest['tile_counts']) == {"duhi", "ndvi", "lst", "correlation"}
+    assert all(count > 0 for count in manifest['tile_counts'].values())
+
+    # The derived layer gets a preview and tiles but no histogram
+    assert (build / 'previews' / 'correlation.png').read_bytes().startswith(b'\x89PNG')
+    assert list((build / 'tiles' / 'correlation' / '8').rglob('*.png'))
+    assert not (build / 'histograms' / 'correlation.json').exists()
+    assert (build / 'histograms' / 'duhi.json').exists()
+
+    region = json.loads((build / 'regions' / 'Peel.json').read_text())
+    assert set(region['distributions']) == {"duhi", "ndvi", "lst"}
+    assert (tmp_path / 'static' / 'metrics.json').exists()
+
+    # A second run with unchanged inputs reuses the build
+    export_data.export_data(args)
+    assert (tmp_path / 'build' / 'CURRENT').read_text() == version
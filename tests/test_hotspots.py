@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+
+from hotspots import (ISOTHERM_LEVELS, LOD_ZOOMS, FeatureIndex, HotspotIndex, degrees_per_pixel, lod_for_zoom,
+                      simplify_rings)
+from raster_store import RasterBand
+from tiles import TilePyramid
+
+RES = 0.001
+TRANSFORM = (-79.8, RES, 0.0, 43.8, 0.0, -RES)
+
+
+def naive_douglas_peucker(ring, tolerance):
+    """Recursive Douglas-Peucker of one closed ring, seeded with the point farthest from its start"""
+    if len(ring) <= 4:
+        return ring
+
+    def distance(p, a, b):
+        ab = b - a
+        length = np.hypot(*ab)
+        if length == 0:
+            return np.hypot(*(p - a))
+        return abs(ab[0] * (p[1] - a[1]) - ab[1] * (p[0] - a[0])) / length
+
+    def split(i, j, keep):
+        if j - i < 2:
+            return
+        dists = [distance(ring[k], ring[i], ring[j]) for k in range(i + 1, j)]
+        k = int(np.argmax(dists))
+        if dists[k] > tolerance:
+            keep.add(i + 1 + k)
+            split(i, i + 1 + k, keep)
+            split(i + 1 + k, j, keep)
+
+    far = int(np.argmax(np.hypot(*(ring - ring[0]).T)))
+    keep = {0, far, len(ring) - 1}
+    split(0, far, keep)
+    split(far, len(ring) - 1, keep)
+    return ring[sorted(keep)]
+
+
+def noisy_ring(rng, n, radius):
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+    r = radius * (1 + 0.15 * rng.standard_normal(n))
+    ring = np.column_stack([r * np.cos(angles), r * np.sin(angles)])
+    return np.vstack([ring, ring[:1]])
+
+
+@pytest.mark.parametrize("tolerance", [0.01, 0.1, 0.5])
+def test_simplify_rings_matches_naive_douglas_peucker(tolerance):
+    rng = np.random.default_rng(4)
+    rings = [noisy_ring(rng, n, radius) for n, radius in [(200, 1.0), (40, 0.3), (3, 1.0), (500, 2.5), (9, 0.01)]]
+
+    simplified = simplify_rings(rings, tolerance)
+    for ring, result in zip(rings, simplified):
+        expected = naive_douglas_peucker(ring, tolerance)
+        if len(expected) < 4:
+            assert result is None
+        else:
+            np.testing.assert_array_equal(result, expected)
+
+
+def test_simplify_rings_keeps_rings_closed_and_within_tolerance():
+    ring = noisy_ring(np.random.default_rng(9), 300, 1.0)
+    (result,) = simplify_rings([ring], 0.05)
+    assert 4 <= len(result) < len(ring)
+    np.testing.assert_array_equal(result[0], result[-1])
+    assert simplify_rings([ring], 0) == [ring]
+
+
+def test_feature_index_query_matches_naive_filter():
+    rng = np.random.default_rng(2)
+    lo = rng.uniform(-1, 1, (200, 2))
+    bboxes = np.column_stack([lo, lo + rng.uniform(0, 0.3, (200, 2))])
+    min_zooms = rng.integers(0, 15, 200)
+    index = FeatureIndex(list(range(200)), bboxes, min_zooms)
+
+    for west, south, east, north, zoom in [(-0.5, -0.5, 0.2, 0.4, 10), (0.9, 0.9, 2, 2, None), (-3, -3, -2, -2, 14)]:
+        expected = [i for i, (w, s, e, n) in enumerate(bboxes)
+                    if w <= east and e >= west and s <= north and n >= south and (zoom is None or min_zooms[i] <= zoom)]
+        assert index.query((west, south, east, north), zoom) == expected
+    assert index.query() == list(range(200))
+
+
+def build_index(data):
+    pyramid = TilePyramid.build(RasterBand("duhi", data.astype(np.float32), TRANSFORM, "v"))
+    return HotspotIndex.build("v", pyramid, describe=lambda lats, lngs: ["test"] * len(lats),
+                              region_of=lambda lat, lng: "Test")
+
+
+def test_zones_found_on_a_hand_built_raster():
+    data = np.full((60, 60), 3.0)
+    data[10:20, 30:40] = 9.0   # hot block
+    data[40:48, 8:16] = 0.0    # cool block
+    data[55, 55] = 9.0         # single hot pixel, smoothed away
+    features = build_index(data).hotspots()["features"]
+
+    assert [f["properties"]["type"] for f in features] == ["hotspot", "coolspot"]
+    hot, cool = (f["properties"] for f in features)
+    assert (hot["name"], hot["duhi"], hot["peak_duhi"]) == ("Test Heat Zone #1", 9.0, 9.0)
+    assert (cool["name"], cool["duhi"]) == ("Test Cooling Zone #1", 0.0)
+    # Zones are symmetric about their blocks, so centroids sit on the block centres
+    assert features[0]["geometry"]["coordinates"] == pytest.approx([-79.8 + 35 * RES, 43.8 - 15 * RES])
+    assert features[1]["geometry"]["coordinates"] == pytest.approx([-79.8 + 12 * RES, 43.8 - 44 * RES])
+    west, south, east, north = hot["bbox"]
+    assert -79.8 + 30 * RES <= west and east <= -79.8 + 40 * RES
+    assert 43.8 - 20 * RES <= south and north <= 43.8 - 10 * RES
+
+
+def test_isotherms_trace_a_known_bump():
+    rows, cols = np.mgrid[0:120, 0:120]
+    distance = np.hypot(rows - 60, cols - 60)
+    index = build_index(np.maximum(8.0 - distance / 5.0, 0.0))
+
+    features = index.isotherm_polygons(levels=(4.0,))["features"]
+    assert len(features) == 1
+    ring = np.asarray(features[0]["geometry"]["coordinates"][0])
+    # Smoothing barely moves a linear slope, so the 4 °C contour is close to the 20-pixel circle
+    radius = np.hypot(ring[:, 0] - (-79.8 + 60.5 * RES), ring[:, 1] - (43.8 - 60.5 * RES)) / RES
+    assert np.abs(radius - 20).max() < 1.0
+    assert {f["properties"]["level"] for f in index.isotherm_polygons()["features"]} == set(ISOTHERM_LEVELS)
+
+    # Coarser levels of detail keep fewer vertices
+    sizes = [len(index.isotherms[lod].features[0]["geometry"]["coordinates"][0]) for lod in LOD_ZOOMS]
+    assert sizes == sorted(sizes)
+    assert index.isotherm_polygons(bbox=(0.0, 0.0, 1.0, 1.0))["features"] == []
+
+
+def test_lod_for_zoom():
+    assert lod_for_zoom(None) == LOD_ZOOMS[-1]
+    assert lod_for_zoom(3) == LOD_ZOOMS[0]
+    assert lod_for_zoom(11) == 10
+    assert degrees_per_pixel(1) == degrees_per_pixel(0) / 2
@@ -0,0 +1,122 @@
+import hashlib
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from http_cache import HTTPCacheMiddleware, coded_etag, etag_matches, negotiate_encoding
+
+LARGE = {"values": list(range(1000))}
+
+
+def build_client():
+    async def small(request):
+        return JSONResponse({"ok": True})
+
+    async def large(request):
+        return JSONResponse(LARGE)
+
+    async def own_policy(request):
+        return PlainTextResponse("short", headers={"Cache-Control": "no-store"})
+
+    async def stream(request):
+        async def chunks():
+            yield b"a"
+            yield b"b"
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    async def echo(request):
+        return JSONResponse({"method": request.method})
+
+    app = Starlette(routes=[
+        Route("/api/small", small),
+        Route("/api/large", large),
+        Route("/api/own-policy", own_policy),
+        Route("/api/stream", stream),
+        Route("/api/echo", echo, methods=["POST"]),
+    ])
+    app.add_middleware(HTTPCacheMiddleware, policies=[("/api/", "public, max-age=60")])
+    return TestClient(app)
+
+
+IDENTITY = {"Accept-Encoding": "identity"}
+
+
+def test_get_gets_policy_and_body_hash_etag():
+    client = build_client()
+    response = client.get("/api/small", headers=IDENTITY)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, max-age=60"
+    assert response.headers["etag"] == f'"{hashlib.sha1(response.content).hexdigest()}"'
+
+
+@pytest.mark.parametrize("validator", ['{etag}', 'W/{etag}', '"other", {etag}', '*'])
+def test_matching_validator_gets_304(validator):
+    client = build_client()
+    etag = client.get("/api/small", headers=IDENTITY).headers["etag"]
+    response = client.get("/api/small", headers={**IDENTITY, "If-None-Match": validator.format(etag=etag)})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["cache-control"] == "public, max-age=60"
+
+
+def test_stale_validator_gets_full_response():
+    client = build_client()
+    response = client.get("/api/small", headers={**IDENTITY, "If-None-Match": '"stale"'})
+    assert response.status_code == 200 and response.json() == {"ok": True}
+
+
+def test_compressed_representation_has_its_own_etag():
+    client = build_client()
+    plain = client.get("/api/large", headers=IDENTITY)
+    zipped = client.get("/api/large", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in plain.headers
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["vary"] == "Accept-Encoding"
+    assert zipped.headers["etag"] == coded_etag(plain.headers["etag"], "gzip")
+    assert zipped.json() == LARGE
+
+    # Each representation only revalidates against its own ETag
+    revalidated = client.get("/api/large", headers={"Accept-Encoding": "gzip", "If-None-Match": zipped.headers["etag"]})
+    assert revalidated.status_code == 304
+    mismatched = client.get("/api/large", headers={"Accept-Encoding": "gzip", "If-None-Match": plain.headers["etag"]})
+    assert mismatched.status_code == 200
+    assert mismatched.json() == LARGE
+
+
+def test_route_policy_and_streams_are_left_alone():
+    client = build_client()
+    assert client.get("/api/own-policy").headers["cache-control"] == "no-store"
+
+    streamed = client.get("/api/stream", headers=IDENTITY)
+    assert streamed.text == "ab"
+    assert streamed.headers["cache-control"] == "public, max-age=60"
+    assert "etag" not in streamed.headers
+
+
+def test_non_get_is_untouched():
+    response = build_client().post("/api/echo", headers=IDENTITY)
+    assert response.json() == {"method": "POST"}
+    assert "etag" not in response.headers and "cache-control" not in response.headers
+
+
+def test_etag_matches():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, None),
+    ("gzip, deflate", "gzip"),
+    ("gzip;q=0", None),
+    ("*", "gzip"),
+    ("identity", None),
+])
+def test_negotiate_encoding(accept, expected):
+    assert negotiate_encoding(accept, ("gzip",)) == expected
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from local_correlation import local_correlation
+from raster_store import RasterBand
+
+TRANSFORM = (0.0, 1.0, 0.0, 0.0, 0.0, -1.0)
+
+
+def naive_correlation(x, y, window, min_valid_fraction=0.5):
+    """Pearson r of the valid pairs in each window, one window at a time"""
+    rows, cols = x.shape
+    half = window // 2
+    min_count = max(3, int(np.ceil(min_valid_fraction * window * window)))
+    out = np.full((rows, cols), np.nan)
+    for r in range(rows):
+        for c in range(cols):
+            if np.isnan(x[r, c]) or np.isnan(y[r, c]):
+                continue
+            xs = x[max(r - half, 0):r + half + 1, max(c - half, 0):c + half + 1].ravel()
+            ys = y[max(r - half, 0):r + half + 1, max(c - half, 0):c + half + 1].ravel()
+            valid = ~np.isnan(xs) & ~np.isnan(ys)
+            if valid.sum() < min_count or xs[valid].std() == 0 or ys[valid].std() == 0:
+                continue
+            out[r, c] = np.corrcoef(xs[valid], ys[valid])[0, 1]
+    return out
+
+
+def bands(rows=23, cols=17, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(30.0, 3.0, (rows, cols))
+    y = -0.02 * x + rng.normal(0.4, 0.05, (rows, cols))
+    x[rng.random((rows, cols)) < 0.15] = np.nan
+    y[rng.random((rows, cols)) < 0.15] = np.nan
+    x[2:6, 3:9] = np.nan  # a block of nodata leaves some windows short of pairs
+    return RasterBand("lst", x, TRANSFORM, "a"), RasterBand("ndvi", y, TRANSFORM, "a")
+
+
+@pytest.mark.parametrize("window, block_pixels", [(3, 1 << 16), (5, 40), (7, 1)])
+def test_matches_naive_pearson(window, block_pixels):
+    x_band, y_band = bands()
+    out = np.empty(x_band.shape)
+    local_correlation(x_band, y_band, out, window=window, block_pixels=block_pixels)
+
+    expected = naive_correlation(x_band.data, y_band.data, window)
+    np.testing.assert_array_equal(np.isnan(out), np.isnan(expected))
+    np.testing.assert_allclose(out, expected, atol=1e-9, equal_nan=True)
+
+
+def test_perfectly_related_bands():
+    x = np.arange(100, dtype=np.float64).reshape(10, 10)
+    out = np.empty(x.shape)
+    local_correlation(RasterBand("lst", x, TRANSFORM, "a"), RasterBand("ndvi", 2 - 3 * x, TRANSFORM, "a"), out,
+                      window=3)
+    # Corner windows hold 4 of the 9 pixels, under the 50% minimum
+    corners = (np.array([0, 0, 9, 9]), np.array([0, 9, 0, 9]))
+    assert np.isnan(out[corners]).all()
+    out[corners] = -1.0
+    np.testing.assert_allclose(out, -1.0)
+
+
+def test_constant_or_empty_windows_are_nan():
+    x = np.full((6, 6), 5.0)
+    y = np.random.default_rng(1).normal(size=(6, 6))
+    out = np.empty(x.shape)
+    local_correlation(RasterBand("lst", x, TRANSFORM, "a"), RasterBand("ndvi", y, TRANSFORM, "a"), out, window=3)
+    assert np.isnan(out).all()
+
+    local_correlation(RasterBand("lst", np.full((6, 6), np.nan), TRANSFORM, "a"),
+                      RasterBand("ndvi", y, TRANSFORM, "a"), out, window=3)
+    assert np.isnan(out).all()
+
+
+@pytest.mark.parametrize("window", [1, 4, 0])
+def test_rejects_invalid_window(window):
+    x_band, y_band = bands(5, 5)
+    with pytest.raises(ValueError):
+        local_correlation(x_band, y_band, np.empty((5, 5)), window=window)
@@ -0,0 +1,49 @@
+import copy
+
+import pytest
+
+from geotiff_processor import GeoTIFFProcessor
+
+
+@pytest.fixture(scope="module")
+def processor(tmp_path_factory):
+    root = tmp_path_factory.mktemp("locations")
+    (root / "geotiff").mkdir()
+    return GeoTIFFProcessor(root / "geotiff", root / "cache", deterministic=True)
+
+
+def cell_points(processor, lat, lng):
+    """The cell centre containing (lat, lng) and a point a quarter pixel away in the same cell"""
+    _, xres, _, _, _, yres = processor.load_band(processor.duhi_path).transform
+    _, _, lats, lngs = processor.snap_to_cells([lat], [lng])
+    return (float(lats[0]), float(lngs[0])), (float(lats[0]) - yres / 4, float(lngs[0]) + xres / 4)
+
+
+def test_repeated_calls_are_identical(processor):
+    first = processor.get_location_data(43.72, -79.74, 2022)
+    assert processor.get_location_data(43.72, -79.74, 2022) == first
+    # A fresh processor over the same rasters answers the same
+    fresh = GeoTIFFProcessor(processor.data_dir, processor.cache_dir, deterministic=True)
+    assert fresh.get_location_data(43.72, -79.74, 2022) == first
+    assert processor.get_location_data(43.72, -79.74, 2019) != first
+
+
+def test_clicks_in_one_cell_share_an_entry(processor):
+    centre, nearby = cell_points(processor, 43.70, -79.78)
+    processor._location_cache.clear()
+    misses = processor._location_cache.misses
+
+    assert processor.get_location_data(*centre) == processor.get_location_data(*nearby)
+    assert len(processor._location_cache) == 1
+    assert processor._location_cache.misses == misses + 1
+
+
+def test_time_cube_change_invalidates_entries(processor, monkeypatch):
+    processor.get_location_data(43.75, -79.62, 2020)
+    misses = processor._location_cache.misses
+
+    cube = copy.copy(processor.get_time_cube())
+    cube.version = "re-ingested"
+    monkeypatch.setattr(processor, "_time_cube", cube)
+    processor.get_location_data(43.75, -79.62, 2020)
+    assert processor._location_cache.misses == misses + 1
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from raster_store import COMPACT_ENCODINGS, Quantization, RasterBand, RasterStore
+
+
+@pytest.mark.parametrize("band", sorted(COMPACT_ENCODINGS))
+def test_compact_round_trip_within_half_a_step(band):
+    quantization = COMPACT_ENCODINGS[band]
+    lo, hi = quantization.valid_range or (-30.0, 30.0)
+    values = np.linspace(lo, hi, 41 * 121).reshape(41, 121).astype(np.float32)
+
+    codes = quantization.encode(values, strip_rows=7)
+    assert codes.dtype == np.uint16
+    assert quantization.valid(codes).all()
+    decoded = quantization.decode(codes)
+    assert np.abs(decoded - values).max() <= quantization.scale / 2 + 1e-5
+
+
+def test_nodata_and_out_of_range_become_sentinel():
+    quantization = Quantization("uint16", scale=0.01, offset=-1.0, valid_range=(-1.0, 1.0))
+    values = np.array([[np.nan, -1.5, 0.25, 1.5, np.inf]])
+    codes = quantization.encode(values)
+
+    assert codes.tolist() == [[65535, 65535, 125, 65535, 65535]]
+    assert quantization.valid(codes).tolist() == [[False, False, True, False, False]]
+    decoded = quantization.decode(codes)
+    assert np.isnan(decoded[0, [0, 1, 3, 4]]).all()
+    assert decoded[0, 2] == pytest.approx(0.25)
+
+
+def test_values_past_the_code_range_saturate_below_the_sentinel():
+    quantization = Quantization("uint8", scale=1.0, offset=0.0)
+    codes = quantization.encode(np.array([[-5.0, 300.0]]))
+    assert codes.tolist() == [[0, 254]]
+
+
+def test_float16_uses_nan_as_nodata():
+    quantization = Quantization("float16")
+    codes = quantization.encode(np.array([[1.5, np.nan]]))
+    assert codes.dtype == np.float16
+    assert quantization.valid(codes).tolist() == [[True, False]]
+    assert quantization.decode(codes)[0, 0] == 1.5
+
+
+def test_code_values_match_decode():
+    quantization = Quantization("uint8", scale=0.5, offset=-10.0)
+    table = quantization.code_values()
+    codes = np.array([0, 1, 100, 254, 255], dtype=np.uint8)
+    np.testing.assert_array_equal(table[quantization.lookup_indices(codes)], quantization.decode(codes))
+
+
+def test_unsupported_dtype_rejected():
+    with pytest.raises(ValueError):
+        Quantization("int32")
+
+
+def test_band_valid_mask_and_decode():
+    quantization = COMPACT_ENCODINGS["ndvi"]
+    codes = quantization.encode(np.array([[0.5, np.nan]]))
+    band = RasterBand("ndvi", codes, (0, 1, 0, 0, 0, -1), "v", quantization=quantization)
+    assert band.valid_mask(codes).tolist() == [[True, False]]
+    assert band.decode(codes, np.float64)[0, 0] == pytest.approx(0.5, abs=quantization.scale)
+
+
+def test_derived_band_is_built_once_per_source_version(tmp_path):
+    store = RasterStore(tmp_path)
+    calls = []
+
+    def build(out):
+        calls.append(1)
+        out[:] = 7.0
+
+    band = store.derived("example", "v1", (4, 5), (0, 1, 0, 0, 0, -1), build)
+    assert band.data.shape == (4, 5) and float(band.data[0, 0]) == 7.0
+    assert store.derived("example", "v1", (4, 5), (0, 1, 0, 0, 0, -1), build) is band
+    # A fresh store (another worker) maps the cached file instead of rebuilding
+    RasterStore(tmp_path).derived("example", "v1", (4, 5), (0, 1, 0, 0, 0, -1), build)
+    assert len(calls) == 1
+
+    store.derived("example", "v2", (4, 5), (0, 1, 0, 0, 0, -1), build)
+    assert len(calls) == 2
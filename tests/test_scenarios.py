@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+from caching import LRUCache
+from raster_store import RasterBand
+from region_stats import RegionStatsIndex
+from scenarios import ALBEDO_LST_SENSITIVITY, DEFAULT_NDVI_SLOPE, ROOF_FRACTION, ScenarioEngine, _tile_mask
+from zonal_stats import polygon_rings, rasterize_polygons
+
+ROWS, COLS, TILE = 60, 70, 16
+# One-degree pixels well away from the municipal boxes, so only "Peel" (the whole raster) has pixels
+TRANSFORM = (0.0, 1.0, 0.0, float(ROWS), 0.0, -1.0)
+CLASSES = {1: "Industrial", 2: "Commercial", 3: "Residential"}
+
+
+@pytest.fixture(scope="module")
+def rasters():
+    rng = np.random.default_rng(8)
+    landuse = np.full((ROWS, COLS), 1.0)
+    landuse[:, 40:] = 3.0
+    landuse[:10, :10] = 2.0     # too few pixels for a fit
+    ndvi = rng.uniform(0.05, 0.75, (ROWS, COLS))
+    lst = np.where(landuse == 1, 40 - 12 * ndvi, 25 + 5 * ndvi) + rng.normal(0, 0.3, (ROWS, COLS))
+    duhi = lst - 30
+    ndvi[5, 50] = np.nan        # nodata in one band drops the pixel from every fit
+    bands = {name: RasterBand(name, values.astype(np.float32), TRANSFORM, "v")
+             for name, values in (("lst", lst), ("ndvi", ndvi), ("duhi", duhi))}
+    return bands, RasterBand("landuse", landuse.astype(np.float32), TRANSFORM, "v")
+
+
+def build(rasters, landuse=True):
+    bands, landuse_band = rasters
+    return ScenarioEngine.build("v", bands, landuse_band if landuse else None, CLASSES, LRUCache(64), tile_size=TILE)
+
+
+def stats_index(bands):
+    return RegionStatsIndex.build("v", bands["lst"], bands["ndvi"], bands["duhi"])
+
+
+def polygon_mask_for(band):
+    return lambda geometry: rasterize_polygons(band, polygon_rings(geometry))
+
+
+def test_fits_match_polyfit(rasters):
+    bands, landuse = rasters
+    model = build(rasters).model
+    lst, ndvi, codes = bands["lst"].data, bands["ndvi"].data, landuse.data
+    valid = np.isfinite(lst) & np.isfinite(ndvi)
+
+    for code, name in CLASSES.items():
+        selected = valid & (codes == code)
+        slope, intercept = np.polyfit(ndvi[selected].astype(np.float64), lst[selected].astype(np.float64), 1)
+        fit = model.fits[name]
+        assert fit["pixels"] == selected.sum()
+        assert fit["correlation"] == pytest.approx(np.corrcoef(ndvi[selected], lst[selected])[0, 1], abs=1e-3)
+        if name == "Industrial":
+            assert fit["source"] == "fitted"
+            assert model.slopes[code] == pytest.approx(slope, rel=1e-6)
+            assert fit["intercept"] == pytest.approx(intercept, abs=1e-3)
+        else:
+            # Too few pixels (Commercial) or warming with more greenery (Residential): the default applies
+            assert fit["source"] == "default" and model.slopes[code] == DEFAULT_NDVI_SLOPE
+
+
+def test_tile_mask_matches_full_grid_crop():
+    rng = np.random.default_rng(1)
+    mask = rng.random((13, 21)) < 0.5
+    full = np.zeros((ROWS, COLS), dtype=bool)
+    full[7:20, 12:33] = mask
+    for r0, c0 in [(0, 0), (16, 16), (0, 32), (48, 48)]:
+        expected = full[r0:r0 + TILE, c0:c0 + TILE]
+        np.testing.assert_array_equal(_tile_mask(((7, 12, 13, 21), mask), r0, c0, expected.shape), expected)
+
+
+def test_albedo_everywhere_without_land_use(rasters):
+    bands, _ = rasters
+    engine = build(rasters, landuse=False)
+    result = engine.simulate([{"type": "albedo", "amount": 0.2}], 4.0, stats_index(bands), polygon_mask_for(bands["duhi"]))
+
+    peel = result["regions"]["Peel"]
+    expected = ALBEDO_LST_SENSITIVITY * 0.2 * ROOF_FRACTION["All"]
+    assert peel["mean_duhi_change"] == pytest.approx(expected, abs=1e-3)
+    assert peel["changed_pixels"] == ROWS * COLS - 1
+    assert result["regions"]["Brampton"] is None
+    assert result["tiles_touched"] == result["tiles_total"] == 4 * 5
+
+
+def test_greening_one_class_follows_its_slope(rasters):
+    bands, landuse = rasters
+    engine = build(rasters)
+    index = stats_index(bands)
+    result = engine.simulate([{"type": "ndvi", "amount": 0.1, "landuse": "Industrial"}], 4.0, index,
+                             polygon_mask_for(bands["duhi"]))
+
+    ndvi, duhi = bands["ndvi"].data.astype(np.float64), bands["duhi"].data.astype(np.float64)
+    valid = np.isfinite(ndvi)
+    selected = valid & (landuse.data == 1)
+    delta = np.zeros((ROWS, COLS))
+    delta[selected] = engine.model.slopes[1] * (np.clip(ndvi + 0.1, -1, 1) - ndvi)[selected]
+
+    peel = result["regions"]["Peel"]
+    assert peel["changed_pixels"] == selected.sum()
+    assert peel["mean_duhi_change"] == pytest.approx(delta[valid].sum() / valid.sum(), abs=1e-3)
+    hot_change = ((duhi + delta >= 4.0) & valid).sum() - ((duhi >= 4.0) & valid).sum()
+    assert peel["area_above_threshold_change"] == pytest.approx(hot_change / valid.sum() * 100, abs=0.01)
+    # Only tiles holding Industrial pixels (columns 0-39: three tile columns) are touched
+    assert result["tiles_touched"] == 4 * 3
+
+
+def test_polygon_limits_the_intervention_and_tiles_are_cached(rasters):
+    bands, _ = rasters
+    engine = build(rasters, landuse=False)
+    square = {"type": "Polygon", "coordinates": [[[3, 3], [23, 3], [23, 23], [3, 23], [3, 3]]]}
+    args = ([{"type": "albedo", "amount": 0.1, "geometry": square}], 4.0, stats_index(bands),
+            polygon_mask_for(bands["duhi"]))
+
+    result = engine.simulate(*args)
+    assert result["regions"]["Peel"]["changed_pixels"] == 20 * 20
+    assert sum(tile["changed_pixels"] for tile in result["tiles"]) == 400
+    cached = len(engine.tile_cache)
+    hits = engine.tile_cache.hits
+    assert engine.simulate(*args) == result
+    assert len(engine.tile_cache) == cached and engine.tile_cache.hits == hits + result["tiles_touched"]
+
+
+@pytest.mark.parametrize("intervention", [
+    {"type": "paint", "amount": 0.1},
+    {"type": "ndvi", "amount": 2},
+    {"type": "ndvi", "amount": 0.1, "landuse": "Airport"},
+])
+def test_invalid_interventions(rasters, intervention):
+    bands, _ = rasters
+    with pytest.raises(ValueError):
+        build(rasters).simulate([intervention], 4.0, stats_index(bands), polygon_mask_for(bands["duhi"]))
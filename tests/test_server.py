@@ -0,0 +1,124 @@
+import json
+
+import pytest
+from starlette.testclient import TestClient
+
+import server
+from executor import ComputeExecutor
+from geotiff_processor import GeoTIFFProcessor
+
+
+@pytest.fixture(scope="module")
+def processor(tmp_path_factory):
+    root = tmp_path_factory.mktemp("server")
+    (root / "geotiff").mkdir()
+    return GeoTIFFProcessor(root / "geotiff", root / "cache", deterministic=True)
+
+
+@pytest.fixture
+def client(processor, monkeypatch):
+    # Startup is not run, so the app uses this processor over synthetic rasters
+    compute = ComputeExecutor(processor, thread_workers=2)
+    monkeypatch.setattr(server.app.state, "processor", processor, raising=False)
+    monkeypatch.setattr(server.app.state, "compute", compute, raising=False)
+    yield TestClient(server.app)
+    compute.shutdown()
+
+
+def test_unknown_region_is_rejected(client):
+    for path in ("/api/metrics", "/api/timeseries", "/api/distribution/duhi", "/api/dashboard"):
+        response = client.get(path, params={"region": "Nowhere"})
+        assert response.status_code == 400, path
+        assert "Nowhere" in response.json()["detail"]
+
+
+def test_region_aliases_share_the_canonical_name(client):
+    alias = client.get("/api/metrics", params={"region": "Peel (All)"})
+    canonical = client.get("/api/metrics", params={"region": "Peel"})
+    assert alias.status_code == 200
+    assert alias.json() == canonical.json()
+    assert canonical.json()["region"] == "Peel"
+
+
+def test_tiles_revalidate_instead_of_caching_for_a_day(client):
+    tile = client.get("/api/tiles/duhi/9/142/186.png")
+    assert tile.status_code == 200
+    assert tile.headers["cache-control"] == "no-cache"
+
+    revalidated = client.get("/api/tiles/duhi/9/142/186.png", headers={"If-None-Match": tile.headers["etag"]})
+    assert revalidated.status_code == 304
+
+
+def test_metrics_gauges_read_public_accessors(client):
+    client.get("/api/layer-preview/duhi")
+    text = client.get("/internal/metrics").text
+    assert 'cache_entries{cache="preview"}' in text
+    assert "status_checks_buffered" in text
+    assert "compute_queued 0" in text
+
+
+def test_dashboard_returns_every_section_by_default(client):
+    document = client.get("/api/dashboard").json()
+    assert list(document) == list(server.DASHBOARD_SECTIONS)
+    assert document["metrics"] == client.get("/api/metrics").json()
+    assert document["layer_preview"]["layer"] == "duhi"
+
+
+def test_dashboard_section_selector_and_fields(client):
+    document = client.get("/api/dashboard", params={
+        "sections": "regional_breakdown, metrics",
+        "fields": "metrics.mean_duhi,metrics.region,regional_breakdown.name",
+    }).json()
+
+    # Sections come back in dashboard order whatever order they were asked in
+    assert list(document) == ["metrics", "regional_breakdown"]
+    assert set(document["metrics"]) == {"mean_duhi", "region"}
+    assert [set(record) for record in document["regional_breakdown"]] == [{"name"}] * 4
+
+
+@pytest.mark.parametrize("params", [
+    {"sections": "metrics,weather"},
+    {"sections": ","},
+    {"sections": "metrics", "fields": "timeseries.years"},
+    {"fields": "metrics"},
+    {"sections": "layer_preview", "layer": "rainfall"},
+])
+def test_dashboard_rejects_bad_parameters(client, params):
+    assert client.get("/api/dashboard", params=params).status_code == 400
+
+
+def ndjson_parts(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_dashboard_ndjson_sends_primary_sections_first(client):
+    whole = client.get("/api/dashboard").json()
+    response = client.get("/api/dashboard", headers={"Accept": "application/x-ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    first, *rest = ndjson_parts(response)
+    assert list(first) == [s for s in server.DASHBOARD_SECTIONS if s not in server.DASHBOARD_DEFERRED]
+    assert sorted(name for part in rest for name in part) == sorted(server.DASHBOARD_DEFERRED)
+    assert all(len(part) == 1 for part in rest)
+    merged = dict(first)
+    for part in rest:
+        merged.update(part)
+    assert merged == whole
+
+
+def test_dashboard_ndjson_reports_deferred_failures_in_band(client, processor, monkeypatch):
+    def broken(*args):
+        raise RuntimeError("hotspot index unavailable")
+
+    monkeypatch.setattr(processor, "get_hotspots", broken)
+    response = client.get("/api/dashboard", params={"sections": "metrics,hotspots,layer_preview"},
+                          headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+
+    first, *rest = ndjson_parts(response)
+    assert list(first) == ["metrics"]
+    assert {"errors": {"hotspots": "hotspot index unavailable"}} in rest
+    assert any("layer_preview" in part for part in rest)
+
+    # Without streaming the same failure fails the whole document
+    assert client.get("/api/dashboard", params={"sections": "metrics,hotspots"}).status_code == 500
@@ -0,0 +1,104 @@
+import gzip
+import json
+import os
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from http_cache import HTTPCacheMiddleware
+from static_store import StaticDataStore
+
+DOCUMENT = {"regions": [{"name": "Peel (All)", "mean_lst": 31.2, "note": "ΔUHI ≥ 4°C"}] * 50}
+
+
+def write(path, data, mtime_ns):
+    path.write_text(json.dumps(data))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_reload_picks_up_changes(tmp_path):
+    write(tmp_path / "metrics.json", {"mean_duhi": 4.0}, 1_000_000_000)
+    (tmp_path / "notes.txt").write_text("ignored")
+    store = StaticDataStore(tmp_path)
+
+    assert store.reload() == ["metrics.json"]
+    assert store.get("metrics.json").data == {"mean_duhi": 4.0}
+    assert store.get("notes.txt") is None
+    assert store.reload() == [] and store.version == 1
+
+    write(tmp_path / "metrics.json", {"mean_duhi": 4.5}, 2_000_000_000)
+    write(tmp_path / "zones.geojson", {"type": "FeatureCollection", "features": []}, 2_000_000_000)
+    assert sorted(store.reload()) == ["metrics.json", "zones.geojson"]
+    assert store.get("metrics.json").data == {"mean_duhi": 4.5}
+    assert store.get("zones.geojson").media_type == "application/geo+json"
+    assert store.version == 2
+
+
+def test_unreadable_file_keeps_the_previous_entry_until_removed(tmp_path):
+    path = tmp_path / "metrics.json"
+    write(path, {"mean_duhi": 4.0}, 1_000_000_000)
+    store = StaticDataStore(tmp_path)
+    store.reload()
+
+    path.write_text("{not json")
+    os.utime(path, ns=(3_000_000_000, 3_000_000_000))
+    assert store.reload() == []
+    assert store.get("metrics.json").data == {"mean_duhi": 4.0}
+
+    path.unlink()
+    assert store.reload() == ["metrics.json"]
+    assert store.get("metrics.json") is None
+
+
+@pytest.fixture
+def clients(tmp_path):
+    """The same document served from the store and through the middleware from a plain route"""
+    write(tmp_path / "breakdown.json", DOCUMENT, 1_000_000_000)
+    store = StaticDataStore(tmp_path)
+    store.reload()
+    entry = store.get("breakdown.json")
+
+    async def static(request):
+        return entry.response(request)
+
+    async def dynamic(request):
+        return Response(entry.bodies[None], media_type="application/json")
+
+    app = Starlette(routes=[Route("/api/static", static), Route("/api/dynamic", dynamic)])
+    app.add_middleware(HTTPCacheMiddleware, min_size=0)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("coding", ["identity", "gzip"])
+def test_precomputed_representation_matches_the_middleware(clients, coding):
+    headers = {"Accept-Encoding": coding}
+    static = clients.get("/api/static", headers=headers)
+    dynamic = clients.get("/api/dynamic", headers=headers)
+
+    assert static.headers["etag"] == dynamic.headers["etag"]
+    assert static.headers.get("content-encoding") == dynamic.headers.get("content-encoding")
+    assert static.headers["vary"] == dynamic.headers["vary"] == "Accept-Encoding"
+    assert static.json() == dynamic.json() == DOCUMENT
+
+
+def test_encoded_bodies_decode_to_the_document(tmp_path):
+    write(tmp_path / "breakdown.json", DOCUMENT, 1_000_000_000)
+    store = StaticDataStore(tmp_path)
+    store.reload()
+    entry = store.get("breakdown.json")
+
+    assert json.loads(entry.bodies[None]) == DOCUMENT
+    assert gzip.decompress(entry.bodies["gzip"]) == entry.bodies[None]
+    assert len(entry.bodies["gzip"]) < len(entry.bodies[None])
+
+
+def test_static_revalidation_uses_the_coded_etag(clients):
+    etag = clients.get("/api/static", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    assert etag.endswith('-gzip"')
+    revalidated = clients.get("/api/static", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    # The identity representation has a different tag, so it is sent in full
+    assert clients.get("/api/static", headers={"Accept-Encoding": "identity", "If-None-Match": etag}).status_code == 200
@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from status_store import MemoryStatusStore, decode_cursor, encode_cursor
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def check(i, client="a", timestamp=None):
+    return {"id": f"{i:05d}", "client_name": client, "timestamp": timestamp or START + timedelta(seconds=i // 2)}
+
+
+async def filled_store(count, **settings):
+    store = MemoryStatusStore(ttl_days=0, **settings)
+    for i in range(count):
+        await store.add(check(i, client="a" if i % 3 else "b"))
+    return store
+
+
+async def all_pages(store, limit, client_name=None):
+    ids, cursor = [], None
+    while True:
+        docs, cursor = await store.page(limit=limit, cursor=cursor, client_name=client_name)
+        ids.extend(doc["id"] for doc in docs)
+        if cursor is None:
+            return ids
+
+
+def newest_first(ids):
+    return sorted(ids, key=lambda i: (int(i) // 2, i), reverse=True)
+
+
+def test_cursor_pages_cover_every_check_once():
+    async def scenario():
+        store = await filled_store(257, batch_size=10)
+        return await all_pages(store, limit=20), await all_pages(store, limit=1000)
+
+    paged, single = asyncio.run(scenario())
+    expected = newest_first([f"{i:05d}" for i in range(257)])
+    assert paged == expected and single == expected
+
+
+def test_client_name_filter():
+    async def scenario():
+        store = await filled_store(100)
+        return await all_pages(store, limit=7, client_name="b"), await store.page(limit=5, client_name="nobody")
+
+    ids, empty = asyncio.run(scenario())
+    assert ids == newest_first([f"{i:05d}" for i in range(100) if i % 3 == 0])
+    assert empty == ([], None)
+
+
+def test_checks_written_during_a_walk_do_not_disturb_it():
+    async def scenario():
+        store = await filled_store(50)
+        seen = []
+        async for doc in store.iter_checks(limit=None):
+            seen.append(doc["id"])
+            if len(seen) == 10:
+                # Newer checks land ahead of the walk and the oldest ones expire behind it
+                store.max_checks = 45
+                for i in range(50, 55):
+                    await store.add(check(i))
+                await store.flush()
+        return seen
+
+    seen = asyncio.run(scenario())
+    expected = newest_first([f"{i:05d}" for i in range(50)])
+    # Still newest first with no repeats, and nothing newer than where the walk started
+    assert seen[:10] == expected[:10]
+    assert seen == [i for i in expected if i in seen]
+    assert len(set(seen)) == len(seen)
+
+
+def test_cursor_round_trip():
+    doc = check(3)
+    assert decode_cursor(encode_cursor(doc)) == (doc["timestamp"], doc["id"])
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_max_checks_and_ttl_expire_the_oldest():
+    async def scenario():
+        store = MemoryStatusStore(max_checks=5, ttl_days=0)
+        for i in range(8):
+            await store.add(check(i))
+        await store.flush()
+        capped = [doc["id"] async for doc in store.iter_checks()]
+
+        store = MemoryStatusStore(ttl_days=1)
+        now = datetime.now(timezone.utc)
+        await store.add(check(1, timestamp=now - timedelta(days=2)))
+        await store.add(check(2, timestamp=now - timedelta(hours=1)))
+        await store.flush()
+        return capped, [doc["id"] async for doc in store.iter_checks()]
+
+    capped, fresh = asyncio.run(scenario())
+    assert capped == ["00007", "00006", "00005", "00004", "00003"]
+    assert fresh == ["00002"]
+
+
+def test_failed_flush_keeps_checks_buffered():
+    class FlakyStore(MemoryStatusStore):
+        failures = 1
+
+        async def _write(self, docs):
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("database unavailable")
+            await super()._write(docs)
+
+    async def scenario():
+        store = FlakyStore(batch_size=100, ttl_days=0)
+        await store.add(check(1))
+        await store.add(check(2))
+        with pytest.raises(ConnectionError):
+            await store.flush()
+        assert store.pending == 2 and store.written == 0
+        await store.add(check(3))
+        await store.flush()
+        return store, [doc["id"] async for doc in store.iter_checks()]
+
+    store, ids = asyncio.run(scenario())
+    assert ids == ["00003", "00002", "00001"]
+    assert (store.pending, store.written, store.flushes) == (0, 3, 1)
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from streaming_stats import RunningCovariance, RunningHistogram, RunningMoments, iter_blocks
+
+
+@pytest.fixture
+def samples():
+    rng = np.random.default_rng(7)
+    # Large offset relative to the spread: naive sum-of-squares formulas lose precision here
+    x = rng.standard_normal(10_000) * 0.5 + 1e4
+    y = -0.8 * x + rng.standard_normal(10_000)
+    return x, y
+
+
+def test_moments_updates_match_numpy(samples):
+    x, _ = samples
+    moments = RunningMoments()
+    for chunk in np.array_split(x, 37):
+        moments.update(chunk)
+
+    assert moments.count == x.size
+    assert moments.mean == pytest.approx(np.mean(x), rel=1e-12)
+    assert moments.variance == pytest.approx(np.var(x), rel=1e-9)
+    assert (moments.min, moments.max) == (x.min(), x.max())
+
+
+def test_moments_merge_matches_single_pass(samples):
+    x, _ = samples
+    parts = []
+    for chunk in np.array_split(x, [10, 3000, 3001, 9000]):
+        part = RunningMoments()
+        part.update(chunk)
+        parts.append(part)
+    merged = RunningMoments()
+    for part in parts:
+        merged.merge(part)
+
+    assert merged.count == x.size
+    assert merged.mean == pytest.approx(np.mean(x), rel=1e-12)
+    assert merged.variance == pytest.approx(np.var(x), rel=1e-9)
+
+
+def test_moments_ignore_empty_blocks():
+    moments = RunningMoments()
+    moments.update(np.array([]))
+    moments.merge(RunningMoments())
+    assert moments.count == 0
+    assert np.isnan(moments.variance)
+
+
+def test_covariance_matches_numpy(samples):
+    x, y = samples
+    left, right = RunningCovariance(), RunningCovariance()
+    for xs, ys in zip(np.array_split(x[:4000], 5), np.array_split(y[:4000], 5)):
+        left.update(xs, ys)
+    right.update(x[4000:], y[4000:])
+    left.merge(right)
+
+    assert left.comoment / x.size == pytest.approx(np.cov(x, y, bias=True)[0, 1], rel=1e-9)
+    assert left.correlation == pytest.approx(np.corrcoef(x, y)[0, 1], rel=1e-9)
+
+
+def test_correlation_undefined_for_few_or_constant_samples():
+    few = RunningCovariance()
+    few.update(np.arange(50.0), np.arange(50.0))
+    assert few.correlation is None
+
+    constant = RunningCovariance()
+    constant.update(np.ones(500), np.arange(500.0))
+    assert constant.correlation is None
+
+
+def test_histogram_fractions_and_merge():
+    values = np.linspace(0.0, 10.0, 1001)
+    left, right = RunningHistogram(0.0, 10.0, 40), RunningHistogram(0.0, 10.0, 40)
+    left.update(values[:500])
+    right.update(values[500:])
+    left.merge(right)
+
+    assert left.total == values.size
+    assert left.fraction_below(4.0) == pytest.approx(np.mean(values < 4.0), abs=1e-3)
+    assert left.fraction_at_least(4.0) == pytest.approx(np.mean(values >= 4.0), abs=1e-3)
+    assert left.percentile(50) == pytest.approx(np.percentile(values, 50), abs=left.width)
+
+
+def test_empty_histogram_is_nan():
+    histogram = RunningHistogram(0.0, 1.0, 8)
+    assert np.isnan(histogram.fraction_below(0.5))
+    assert np.isnan(histogram.percentile(50))
+
+
+def test_iter_blocks_covers_window_once():
+    window = (3, 5, 101, 17)
+    covered = np.zeros((120, 30), dtype=int)
+    for row_off, col_off, height, width in iter_blocks(window, block_pixels=17 * 9):
+        covered[row_off:row_off + height, col_off:col_off + width] += 1
+    assert covered[3:104, 5:22].min() == 1
+    assert covered.sum() == 101 * 17
@@ -0,0 +1,102 @@
+import math
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from colormap import build_lut
+from raster_store import COMPACT_ENCODINGS, RasterBand
+from tiles import TILE_SIZE, TilePyramid, downsample, tile_bounds, tiles_covering
+
+WEST, NORTH, RES = -80.0, 44.0, 0.01
+LUT = build_lut(['#2166AC', '#F7F7F7', '#B2182B'])
+VMIN, VMAX = -2.0, 8.0
+
+
+@pytest.fixture(scope="module")
+def band():
+    rng = np.random.default_rng(11)
+    data = rng.normal(3.0, 2.0, (300, 420)).astype(np.float32)
+    data[rng.random(data.shape) < 0.05] = np.nan
+    return RasterBand("duhi", data, (WEST, RES, 0.0, NORTH, 0.0, -RES), "v1")
+
+
+def naive_tile(values, transform, z, x, y):
+    """RGBA of every tile pixel centre, nearest stored pixel looked up one at a time"""
+    west, xres, _, north, _, yres = transform
+    n = 2 ** z
+    # Nodata is the first colour made fully transparent
+    rgba = np.tile(LUT[0], (TILE_SIZE, TILE_SIZE, 1))
+    rgba[..., 3] = 0
+    for i in range(TILE_SIZE):
+        lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + (i + 0.5) / TILE_SIZE) / n))))
+        row = math.floor((lat - north) / yres)
+        for j in range(TILE_SIZE):
+            lng = (x + (j + 0.5) / TILE_SIZE) / n * 360.0 - 180.0
+            col = math.floor((lng - west) / xres)
+            if not (0 <= row < values.shape[0] and 0 <= col < values.shape[1]) or np.isnan(values[row, col]):
+                continue
+            index = min(max(int((values[row, col] - VMIN) * len(LUT) / (VMAX - VMIN)), 0), len(LUT) - 1)
+            rgba[i, j] = LUT[index]
+    return rgba
+
+
+def decode_png(png):
+    return np.asarray(Image.open(BytesIO(png)).convert("RGBA"))
+
+
+@pytest.mark.parametrize("z", [9, 6])
+def test_rendered_tile_matches_naive_lookup(band, z):
+    pyramid = TilePyramid.build(band)
+    # A tile holding the raster's north-west corner, so part of it lies off the raster
+    (x, y), = [t for t in tiles_covering((WEST, NORTH - 1e-9, WEST + 1e-9, NORTH), z)]
+    level = pyramid.select_level(z)
+    values, transform = pyramid.level_values(level), pyramid.levels[level][1]
+
+    rgba = decode_png(pyramid.render_tile(z, x, y, LUT, VMIN, VMAX))
+    np.testing.assert_array_equal(rgba, naive_tile(values, transform, z, x, y))
+    assert (rgba[..., 3] == 0).any() and (rgba[..., 3] == 255).any()
+
+
+def test_levels_and_level_choice(band):
+    pyramid = TilePyramid.build(band)
+    assert [data.shape for data, _ in pyramid.levels] == [(300, 420), (150, 210)]
+    assert pyramid.select_level(12) == 0
+    # 360 / (2**6 * 256) ≈ 0.022° per tile pixel: the 0.02° overview is the coarsest fine enough
+    assert pyramid.select_level(6) == 1
+    assert pyramid.select_level(0) == 1
+
+
+def test_quantized_pyramid_renders_like_float(band):
+    quantization = COMPACT_ENCODINGS["duhi"]
+    compact = RasterBand("duhi", quantization.encode(band.data), band.transform, "v1", quantization=quantization)
+    float_tile = decode_png(TilePyramid.build(band).render_tile(9, 142, 186, LUT, VMIN, VMAX))
+    compact_tile = decode_png(TilePyramid.build(compact).render_tile(9, 142, 186, LUT, VMIN, VMAX))
+    # Values within 1/1024 °C of each other land in the same or the adjacent colour bin
+    assert (np.abs(float_tile.astype(int) - compact_tile.astype(int)) <= 2).all()
+    np.testing.assert_array_equal(float_tile[..., 3], compact_tile[..., 3])
+
+
+def test_tile_off_the_raster_is_none(band):
+    assert TilePyramid.build(band).render_tile(9, 0, 0, LUT, VMIN, VMAX) is None
+
+
+def test_downsample_is_nan_aware_mean():
+    data = np.array([[1, 3, 5], [np.nan, 5, 7], [2, np.nan, 1]], dtype=np.float32)
+    expected = [[3.0, 6.0], [2.0, 1.0]]
+    np.testing.assert_allclose(downsample(data, strip_rows=2), expected)
+    assert np.isnan(downsample(np.full((2, 2), np.nan, dtype=np.float32))[0, 0])
+
+
+@pytest.mark.parametrize("z", [3, 8, 11])
+def test_tiles_covering_matches_naive_intersection(z):
+    bounds = (-80.2, 43.45, -79.5, 44.0)
+    n = 2 ** z
+    expected = set()
+    for x in range(n):
+        for y in range(n):
+            west, south, east, north = tile_bounds(z, x, y)
+            if west < bounds[2] and east > bounds[0] and south < bounds[3] and north > bounds[1]:
+                expected.add((x, y))
+    assert set(tiles_covering(bounds, z)) == expected
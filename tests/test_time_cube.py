@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+import time_cube
+from raster_store import RasterBand
+from time_cube import BANDS, TimeCube, discover_years, ingest, linear_trend
+
+
+def test_linear_trend_matches_linregress():
+    rng = np.random.default_rng(3)
+    years = [2016, 2017, 2019, 2020, 2021, 2024]
+    cube = rng.normal(30.0, 2.0, (len(years), 4, 5))
+    cube += 0.4 * (np.asarray(years) - 2016)[:, None, None] * rng.random((4, 5))
+
+    slope, p_value = linear_trend(cube, years)
+    for r in range(4):
+        for c in range(5):
+            fit = stats.linregress(years, cube[:, r, c])
+            assert slope[r, c] == pytest.approx(fit.slope, rel=1e-5, abs=1e-6)
+            assert p_value[r, c] == pytest.approx(fit.pvalue, rel=1e-4, abs=1e-6)
+
+
+def test_linear_trend_exact_and_short_series():
+    years = [2020, 2021, 2022]
+    slope, p_value = linear_trend(np.array([1.0, 3.0, 5.0])[:, None, None] * np.ones((3, 2, 2)), years)
+    assert np.allclose(slope, 2.0) and np.allclose(p_value, 0.0)
+
+    slope, p_value = linear_trend(np.array([1.0, 1.0, 1.0])[:, None, None] * np.ones((3, 1, 1)), years)
+    assert slope[0, 0] == 0.0 and p_value[0, 0] == 1.0
+
+    slope, p_value = linear_trend(np.array([[[1.0]], [[4.0]]]), [2020, 2021])
+    assert slope[0, 0] == 3.0 and np.isnan(p_value[0, 0])
+
+
+def test_discover_years_needs_all_bands(tmp_path):
+    for name in ["lst_2020.tif", "ndvi_2020.tif", "duhi_2020.tif", "lst_2021.tif", "ndvi_2021.tif",
+                 "duhi_2019.tif", "lst_2019.tif", "ndvi_2019.tif", "landuse_2019.tif", "lst.tif"]:
+        (tmp_path / name).touch()
+
+    found = discover_years(tmp_path)
+    assert list(found) == [2019, 2020]
+    assert found[2020] == {band: tmp_path / f"{band}_2020.tif" for band in BANDS}
+
+
+def write_cube(cube_dir, values, slopes):
+    for band in BANDS:
+        np.save(cube_dir / f"{band}.npy", values[band].astype(np.float32))
+        np.save(cube_dir / f"{band}_slope.npy", slopes[band].astype(np.float32))
+
+
+def test_regional_summaries_clip_at_the_raster_edge(tmp_path, monkeypatch):
+    rows, cols, years = 10, 12, [2020, 2021]
+    rng = np.random.default_rng(5)
+    values = {"lst": rng.normal(30, 2, (2, rows, cols)), "ndvi": rng.uniform(0, 0.8, (2, rows, cols)),
+              "duhi": rng.normal(3, 1, (2, rows, cols))}
+    values["ndvi"][1, 0, 0] = 5.0     # out of range: the pixel drops out of every band that year
+    values["lst"][0, 1, 1] = np.nan
+    slopes = {band: rng.normal(0, 1, (rows, cols)) for band in BANDS}
+    write_cube(tmp_path, values, slopes)
+
+    # One-degree pixels from (0, 10); the box reaches 3 columns left and 2 rows above the raster
+    reference = RasterBand("duhi", np.zeros((rows, cols), dtype=np.float32), (0.0, 1.0, 0.0, 10.0, 0.0, -1.0), "v")
+    monkeypatch.setattr(time_cube, "REGION_BOUNDS", {"Edge": (-3.0, 6.0, 4.0, 12.0), "Peel": None})
+    timeseries, trends = time_cube._regional_summaries(tmp_path, years, (rows, cols), reference, block_pixels=7)
+
+    window = (slice(0, 4), slice(0, 4))
+    for i in range(len(years)):
+        valid = np.ones((4, 4), dtype=bool)
+        valid &= np.isfinite(values["lst"][i][window]) & (values["ndvi"][i][window] <= 1.0)
+        for band in BANDS:
+            assert timeseries["Edge"][band][i] == pytest.approx(values[band][i][window][valid].mean(), rel=1e-6)
+    latest_valid = values["ndvi"][1][window] <= 1.0
+    assert trends["Edge"]["duhi"] == pytest.approx(slopes["duhi"][window][latest_valid].mean(), rel=1e-5)
+    assert timeseries["Peel"]["duhi"][0] == pytest.approx(np.nanmean(
+        np.where(np.isfinite(values["lst"][0]), values["duhi"][0], np.nan)), rel=1e-6)
+
+
+def test_region_outside_the_raster_has_no_values(tmp_path, monkeypatch):
+    values = {band: np.ones((1, 4, 4)) for band in BANDS}
+    write_cube(tmp_path, values, {band: np.ones((4, 4)) for band in BANDS})
+    reference = RasterBand("duhi", np.zeros((4, 4), dtype=np.float32), (0.0, 1.0, 0.0, 4.0, 0.0, -1.0), "v")
+    monkeypatch.setattr(time_cube, "REGION_BOUNDS", {"Away": (-9.0, 20.0, -8.0, 21.0)})
+
+    timeseries, trends = time_cube._regional_summaries(tmp_path, [2020], (4, 4), reference, block_pixels=16)
+    assert timeseries["Away"] == {band: [None] for band in BANDS}
+    assert trends["Away"] == {band: None for band in BANDS}
+
+
+class FakeStore:
+    """Serves in-memory bands by path, standing in for RasterStore.load"""
+
+    def __init__(self, bands):
+        self.bands = bands
+
+    def load(self, path, name):
+        return self.bands[path]
+
+
+def test_ingest_skips_years_on_another_grid(tmp_path, caplog):
+    transform = (-80.0, 0.1, 0.0, 44.0, 0.0, -0.1)
+    bands, yearly = {}, {}
+    for year in (2020, 2021, 2022):
+        yearly[year] = {}
+        for band in BANDS:
+            shape = (6, 8) if (year, band) == (2021, "lst") else (6, 7)
+            data = np.full(shape, 0.5 if band == "ndvi" else 20.0 + year - 2020, dtype=np.float32)
+            bands[f"{band}_{year}"] = RasterBand(band, data, transform, f"{band}{year}")
+            yearly[year][band] = f"{band}_{year}"
+
+    meta = ingest(tmp_path, "v1", yearly, FakeStore(bands), {"duhi": bands["duhi_2022"]})
+    assert meta["years"] == [2020, 2022]
+    assert "Skipping 2021" in caplog.text
+
+    cube = TimeCube(tmp_path, meta)
+    assert cube.cubes["lst"].shape == (2, 6, 7)
+    assert meta["timeseries"]["Peel"]["lst"] == [pytest.approx(20.0), pytest.approx(22.0)]
+    assert meta["region_trends"]["Peel"]["lst"] == pytest.approx(1.0)
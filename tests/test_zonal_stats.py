@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from raster_store import RasterBand
+from zonal_stats import polygon_rings, rasterize_polygons, zone_summary
+
+
+def grid(rows=20, cols=30):
+    # One-degree pixels with the top-left corner at (0, 20)
+    return RasterBand("lst", np.zeros((rows, cols), dtype=np.float32), (0.0, 1.0, 0.0, float(rows), 0.0, -1.0), "v")
+
+
+def naive_mask(band, polygons):
+    """Full-grid even-odd ray casting of every pixel centre"""
+    rows, cols = band.shape
+    west, xres, _, north, _, yres = band.transform
+    mask = np.zeros((rows, cols), dtype=bool)
+    for r in range(rows):
+        for c in range(cols):
+            px, py = west + (c + 0.5) * xres, north + (r + 0.5) * yres
+            for rings in polygons:
+                inside = False
+                for ring in rings:
+                    for (x0, y0), (x1, y1) in zip(ring, np.roll(ring, -1, axis=0)):
+                        if (y0 > py) != (y1 > py) and px < x0 + (py - y0) / (y1 - y0) * (x1 - x0):
+                            inside = not inside
+                mask[r, c] |= inside
+    return mask
+
+
+def full_mask(band, polygons):
+    (r0, c0, height, width), mask = rasterize_polygons(band, polygons)
+    out = np.zeros(band.shape, dtype=bool)
+    out[r0:r0 + height, c0:c0 + width] = mask
+    return out
+
+
+def test_axis_aligned_square_covers_its_pixels():
+    band = grid()
+    polygons = polygon_rings({"type": "Polygon", "coordinates": [[[2, 3], [7, 3], [7, 8], [2, 8], [2, 3]]]})
+    (r0, c0, height, width), mask = rasterize_polygons(band, polygons)
+
+    assert mask.all() and mask.sum() == 25
+    assert (r0, c0, height, width) == (12, 2, 5, 5)
+
+
+def test_hole_is_excluded():
+    band = grid()
+    geometry = {"type": "Polygon", "coordinates": [
+        [[1, 1], [11, 1], [11, 11], [1, 11], [1, 1]],
+        [[4, 4], [8, 4], [8, 8], [4, 8], [4, 4]],
+    ]}
+    mask = full_mask(band, polygon_rings(geometry))
+    assert mask.sum() == 100 - 16
+    # Pixel centred on (5.5, 5.5) sits in the hole
+    assert not mask[20 - 6, 5]
+
+
+@pytest.mark.parametrize("geometry", [
+    {"type": "Polygon", "coordinates": [[[0.3, 0.7], [17.2, 2.4], [12.9, 18.6], [6.1, 9.3], [1.4, 15.8], [0.3, 0.7]]]},
+    {"type": "MultiPolygon", "coordinates": [
+        [[[2.2, 2.2], [9.7, 3.1], [5.5, 12.4], [2.2, 2.2]]],
+        [[[14.1, 4.8], [28.6, 5.2], [27.9, 19.4], [15.3, 16.6], [14.1, 4.8]],
+         [[18.4, 8.5], [24.2, 8.1], [21.6, 13.7], [18.4, 8.5]]],
+    ]},
+])
+def test_matches_naive_point_in_polygon(geometry):
+    band = grid()
+    polygons = polygon_rings(geometry)
+    np.testing.assert_array_equal(full_mask(band, polygons), naive_mask(band, polygons))
+
+
+def test_polygon_outside_the_raster_is_empty():
+    band = grid()
+    polygons = polygon_rings({"type": "Polygon", "coordinates": [[[50, 50], [60, 50], [60, 60], [50, 50]]]})
+    _, mask = rasterize_polygons(band, polygons)
+    assert mask.size == 0
+
+
+@pytest.mark.parametrize("geometry", [
+    {"type": "Point", "coordinates": [0, 0]},
+    {"type": "Polygon", "coordinates": [[[0, 0], [1, 1]]]},
+    {"type": "Polygon", "coordinates": [[[0, 0], [1, float("nan")], [1, 0]]]},
+    {"type": "MultiPolygon", "coordinates": []},
+])
+def test_invalid_geometries_rejected(geometry):
+    with pytest.raises(ValueError):
+        polygon_rings(geometry)
+
+
+def test_zone_summary_of_empty_zone_is_none():
+    assert zone_summary({"lst": np.array([]), "ndvi": np.array([])}) == {"lst": None, "ndvi": None}